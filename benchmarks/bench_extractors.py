@@ -0,0 +1,289 @@
+""" Benchmarks every extractor on synthetic workloads that scale, and checks them against stored baselines.
+
+Run from the repo root:
+    python benchmarks/bench_extractors.py [--quick] [--only TEXT] [--save-baseline | --check] [--baseline PATH]
+
+Each (workload, size, extractor) cell records throughput, p50/p99 latency and
+the peak Python heap seen by tracemalloc (allocations made inside lxml are not
+counted). --check exits 1 when a cell is slower or heavier than its baseline by
+more than --tolerance, or fails where it used to succeed.
+"""
+import argparse
+import importlib
+import json
+import logging
+import math
+import os
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+sys.path.insert(0, ROOT)
+
+import pandas as pd
+
+from bench_temptabletocte import many_temp_tables
+from lineage.catalog import Catalog, DB_COLUMN, SCHEMA_COLUMN, TABLE_COLUMN, COLUMN_COLUMN
+from lineage.column_lineage import extract_column_lineage
+from lineage.parse_cache import default_cache
+from lineage.temptabletocte import convert_temp_tables_to_ctes
+from lineage.tiered_lineage import extract_lineage_tiered
+
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines.json")
+
+# Regressions smaller than these are treated as noise whatever the tolerance
+MIN_SECONDS = 0.002
+MIN_PEAK_KB = 256
+
+
+def _script(name):
+    """ Namespace of one of the example extractor modules (their examples only run as __main__) """
+    return vars(importlib.import_module(f"lineage.{name}"))
+
+
+# --- Workload generators: each returns (input, catalog rows) ---
+
+def cte_chain(n):
+    """ n chained CTEs in the final_cte shape of lineage/sqlglot_v4.py: each window-ranks the one before """
+    rows = [("mg", "mg", "hope", c) for c in ("hi", "hj", "hk")] + [("mg", "mg", "pro", c) for c in ("hi", "pr", "pz")]
+    ctes = ["cte0 AS (\n    SELECT h.hi, h.hj FROM mg.hope h\n)",
+            "cte1 AS (\n    SELECT p.pr, p.pz, cte0.hi FROM mg.pro p JOIN cte0 ON cte0.hi = p.hi\n)"]
+    for i in range(2, n):
+        ctes.append(f"cte{i} AS (\n    SELECT c.pr, c.pz, c.hi, ROW_NUMBER() OVER (PARTITION BY c.hi ORDER BY c.pr) AS rn{i}"
+                    f" FROM cte{i - 1} c\n)")
+    sql = "WITH " + ",\n".join(ctes) + f"\nSELECT f.hi, f.pr\nFROM cte{n - 1} f\nWHERE f.pz = 1"
+    return sql, rows
+
+
+def wide_join(n):
+    """ n tables joined on a shared key, one column read from each """
+    rows = []
+    for i in range(n):
+        rows.extend([("mg", "mg", f"t{i}", "loan_number"), ("mg", "mg", f"t{i}", f"v{i}")])
+    joins = "\n".join(f"LEFT JOIN mg.t{i} a{i} ON a{i}.loan_number = a0.loan_number" for i in range(1, n))
+    columns = ", ".join(f"a{i}.v{i}" for i in range(n))
+    return f"SELECT {columns}\nFROM mg.t0 a0\n{joins}", rows
+
+
+def wide_select(n):
+    """ n unqualified columns from one table, each resolved through the catalog """
+    rows = [("mg", "mg", "wide", f"c{i}") for i in range(n)]
+    columns = ",\n    ".join(f"c{i}" for i in range(n))
+    return f"SELECT\n    {columns}\nFROM mg.wide", rows
+
+
+def nested_case(depth):
+    """ CASE expressions nested depth levels deep, like the example in lineage/columns_extract.py """
+    rows = [("profile", "profile", "users", c) for c in ("id", "name")]
+    rows += [("profile", "profile", "addresses", c) for c in ("id", "address", "status")]
+    expression = "b.address"
+    for i in range(depth):
+        expression = (f"CASE WHEN b.status = 'active{i}' THEN {expression} "
+                      f"WHEN a.name IS NOT NULL THEN a.name ELSE 'Unknown' END")
+    sql = (f"SELECT a.id, {expression} AS status_column\nFROM profile.users a\n"
+           f"LEFT JOIN profile.addresses b ON a.id = b.id\nWHERE b.status = 'active'\nORDER BY a.name")
+    return sql, rows
+
+
+def temp_table_procedure(n):
+    """ A T-SQL procedure with n temp tables (the generator of bench_temptabletocte.py) """
+    return many_temp_tables(n), []
+
+
+def nested_containers(n, tools_per_container=3):
+    """ An Alteryx workflow with n tool containers nested inside each other, every fifth one disabled """
+    parts = ['<?xml version="1.0"?>\n<AlteryxDocument yxmdVer="2020.1">\n<Nodes>\n']
+    tool_id = 0
+    for depth in range(n):
+        tool_id += 1
+        enabled = "False" if depth % 5 == 4 else "True"
+        parts.append(f'<Node ToolID="{tool_id}"><GuiSettings Plugin="AlteryxGuiToolkit.ToolContainer.ToolContainer"'
+                     f' Enabled="{enabled}"/><Properties><Configuration><Caption>Container {depth}</Caption>'
+                     f'</Configuration></Properties><ChildNodes>\n')
+        for _ in range(tools_per_container):
+            tool_id += 1
+            parts.append(f'<Node ToolID="{tool_id}"><GuiSettings Plugin="AlteryxBasePluginsGui.DbFileInput.DbFileInput"/>'
+                         f'<Properties><Configuration><Query>SELECT a.loan_number, a.npdd FROM mg.loan a '
+                         f'WHERE a.tool = {tool_id}</Query><PreSQL>DELETE FROM stage.t{tool_id}</PreSQL>'
+                         f'</Configuration></Properties></Node>\n')
+    parts.append("</ChildNodes></Node>\n" * n)
+    parts.append("</Nodes>\n<Connections/>\n</AlteryxDocument>\n")
+    return "".join(parts), []
+
+
+WORKLOADS = [
+    # (name, generator, kind, sizes, quick sizes)
+    ("cte chain", cte_chain, "sql", [10, 50, 200], [10, 50]),
+    ("wide join", wide_join, "sql", [10, 50, 200], [10, 50]),
+    ("wide select", wide_select, "sql", [100, 1000, 2500], [100, 1000]),
+    ("nested case", nested_case, "sql", [5, 25, 100], [5, 25]),
+    ("temp tables", temp_table_procedure, "tsql", [10, 50, 100], [10, 50]),
+    ("nested containers", nested_containers, "xml", [10, 100, 200], [10, 100]),
+]
+
+
+def _extractors():
+    """ kind -> [(name, fn(input, context))]; context holds df_columns, catalog and the XML path """
+    columns_extract = _script("columns_extract")
+    table_extract = _script("table_extract")
+    v2 = _script("sqlglot_v2")
+    v3 = _script("sqlglot_v3")
+    using_sqlglot = _script("using_sqlglot")
+    xml_parsing = _script("xml_parsing")
+    return {
+        "sql": [
+            ("extract_tables_and_columns", lambda sql, ctx: columns_extract["extract_tables_and_columns"](sql, ctx["df_columns"])),
+            ("extract_databases_and_tables", lambda sql, ctx: table_extract["extract_databases_and_tables"](sql)),
+            ("sqlglot v2", lambda sql, ctx: v2["extract_lineage"](sql, ctx["catalog"])),
+            ("sqlglot v3", lambda sql, ctx: v3["extract_lineage"](sql, ctx["catalog"])),
+            ("sqlglot v4", lambda sql, ctx: extract_column_lineage(sql, ctx["catalog"])),
+            ("sqlglot v4 scoped", lambda sql, ctx: extract_column_lineage(sql, ctx["catalog"], scoped=True)),
+            ("using_sqlglot", lambda sql, ctx: using_sqlglot["extract_lineage"](sql, ctx["catalog"])),
+            ("tiered", lambda sql, ctx: extract_lineage_tiered(sql, ctx["catalog"])),
+        ],
+        "tsql": [
+            (f"temptabletocte {engine}", lambda sql, ctx, engine=engine: convert_temp_tables_to_ctes(sql, engine=engine))
+            for engine in ("regex", "tokens", "ast")
+        ],
+        "xml": [
+            ("xml parsing dom", lambda xml, ctx: xml_parsing["extract_sql_from_alteryx_xml"](ctx["path"])),
+            ("xml parsing streaming", lambda xml, ctx: xml_parsing["extract_sql_from_alteryx_xml"](ctx["path"], streaming=True)),
+        ],
+    }
+
+
+# --- Measurement ---
+
+def _percentile(values, q):
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(q * len(ordered)) - 1)]
+
+
+def measure(fn, payload, context, repeat):
+    """ Times repeat cold calls (the parse cache is cleared before each), then one traced call for peak memory """
+    latencies = []
+    for _ in range(repeat):
+        default_cache.clear()
+        start = time.perf_counter()
+        fn(payload, context)
+        latencies.append(time.perf_counter() - start)
+
+    default_cache.clear()
+    tracemalloc.start()
+    try:
+        fn(payload, context)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+    p50 = statistics.median(latencies)
+    return {
+        "p50": p50,
+        "p99": _percentile(latencies, 0.99),
+        "mb_per_s": len(payload) / p50 / 1e6 if p50 else float("inf"),
+        "peak_kb": peak / 1024,
+    }
+
+
+def run(quick=False, only=None, repeat=5):
+    """ Runs every extractor over every workload size; returns {cell key: result} """
+    extractors = _extractors()
+    results = {}
+    print(f"{'workload':<20}{'size':>7}  {'extractor':<30}{'p50 ms':>10}{'p99 ms':>10}{'MB/s':>9}{'peak KB':>10}")
+    for name, generate, kind, sizes, quick_sizes in WORKLOADS:
+        for size in (quick_sizes if quick else sizes):
+            payload, rows = generate(size)
+            context = {"catalog": Catalog(rows)}
+            context["df_columns"] = pd.DataFrame(rows, columns=[DB_COLUMN, SCHEMA_COLUMN, TABLE_COLUMN, COLUMN_COLUMN])
+            if kind == "xml":
+                handle, context["path"] = tempfile.mkstemp(suffix=".yxmd")
+                with os.fdopen(handle, "w", encoding="utf-8") as f:
+                    f.write(payload)
+            try:
+                for extractor, fn in extractors[kind]:
+                    key = f"{name}/{size}/{extractor}"
+                    if only and only not in key:
+                        continue
+                    try:
+                        result = measure(fn, payload, context, repeat)
+                    except Exception as e:  # an extractor falling over is a result, not a crash
+                        result = {"error": f"{type(e).__name__}: {str(e).splitlines()[0] if str(e) else ''}"}
+                    results[key] = result
+                    if "error" in result:
+                        print(f"{name:<20}{size:>7}  {extractor:<30}  failed: {result['error'][:60]}")
+                    else:
+                        print(f"{name:<20}{size:>7}  {extractor:<30}{result['p50'] * 1e3:>10.2f}{result['p99'] * 1e3:>10.2f}"
+                              f"{result['mb_per_s']:>9.2f}{result['peak_kb']:>10.0f}")
+            finally:
+                if kind == "xml":
+                    os.remove(context["path"])
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """ Returns a description of every cell that regressed past the baseline """
+    regressions = []
+    for key, base in baseline.items():
+        current = results.get(key)
+        if current is None:
+            continue  # not run this time (--quick or --only)
+        if "error" in current:
+            if "error" not in base:
+                regressions.append(f"{key}: now fails ({current['error']})")
+            continue
+        if "error" in base:
+            continue
+        if current["p50"] > base["p50"] * (1 + tolerance) and current["p50"] - base["p50"] > MIN_SECONDS:
+            regressions.append(f"{key}: p50 {base['p50'] * 1e3:.2f} ms -> {current['p50'] * 1e3:.2f} ms")
+        if current["peak_kb"] > base["peak_kb"] * (1 + tolerance) and current["peak_kb"] - base["peak_kb"] > MIN_PEAK_KB:
+            regressions.append(f"{key}: peak {base['peak_kb']:.0f} KB -> {current['peak_kb']:.0f} KB")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--quick", action="store_true", help="only the smaller sizes of each workload")
+    parser.add_argument("--only", help="only cells whose 'workload/size/extractor' key contains this text")
+    parser.add_argument("--repeat", type=int, default=5, help="timed calls per cell (default 5)")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE, help="baseline JSON file")
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the new baseline")
+    parser.add_argument("--check", action="store_true", help="exit 1 if any cell regressed past the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="allowed slowdown/growth ratio (default 0.5)")
+    parser.add_argument("--json", help="also write the raw results to this file")
+    args = parser.parse_args()
+
+    logging.getLogger("sqlglot").setLevel(logging.ERROR)
+    results = run(args.quick, args.only, args.repeat)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+
+    if args.save_baseline:
+        baseline = {}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, encoding="utf-8") as f:
+                baseline = json.load(f)
+        baseline.update(results)  # a --quick or --only run refreshes just its own cells
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print(f"Saved {len(results)} cells to {args.baseline}")
+
+    if args.check:
+        if not os.path.exists(args.baseline):
+            print(f"No baseline at {args.baseline}; run with --save-baseline first")
+            return 2
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        print(f"{len(regressions)} regression(s) against {args.baseline}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
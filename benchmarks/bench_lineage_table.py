@@ -0,0 +1,97 @@
+""" Times LineageTable on lineage_batch-shaped rows and checks its output, including Arrow/Parquet when pyarrow is installed.
+
+Query ids are a mix of int, str and tuple, as lineage_batch callers pass them; the
+table stores them as str, so 1 and "1" are one id and sorting never compares types.
+
+Run from the repo root: python benchmarks/bench_lineage_table.py [--rows N]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from lineage.column_lineage import sort_records
+from lineage.lineage_table import LineageTable
+
+COLUMNS = ("QueryId", "Database", "Schema", "Table", "Column")
+
+
+def batch_rows(n, queries=1000):
+    """ n rows over `queries` query ids: int, the same id as str, and (workflow, tool, tag) tuples """
+    rows = []
+    for i in range(n):
+        q = i % queries
+        query_id = (q, str(q), (f"wf{q}.yxmd", str(q % 7), "sql"))[i % 3]
+        schema = None if i % 11 == 0 else "mg"
+        rows.append((query_id, "mg", schema, f"t{i % 50}", f"c{i % 400}"))
+    return rows
+
+
+def expected_records(rows):
+    return sort_records({(str(row[0]),) + row[1:] for row in rows})
+
+
+def timed(label, fn):
+    start = time.perf_counter()
+    result = fn()
+    print(f"{label:<24}{time.perf_counter() - start:>10.4f}s")
+    return result
+
+
+def main(n):
+    failures = 0
+    rows = batch_rows(n)
+    expected = expected_records(rows)
+    table = timed("extend", lambda: LineageTable.from_records(rows, COLUMNS))
+    timed("dedupe", table.dedupe)
+    if any(not isinstance(name, str) for names in table.names for name in names):
+        failures += 1
+        print("non-str value in a dictionary")
+
+    frame = timed("to_frame (sorted)", table.to_frame)
+    got = [tuple(None if value != value else value for value in row) for row in frame.itertuples(index=False)]
+    if got != expected:
+        failures += 1
+        print(f"to_frame: {len(got)} rows, expected {len(expected)}")
+
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        print("pyarrow not installed: Arrow/Parquet checks skipped")
+        return 1 if failures else 0
+
+    from lineage.lineage_table import ParquetAppender
+
+    arrow = timed("to_arrow (sorted)", lambda: table.to_arrow(sort=True))
+    if [tuple(row.values()) for row in arrow.to_pylist()] != expected:
+        failures += 1
+        print("to_arrow rows differ from the records")
+    for name in COLUMNS:
+        dictionary = arrow.column(name).chunk(0).dictionary.to_pylist()
+        if len(dictionary) != len(set(dictionary)):
+            failures += 1
+            print(f"to_arrow: duplicate dictionary entries in {name}")
+
+    table.clear()
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "lineage.parquet")
+        with ParquetAppender(path, COLUMNS) as appender:
+            half = len(rows) // 2
+            for chunk in (rows[:half], rows[half:]):
+                table.extend(chunk)
+                timed("parquet flush", lambda: appender.flush(table))
+        written = sort_records(set(tuple(row.values()) for row in pq.read_table(path).to_pylist()))
+        if written != expected:
+            failures += 1
+            print("parquet rows differ from the records")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=300_000, help="rows to append (default 300000)")
+    args = parser.parse_args()
+    sys.exit(main(args.rows))
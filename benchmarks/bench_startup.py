@@ -0,0 +1,84 @@
+""" Checks the `lineage` CLI's startup time against a budget.
+
+Run from the repo root:
+    python benchmarks/bench_startup.py [--runs N] [--budget-ms MS] [--importtime]
+
+Each run is a fresh interpreter executing `python -m lineage --version`, so the
+figure includes interpreter startup. Exits 1 when the median exceeds the
+budget, or when importing the CLI pulls in one of the heavy dependencies that
+the subcommands are supposed to import lazily.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+
+HEAVY_MODULES = ("pandas", "numpy", "sqlglot", "lxml")
+DEFAULT_BUDGET_MS = 100
+
+
+def _run(args):
+    return subprocess.run([sys.executable] + args, cwd=ROOT, capture_output=True, text=True, check=True)
+
+
+def time_noop(runs):
+    """ Wall milliseconds of `python -m lineage --version`, one fresh process per run """
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        _run(["-m", "lineage", "--version"])
+        timings.append((time.perf_counter() - start) * 1000)
+    return timings
+
+
+def heavy_imports():
+    """ Heavy modules loaded by importing the CLI (should be none) """
+    check = f"import sys, lineage.cli; print(' '.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    return _run(["-c", check]).stdout.split()
+
+
+def import_profile(top=15):
+    """ The slowest imports of a no-op run, from -X importtime (cumulative microseconds) """
+    stderr = _run(["-X", "importtime", "-m", "lineage", "--version"]).stderr
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = (part.strip() for part in line[len("import time:"):].split("|"))
+        rows.append((int(cumulative), name))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--budget-ms", type=float, default=DEFAULT_BUDGET_MS)
+    parser.add_argument("--importtime", action="store_true", help="also list the slowest imports")
+    args = parser.parse_args()
+
+    timings = time_noop(args.runs)
+    median = statistics.median(timings)
+    print(f"lineage --version: median {median:.1f} ms, min {min(timings):.1f} ms, max {max(timings):.1f} ms "
+          f"over {args.runs} runs (budget {args.budget_ms:.0f} ms)")
+
+    if args.importtime:
+        for cumulative, name in import_profile():
+            print(f"  {cumulative / 1000:8.1f} ms  {name}")
+
+    failures = []
+    heavy = heavy_imports()
+    if heavy:
+        failures.append(f"importing lineage.cli loads {', '.join(heavy)}")
+    if median > args.budget_ms:
+        failures.append(f"median startup {median:.1f} ms is over the {args.budget_ms:.0f} ms budget")
+    for failure in failures:
+        print(f"FAIL: {failure}")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+""" Benchmarks the regex, token and AST engines of convert_temp_tables_to_ctes on pathological procedures.
+
+Run from the repo root: python benchmarks/bench_temptabletocte.py [--corpus DIR_OR_SQL_FILE]
+"""
+import argparse
+import logging
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+
+from lineage.temptabletocte import convert_temp_tables_to_ctes
+from lineage.temptabletocte_bulk import iter_go_batches
+
+
+def many_temp_tables(n, fan_in=3):
+    """ n SELECT INTO temp tables, each joining up to fan_in earlier ones, plus their DROPs """
+    lines = ["DECLARE @as_of DATE = '2024-01-01';", "SET @limit = 100;"]
+    for i in range(n):
+        lines.append(f"IF OBJECT_ID('tempdb..#t{i}') IS NOT NULL DROP TABLE #t{i};")
+    for i in range(n):
+        sources = [f"#t{j} s{j}" for j in range(max(0, i - fan_in), i)] or ["dbo.base b"]
+        joins = "\nJOIN ".join(sources)
+        lines.append(f"SELECT c{i}, loan_number, @limit AS lim\nINTO #t{i}\nFROM {joins}\nWHERE as_of = @as_of;")
+    lines.append(f"SELECT * FROM #t{n - 1};")
+    lines.extend(f"DROP TABLE #t{i};" for i in range(n))
+    return "\n".join(lines)
+
+
+def many_variables(n):
+    """ n scalar variables, all referenced in one query """
+    lines = [f"DECLARE @v{i} INT = {i};" for i in range(n)]
+    predicate = " OR ".join(f"x = @v{i}" for i in range(n))
+    lines.append(f"SELECT x INTO #filtered FROM dbo.base WHERE {predicate};")
+    lines.append("SELECT * FROM #filtered;")
+    return "\n".join(lines)
+
+
+def huge_statement(n_columns):
+    """ One SELECT INTO with a very wide column list, the worst case for the .*? patterns """
+    columns = ",\n    ".join(f"col_{i} AS alias_{i}" for i in range(n_columns))
+    return f"SELECT\n    {columns}\nINTO #wide\nFROM dbo.base;\nSELECT * FROM #wide;"
+
+
+def plain_statements(n):
+    """ n statements with no temp tables: every SELECT makes the .*? patterns scan to the end """
+    return "\n".join(f"SELECT a, b FROM dbo.t{i} WHERE c = {i};" for i in range(n))
+
+
+WORKLOADS = [
+    ("temp tables", many_temp_tables, [25, 50, 100, 150]),
+    ("variables", many_variables, [100, 500, 1000]),
+    ("wide statement (cols)", huge_statement, [1000, 10000, 50000]),
+    ("plain statements", plain_statements, [250, 500, 1000]),
+]
+
+# Small scripts the text engines must convert identically: quotes and ';' inside
+# comments and bracketed / double-quoted identifiers
+EDGE_CASES = [
+    "-- don't touch\nSELECT a INTO #t FROM x;\n-- it's fine\nSELECT * FROM #t;",
+    "/* it's here */\nSELECT a INTO #t FROM x;\nSELECT * FROM #t; /* isn't it */",
+    "SELECT a /* ; */ INTO #t FROM x;\nSELECT * FROM #t;",
+    "SELECT [a;b], [c'd] INTO #t FROM x;\nSELECT [e'f] FROM #t;",
+    'SELECT "a;b", "c\'d" INTO #t FROM x;\nSELECT "e\'f" FROM #t;',
+    "SELECT [a]]b] INTO #t FROM [dbo].[x y];\nSELECT * FROM #t;",
+]
+
+# Temp-qualified columns: every engine must rename the qualifier along with the table.
+# The AST engine formats differently, so the engines are compared on the references left.
+QUALIFIED_CASES = [
+    ("SELECT x INTO #t FROM dbo.s;\nSELECT #t.x FROM #t;", ["t.x"]),
+    ("SELECT x, id INTO #a FROM dbo.s;\nSELECT id INTO ##b FROM dbo.u;\nSELECT #a.x FROM #a JOIN ##b ON #a.id = ##b.id;",
+     ["a.x", "a.id = b.id"]),
+]
+
+
+def time_engine(script, engine, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        output = convert_temp_tables_to_ctes(script, engine=engine)
+        best = min(best, time.perf_counter() - start)
+    return best, output
+
+
+def main():
+    print(f"{'workload':<24}{'size':>8}{'bytes':>12}{'regex s':>12}{'tokens s':>12}{'ast s':>12}{'speedup':>10}  same")
+    mismatches = 0
+    for name, generate, sizes in WORKLOADS:
+        for size in sizes:
+            script = generate(size)
+            regex_time, regex_output = time_engine(script, "regex")
+            token_time, token_output = time_engine(script, "tokens")
+            ast_time, _ = time_engine(script, "ast", repeat=1)
+            # The AST engine rewrites more statement shapes, so only the text engines must agree
+            same = regex_output == token_output
+            mismatches += not same
+            print(f"{name:<24}{size:>8}{len(script):>12}{regex_time:>12.4f}{token_time:>12.4f}{ast_time:>12.4f}"
+                  f"{regex_time / token_time:>9.1f}x  {same}")
+    for script in EDGE_CASES:
+        same = convert_temp_tables_to_ctes(script, engine="regex") == convert_temp_tables_to_ctes(script, engine="tokens")
+        mismatches += not same
+        if not same:
+            print(f"edge case converted differently: {script!r}")
+    for script, expected in QUALIFIED_CASES:
+        for engine in ("regex", "tokens", "ast"):
+            output = convert_temp_tables_to_ctes(script, engine=engine)
+            if "#" in output or not all(part in output for part in expected):
+                mismatches += 1
+                print(f"{engine} engine left a temp-qualified column: {script!r}")
+    return 1 if mismatches else 0
+
+
+def run_corpus(source):
+    """ Total time per engine over every GO batch of a real procedure corpus """
+    batches = [text for _, _, text in iter_go_batches(source)]
+    size = sum(len(text) for text in batches)
+    print(f"{len(batches)} batches, {size} bytes")
+    for engine in ("regex", "tokens", "ast"):
+        start = time.perf_counter()
+        failed = 0
+        for text in batches:
+            try:
+                convert_temp_tables_to_ctes(text, engine=engine)
+            except (ValueError, RecursionError):
+                failed += 1
+        elapsed = time.perf_counter() - start
+        print(f"{engine:<8}{elapsed:>10.3f}s{size / elapsed / 1e6:>10.2f} MB/s  failed={failed}")
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--corpus", help="a .sql file or directory of procedures to time instead of the synthetic workloads")
+    args = parser.parse_args()
+    logging.getLogger("sqlglot").setLevel(logging.ERROR)
+    sys.exit(run_corpus(args.corpus) if args.corpus else main())
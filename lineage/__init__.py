@@ -0,0 +1,46 @@
+""" SQL and column lineage for Alteryx workflows, SQL queries and T-SQL scripts.
+
+The submodules pull in pandas, sqlglot and lxml, so nothing is imported here
+up front: the names below are resolved from their submodule on first access.
+"""
+__version__ = "0.1.0"
+
+_EXPORTS = {
+    "Catalog": "catalog",
+    "load_catalog": "catalog",
+    "CatalogSnapshot": "catalog_snapshot",
+    "write_snapshot": "catalog_snapshot",
+    "extract_column_lineage": "column_lineage",
+    "lineage_batch": "column_lineage",
+    "sort_records": "column_lineage",
+    "extract_lineage_tiered": "tiered_lineage",
+    "LineageTable": "lineage_table",
+    "iter_sql_from_alteryx_xml": "alteryx_xml",
+    "crawl_workflows": "alteryx_crawl",
+    "crawl_lineage": "pipeline",
+    "LineageStore": "lineage_store",
+    "LineageIndex": "lineage_index",
+    "LineageGraph": "lineage_graph",
+    "build_workflow_graph": "lineage_graph",
+    "QueryLogIngest": "query_log",
+    "LineageService": "server",
+    "convert_temp_tables_to_ctes": "temptabletocte",
+    "extract_databases_and_tables": "table_extract",
+}
+
+__all__ = sorted(_EXPORTS)
+
+
+def __getattr__(name):
+    module = _EXPORTS.get(name)
+    if module is None:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    from importlib import import_module
+
+    value = getattr(import_module(f".{module}", __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(_EXPORTS))
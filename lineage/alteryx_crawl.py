@@ -0,0 +1,173 @@
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from lxml import etree
+
+from .alteryx_xml import iter_alteryx_items
+from .macros import MacroResolver
+
+WORKFLOW_EXTENSIONS = ('.yxmd', '.yxmc', '.yxwz')
+MANIFEST_VERSION = 3
+
+
+class _HashingReader:
+    """ File wrapper that hashes bytes as the XML parser pulls them """
+
+    def __init__(self, f):
+        self._f = f
+        self.digest = hashlib.sha256()
+
+    def read(self, size=-1):
+        data = self._f.read(size)
+        self.digest.update(data)
+        return data
+
+    def drain(self):
+        while self.read(1 << 20):
+            pass
+        return self.digest.hexdigest()
+
+
+def iter_workflow_files(root_dir, on_error=None):
+    """ Yields (path, size, mtime_ns) for every Alteryx workflow, macro and app under root_dir.
+
+    A directory or file that cannot be read (removed mid-crawl, permission
+    denied) is reported to on_error(path, message) and skipped; without
+    on_error the OSError is raised.
+    """
+    stack = [root_dir]
+    while stack:
+        directory = stack.pop()
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    try:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        elif entry.name.lower().endswith(WORKFLOW_EXTENSIONS):
+                            st = entry.stat()
+                            yield os.path.abspath(entry.path), st.st_size, st.st_mtime_ns
+                    except OSError as e:
+                        if on_error is None:
+                            raise
+                        on_error(os.path.abspath(entry.path), str(e))
+        except OSError as e:
+            if on_error is None:
+                raise
+            on_error(os.path.abspath(directory), str(e))
+
+
+def _parse_workflow(path):
+    # Hash and extract in the same read, so a changed file is only opened once
+    items = {"sql": [], "macro": [], "connection": []}
+    try:
+        with open(path, 'rb') as f:
+            reader = _HashingReader(f)
+            for item in iter_alteryx_items(reader):
+                items[item[0]].append(list(item[1:]))
+            return path, reader.drain(), items, None
+    except (etree.XMLSyntaxError, OSError) as e:  # OSError: removed mid-crawl, permission denied, ...
+        return path, None, None, str(e)
+
+
+def load_manifest(manifest_path):
+    if not manifest_path or not os.path.exists(manifest_path):
+        return {}
+    with open(manifest_path, encoding='utf-8') as f:
+        data = json.load(f)
+    if data.get('version') != MANIFEST_VERSION:
+        return {}
+    return data['files']
+
+
+def save_manifest(manifest, manifest_path):
+    # Write-then-rename so an interrupted run never leaves a truncated manifest
+    tmp_path = manifest_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'version': MANIFEST_VERSION, 'files': manifest}, f)
+    os.replace(tmp_path, manifest_path)
+
+
+def crawl_manifest(root_dir, manifest_path=None, processes=None):
+    """ Crawls root_dir and returns ({path: manifest entry}, stats), reusing the manifest for unchanged files.
+
+    Files whose size and mtime match the manifest are not opened at all. The
+    rest are parsed in worker processes; if their content hash still matches,
+    only the manifest metadata is refreshed. An entry holds the file's 'sql'
+    [tool_id, tag, sql], 'macros' [tool_id, macro_path] and 'connections'
+    [origin_tool_id, destination_tool_id] lists.
+    """
+    manifest = load_manifest(manifest_path)
+    new_manifest = {}
+    stats = {'files': 0, 'reused': 0, 'touched': 0, 'parsed': 0, 'failed': [], 'removed': 0}
+    to_parse = {}
+
+    def failed(path, message):
+        stats['failed'].append((path, message))
+
+    for path, size, mtime_ns in iter_workflow_files(root_dir, on_error=failed):
+        stats['files'] += 1
+        entry = manifest.get(path)
+        if entry and entry['size'] == size and entry['mtime_ns'] == mtime_ns:
+            new_manifest[path] = entry
+            stats['reused'] += 1
+        else:
+            to_parse[path] = (size, mtime_ns)
+
+    if to_parse:
+        with ProcessPoolExecutor(processes) as pool:
+            for path, digest, items, error in pool.map(_parse_workflow, to_parse, chunksize=8):
+                if error:
+                    stats['failed'].append((path, error))
+                    continue
+                old = manifest.get(path)
+                if old and old['sha256'] == digest:
+                    stats['touched'] += 1
+                else:
+                    stats['parsed'] += 1
+                size, mtime_ns = to_parse[path]
+                new_manifest[path] = {'size': size, 'mtime_ns': mtime_ns, 'sha256': digest, 'sql': items["sql"],
+                                      'macros': items["macro"], 'connections': items["connection"]}
+
+    stats['removed'] = len(manifest.keys() - new_manifest.keys() - to_parse.keys())
+
+    if manifest_path:
+        save_manifest(new_manifest, manifest_path)
+    return new_manifest, stats
+
+
+def crawl_workflows(root_dir, manifest_path=None, processes=None, macros=False, macro_paths=()):
+    """ Extracts SQL from every workflow under root_dir (see crawl_manifest).
+
+    Returns ({path: [(tool_id, tag, sql)]}, stats). With macros=True each
+    workflow's results also include the SQL of the macros it calls, under
+    "caller/inner" ToolID paths (see macros.MacroResolver). Macros under
+    root_dir come from the crawl itself; others are looked up in macro_paths
+    and parsed once. stats['macros'] holds the resolver's stats.
+    """
+    manifest, stats = crawl_manifest(root_dir, manifest_path, processes)
+    return manifest_sql(manifest, stats, macros, macro_paths), stats
+
+
+def manifest_sql(manifest, stats, macros=False, macro_paths=()):
+    """ {path: [(tool_id, tag, sql)]} of crawled manifest entries, optionally with macros expanded """
+    if not macros:
+        return {path: [tuple(row) for row in entry['sql']] for path, entry in manifest.items()}
+    resolver = MacroResolver(macro_paths, scans={
+        path: ([tuple(row) for row in entry['sql']], [tuple(ref) for ref in entry['macros']])
+        for path, entry in manifest.items()})
+    results = {path: resolver.expand(path) for path in manifest}
+    stats['macros'] = resolver.stats()
+    return results
+
+
+if __name__ == "__main__":
+    import sys
+
+    results, stats = crawl_workflows(sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else None)
+    for path, sql_results in sorted(results.items()):
+        for tool_id, sql_tag, sql in sql_results:
+            print(f"{path} | Tool ID: {tool_id}, Tag: {sql_tag}\nSQL:\n{sql}\n{'-'*40}")
+    print(stats)
@@ -0,0 +1,99 @@
+from lxml import etree
+
+from .profiling import count
+
+SQL_TAGS = ['Sql', 'InitialSQL', 'Query', 'PreSQL', 'PostSQL']
+
+
+def _release(elem):
+    # Drop the finished element and any already-processed siblings so the
+    # in-memory tree never grows past the current path from the root
+    elem.clear()
+    parent = elem.getparent()
+    if parent is not None:
+        while elem.getprevious() is not None:
+            del parent[0]
+
+
+def iter_sql_from_alteryx_xml(xml_source):
+    """ Streams (tool_id, sql_tag, sql) from a workflow without building the whole tree.
+
+    xml_source is a path or a binary file object. A Node is disabled when its
+    own GuiSettings has Enabled="False"; that state is carried down to every
+    nested tool. Runs in one pass with memory proportional to nesting depth.
+    """
+    for item in iter_alteryx_items(xml_source):
+        if item[0] == "sql":
+            yield item[1:]
+
+
+def iter_alteryx_items(xml_source):
+    """ Streams ("sql", tool_id, sql_tag, sql), ("macro", tool_id, macro_path) and
+    ("connection", origin_tool_id, destination_tool_id) items.
+
+    Same pass as iter_sql_from_alteryx_xml; a macro item is yielded for every
+    enabled tool whose EngineSettings names a Macro, when that tool closes, and
+    a connection item for every wire in the document's Connections section.
+    """
+    context = etree.iterparse(xml_source, events=("start", "end"), huge_tree=True)
+
+    path = []   # tags of the currently open elements
+    nodes = []  # open tools: [tool_id, disabled, depth, sql found in its Configuration, macro]
+    connection = None  # [origin, destination] of the open Connections/Connection
+    elements = 0
+
+    for event, elem in context:
+        tag = elem.tag
+
+        if event == "start":
+            elements += 1
+            depth = len(path)
+            if tag == "Node":
+                parent_disabled = nodes[-1][1] if nodes else False
+                nodes.append([elem.get("ToolID"), parent_disabled, depth, None, None])
+            elif nodes:
+                node = nodes[-1]
+                level = depth - node[2]
+                if tag == "GuiSettings" and level == 1 and elem.get("Enabled") == "False":
+                    node[1] = True
+                elif tag == "Configuration" and level == 2 and path[-1] == "Properties" and not node[1]:
+                    node[3] = {}
+                elif tag == "EngineSettings" and level == 1:
+                    node[4] = elem.get("Macro")
+            elif tag == "Connection" and path and path[-1] == "Connections":
+                # Outside any Node: database tools also have Connection elements
+                connection = [None, None]
+            elif connection is not None and path[-1] == "Connection":
+                if tag == "Origin":
+                    connection[0] = elem.get("ToolID")
+                elif tag == "Destination":
+                    connection[1] = elem.get("ToolID")
+            path.append(tag)
+            continue
+
+        path.pop()
+        if connection is not None and tag == "Connection" and path[-1] == "Connections":
+            if connection[0] is not None and connection[1] is not None:
+                yield ("connection", connection[0], connection[1])
+            connection = None
+        if nodes:
+            node = nodes[-1]
+            found = node[3]
+            if tag == "Node" and len(path) == node[2]:
+                nodes.pop()
+                if node[4] and not node[1]:
+                    yield ("macro", node[0], node[4])
+            elif found is not None:
+                if tag == "Configuration" and len(path) - node[2] == 2:
+                    # Configuration is complete: emit in SQL_TAGS order, like the tree walk
+                    for sql_tag in SQL_TAGS:
+                        sql_text = found.get(sql_tag)
+                        if sql_text and sql_text.strip():
+                            yield ("sql", node[0], sql_tag, sql_text.strip())
+                    node[3] = None
+                elif tag in SQL_TAGS and tag not in found:
+                    found[tag] = elem.text
+        _release(elem)
+
+    count("xml.nodes", elements)
+    del context
@@ -0,0 +1,259 @@
+""" Per-item wall-clock and memory budgets for batch runs, with worker recycling and a quarantine file.
+
+A pathological input (a generated 4MB statement, a script that sends a regex
+into catastrophic backtracking) would otherwise stall a whole Pool. Here each
+worker reports back after every item, so the parent knows which item a worker
+is on and since when. A worker that runs past the time budget, or whose
+resident memory grows past the memory budget, is killed and replaced; its
+item is reported as failed and written to the quarantine file, and the rest
+of its chunk is handed to another worker. Memory is read from /proc, so the
+memory budget is only enforced on Linux; the time budget works everywhere.
+"""
+import json
+import os
+import time
+from collections import deque
+from multiprocessing import Pipe, Process
+from multiprocessing.connection import wait
+
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+_READY = "ready"
+
+# Items a worker handles before it is replaced when a memory budget is set
+DEFAULT_MAX_ITEMS = 1000
+
+
+def _rss(pid):
+    """ Resident set size of a process in bytes, from /proc (None where unavailable) """
+    try:
+        with open(f"/proc/{pid}/statm") as f:
+            return int(f.read().split()[1]) * _PAGE_SIZE
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def _worker_main(conn, fn, initializer, initargs):
+    if initializer is not None:
+        initializer(*initargs)
+    conn.send((_READY, _rss(os.getpid())))
+    while True:
+        chunk = conn.recv()
+        if chunk is None:
+            return
+        for index, payload in chunk:
+            # Each report carries the worker's RSS after the item: the baseline for the next one
+            try:
+                conn.send((index, fn(payload), None, _rss(os.getpid())))
+            except MemoryError:
+                conn.send((index, None, "memory", None))
+                return  # the heap may be left fragmented; let the parent start a fresh worker
+            except Exception as e:
+                conn.send((index, None, f"{type(e).__name__}: {e}", _rss(os.getpid())))
+
+
+class Quarantine:
+    """ Appends over-budget inputs as JSON lines: key, reason, seconds, memory growth, size and the input itself """
+
+    def __init__(self, path):
+        self.path = path
+        self.count = 0
+        self._file = None
+
+    def add(self, key, reason, seconds, memory, payload):
+        if self._file is None:
+            self._file = open(self.path, 'a', encoding='utf-8')
+        record = {
+            'key': key,
+            'reason': reason,
+            'seconds': round(seconds, 3),
+            'memory_mb': round(memory / (1 << 20), 1) if memory is not None else None,
+            'size': len(payload) if isinstance(payload, (str, bytes)) else None,
+            'at': time.strftime("%Y-%m-%dT%H:%M:%S"),
+            'input': payload,
+        }
+        self._file.write(json.dumps(record, ensure_ascii=False, default=str) + '\n')
+        self._file.flush()
+        self.count += 1
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class _Worker:
+    def __init__(self, target, args):
+        self.conn, child_conn = Pipe()
+        self.process = Process(target=target, args=(child_conn,) + args, daemon=True)
+        self.process.start()
+        child_conn.close()
+        self.baseline = None   # RSS before the current item; None until the worker says it is ready
+        self.ready = False
+        self.chunk = deque()   # (index, key, payload) sent and not yet reported, current item first
+        self.started = None    # when the current item started
+        self.done = 0
+
+    def kill(self):
+        self.process.kill()
+        self.process.join()
+        self.conn.close()
+
+
+class BudgetedPool:
+    """ Process pool that enforces a time and memory budget on every item.
+
+    fn(payload) runs in the workers; initializer(*initargs) once per worker, as
+    with multiprocessing.Pool. timeout is seconds per item and max_memory is
+    bytes of resident memory a worker may grow by while on one item (None
+    disables either); growth is measured from the worker's RSS when it
+    started the item, so caches built by earlier items do not count.
+    max_items_per_worker recycles workers after that many items; with a
+    memory budget it defaults to DEFAULT_MAX_ITEMS, so memory that earlier
+    items left behind is handed back to the OS. quarantine is a path or a Quarantine for the items that blew their
+    budget. stats holds items, errors, timeouts, memory kills, crashes and
+    restarts.
+    """
+
+    def __init__(self, fn, processes=None, timeout=None, max_memory=None, initializer=None, initargs=(),
+                 chunksize=4, max_items_per_worker=None, quarantine=None, poll=0.05):
+        self.fn = fn
+        self.processes = processes or os.cpu_count() or 1
+        self.timeout = timeout
+        self.max_memory = max_memory
+        self.initializer = initializer
+        self.initargs = initargs
+        self.chunksize = chunksize
+        if max_items_per_worker is None and max_memory is not None:
+            max_items_per_worker = DEFAULT_MAX_ITEMS
+        self.max_items_per_worker = max_items_per_worker
+        self.quarantine = Quarantine(quarantine) if isinstance(quarantine, (str, os.PathLike)) else quarantine
+        self.poll = poll
+        self.stats = {'items': 0, 'errors': 0, 'timeouts': 0, 'memory': 0, 'crashed': 0, 'restarts': 0}
+
+    def _spawn(self):
+        return _Worker(_worker_main, (self.fn, self.initializer, self.initargs))
+
+    def imap(self, items, ordered=False):
+        """ Yields (key, result, error) for (key, payload) items; error is None on success.
+
+        Results come back as they finish, or in input order with ordered=True.
+        Only a few chunks per worker are read ahead from items.
+        """
+        items = enumerate(items)
+        window = self.processes * self.chunksize * 4
+        queue = deque()       # (index, key, payload) not yet sent to a worker
+        finished = {}         # index -> (key, result, error), for ordered output
+        next_index = 0
+        in_flight = 0
+        exhausted = False
+        workers = [self._spawn() for _ in range(self.processes)]
+        try:
+            while True:
+                while not exhausted and in_flight < window:
+                    try:
+                        index, (key, payload) = next(items)
+                    except StopIteration:
+                        exhausted = True
+                        break
+                    queue.append((index, key, payload))
+                    in_flight += 1
+                if exhausted and not in_flight:
+                    return
+
+                for worker in workers:
+                    if worker.ready and not worker.chunk and queue:
+                        chunk = [queue.popleft() for _ in range(min(self.chunksize, len(queue)))]
+                        worker.chunk.extend(chunk)
+                        worker.conn.send([(index, payload) for index, _, payload in chunk])
+                        worker.started = time.monotonic()
+
+                done = []
+                for conn in wait([worker.conn for worker in workers], self.poll):
+                    worker = next(w for w in workers if w.conn is conn)
+                    try:
+                        message = conn.recv()
+                    except (EOFError, OSError):
+                        if not worker.ready:
+                            worker.process.join(1)
+                            raise RuntimeError(f"worker failed to start (exit code {worker.process.exitcode})")
+                        done.extend(self._replace(workers, worker, queue, "crashed"))
+                        continue
+                    if message[0] == _READY:
+                        worker.ready = True
+                        worker.baseline = message[1]
+                        continue
+                    if message[2] == "memory":
+                        # MemoryError in the worker, which has exited: same as going over the budget
+                        done.extend(self._replace(workers, worker, queue, "memory"))
+                        continue
+                    index, result, error, rss = message
+                    _, key, _ = worker.chunk.popleft()
+                    worker.started = time.monotonic()
+                    if rss is not None:
+                        worker.baseline = rss
+                    worker.done += 1
+                    done.append((index, key, result, error))
+                    if (self.max_items_per_worker and worker.done >= self.max_items_per_worker
+                            and not worker.chunk):
+                        self._restart(workers, worker)
+
+                now = time.monotonic()
+                for worker in list(workers):
+                    if not worker.chunk:
+                        continue
+                    if self.timeout is not None and now - worker.started > self.timeout:
+                        done.extend(self._replace(workers, worker, queue, "timeout"))
+                    elif self.max_memory is not None and worker.baseline is not None:
+                        rss = _rss(worker.process.pid)
+                        if rss is not None and rss - worker.baseline > self.max_memory:
+                            done.extend(self._replace(workers, worker, queue, "memory", rss - worker.baseline))
+
+                for index, key, result, error in done:
+                    in_flight -= 1
+                    self.stats['items'] += 1
+                    self.stats['errors'] += error is not None
+                    if not ordered:
+                        yield key, result, error
+                    else:
+                        finished[index] = (key, result, error)
+                while ordered and next_index in finished:
+                    yield finished.pop(next_index)
+                    next_index += 1
+        finally:
+            for worker in workers:
+                if worker.process.is_alive() and not worker.chunk:
+                    try:
+                        worker.conn.send(None)
+                    except OSError:
+                        pass
+                    worker.process.join(1)
+                worker.kill()
+            if self.quarantine is not None:
+                self.quarantine.close()
+
+    def _restart(self, workers, worker):
+        worker.kill()
+        workers[workers.index(worker)] = self._spawn()
+        self.stats['restarts'] += 1
+
+    def _replace(self, workers, worker, queue, reason, memory=None):
+        """ Kills a worker over its budget (or found dead): fails its current item, requeues the rest """
+        if not worker.chunk:
+            self._restart(workers, worker)
+            return []
+        index, key, payload = worker.chunk.popleft()
+        seconds = time.monotonic() - worker.started
+        self.stats['timeouts' if reason == "timeout" else reason] += 1
+        if self.quarantine is not None:
+            self.quarantine.add(key, reason, seconds, memory, payload)
+        queue.extendleft(reversed(worker.chunk))
+        worker.chunk.clear()
+        self._restart(workers, worker)
+        if reason == "timeout":
+            message = f"timed out after {seconds:.1f}s"
+        elif reason == "memory":
+            message = "memory budget exceeded"
+        else:
+            message = f"worker crashed (exit code {worker.process.exitcode})"
+        return [(index, key, None, message)]
@@ -0,0 +1,122 @@
+import os
+import sys
+from collections import defaultdict
+
+from .profiling import count
+
+DB_COLUMN = "Database Name"
+SCHEMA_COLUMN = "Schema Name"
+TABLE_COLUMN = "Table Name"
+COLUMN_COLUMN = "Column Name"
+
+
+def normalize_columns(df_columns):
+    """ Strips and lowercases every catalog value, the way the extractors expect it """
+    return df_columns.astype(str).apply(lambda col: col.str.strip().str.lower())
+
+
+def load_catalog(source):
+    """ Builds a Catalog from a Catalog, a df_columns frame or an INFORMATION_SCHEMA CSV path.
+
+    A path to a snapshot written by catalog_snapshot.write_snapshot is memory-mapped
+    instead of parsed; a CatalogSnapshot passes through unchanged.
+    """
+    from .catalog_snapshot import CatalogSnapshot, is_snapshot
+
+    if isinstance(source, (Catalog, CatalogSnapshot)):
+        return source
+    if isinstance(source, (str, os.PathLike)):
+        if is_snapshot(source):
+            return CatalogSnapshot(source)
+        import pandas as pd  # only CSV catalogs need it; snapshots load without pandas
+        source = pd.read_csv(source, dtype=str, keep_default_na=False)
+    return Catalog.from_frame(normalize_columns(source))
+
+
+def _intern(value):
+    return sys.intern(value) if isinstance(value, str) else value
+
+
+class Catalog:
+    """ Hash-indexed view over df_columns, built once and shared by the extractors """
+
+    def __init__(self, rows):
+        by_column = defaultdict(list)
+        by_table = defaultdict(list)
+        seen = set()
+
+        # rows are (db, schema, table, column); strings are interned so the
+        # millions of repeated db/schema/table names share one object each
+        for db, schema, table, column in rows:
+            row = (_intern(db), _intern(schema), _intern(table), _intern(column))
+            if row in seen:
+                continue
+            seen.add(row)
+            by_column[row[3]].append(row)
+            by_table[row[2]].append(row)
+
+        self._by_column = {col: tuple(matches) for col, matches in by_column.items()}
+        self._by_table = {table: tuple(matches) for table, matches in by_table.items()}
+        self._size = len(seen)
+
+        # table -> (db, schema), each set only when it is unique for that table name
+        self._table_location = {}
+        for table, matches in self._by_table.items():
+            dbs = {row[0] for row in matches}
+            schemas = {row[1] for row in matches}
+            self._table_location[table] = (
+                matches[0][0] if len(dbs) == 1 else None,
+                matches[0][1] if len(schemas) == 1 else None,
+            )
+
+        # column -> its first row, for column names that live in exactly one table
+        self._single_table = {
+            col: matches[0]
+            for col, matches in self._by_column.items()
+            if all(row[2] == matches[0][2] for row in matches)
+        }
+
+    @classmethod
+    def from_frame(cls, df_columns):
+        """ Builds the catalog from a normalized df_columns frame (Schema Name is optional) """
+        size = len(df_columns)
+        dbs = df_columns[DB_COLUMN].tolist()
+        schemas = df_columns[SCHEMA_COLUMN].tolist() if SCHEMA_COLUMN in df_columns else [None] * size
+        tables = df_columns[TABLE_COLUMN].tolist()
+        columns = df_columns[COLUMN_COLUMN].tolist()
+        return cls(zip(dbs, schemas, tables, columns))
+
+    def __len__(self):
+        return self._size
+
+    def columns_for(self, column):
+        """ All (db, schema, table, column) rows that define this column name """
+        rows = self._by_column.get(column, ())
+        count("catalog.lookups")
+        if len(rows) > 1:
+            count("catalog.ambiguous")
+        return rows
+
+    def table_columns(self, table):
+        """ All (db, schema, table, column) rows that belong to this table name """
+        count("catalog.lookups")
+        return self._by_table.get(table, ())
+
+    def table_location(self, table):
+        """ (db, schema) for a table name; either part is None when missing or ambiguous """
+        location = self._table_location.get(table)
+        count("catalog.lookups")
+        if location is None:
+            count("catalog.misses")
+            return (None, None)
+        if None in location:
+            count("catalog.ambiguous")
+        return location
+
+    def table_for_column(self, column):
+        """ The first row for a column name when it lives in exactly one table, else None """
+        row = self._single_table.get(column)
+        count("catalog.lookups")
+        if row is None:
+            count("catalog.ambiguous" if column in self._by_column else "catalog.misses")
+        return row
@@ -0,0 +1,283 @@
+import json
+import mmap
+import os
+import sys
+
+from .catalog import COLUMN_COLUMN, DB_COLUMN, SCHEMA_COLUMN, TABLE_COLUMN, normalize_columns
+from .profiling import count
+
+MAGIC = b"LINCAT01"
+_ALIGN = 8
+_NONE = -1  # code for a missing db/schema, as in lineage_table
+_FIELDS = ("db", "schema", "table", "column")
+
+# numpy dtype strings of the stored arrays -> memoryview formats; reading a snapshot
+# goes through memoryview casts so it needs neither numpy nor pandas
+_FORMATS = {'<i8': 'q', '<i4': 'i', '|u1': 'B'}
+
+# sqlglot's MappingSchema wants a type per column; the catalog has none
+UNKNOWN_TYPE = "UNKNOWN"
+
+
+def _read_frames(source, chunksize):
+    import pandas as pd
+
+    if isinstance(source, (str, os.PathLike)):
+        with pd.read_csv(source, dtype=str, keep_default_na=False, chunksize=chunksize) as reader:
+            yield from reader
+    else:
+        yield source
+
+
+def write_snapshot(source, path, chunksize=1_000_000):
+    """ Normalizes a df_columns frame or INFORMATION_SCHEMA CSV once and writes a catalog snapshot.
+
+    The file holds a sorted string table and two copies of the int32 (db, schema,
+    table, column) code rows: one grouped by table name and one grouped by column
+    name, each in first-seen order within a group, with CSR offsets from a string
+    code to its group. Every lookup is then one contiguous slice. Returns the
+    number of rows.
+    """
+    import numpy as np
+    import pandas as pd
+
+    ids = {}
+    chunks = []
+    for frame in _read_frames(source, chunksize):
+        frame = normalize_columns(frame)
+        codes = []
+        for name in (DB_COLUMN, SCHEMA_COLUMN, TABLE_COLUMN, COLUMN_COLUMN):
+            if name not in frame:
+                codes.append(np.full(len(frame), _NONE, dtype=np.int32))
+                continue
+            values = frame[name]
+            for value in pd.unique(values):
+                if value not in ids:
+                    ids[value] = len(ids)
+            codes.append(values.map(ids).to_numpy(dtype=np.int32))
+        chunks.append(np.column_stack(codes))
+    rows = np.concatenate(chunks) if chunks else np.empty((0, 4), dtype=np.int32)
+
+    # Drop duplicate rows but keep the first-seen order, like Catalog does
+    if len(rows):
+        _, first = np.unique(rows, axis=0, return_index=True)
+        rows = rows[np.sort(first)]
+
+    # Renumber so codes follow the sorted string table (binary-searchable by name)
+    strings = sorted(ids)
+    remap = np.empty(len(ids) + 1, dtype=np.int32)
+    remap[[ids[s] for s in strings]] = np.arange(len(strings), dtype=np.int32)
+    remap[-1] = _NONE
+    rows = remap[rows]
+
+    encoded = [s.encode('utf-8') for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+
+    arrays = {
+        'string_offsets': offsets,
+        'string_data': np.frombuffer(b"".join(encoded), dtype=np.uint8),
+    }
+    for key in ("table", "column"):
+        # Rows whose <key> is string s: <key>_<field>[<key>_ptr[s]:<key>_ptr[s + 1]]
+        grouped = rows[np.argsort(rows[:, _FIELDS.index(key)], kind="stable")]
+        ptr = np.zeros(len(strings) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(grouped[:, _FIELDS.index(key)], minlength=len(strings)), out=ptr[1:])
+        arrays[f'{key}_ptr'] = ptr
+        for i, field in enumerate(_FIELDS):
+            arrays[f'{key}_{field}'] = np.ascontiguousarray(grouped[:, i])
+
+    write_arrays(path, arrays, {'rows': len(rows), 'strings': len(strings)})
+    return len(rows)
+
+
+def write_arrays(path, arrays, meta, magic=MAGIC):
+    """ Writes {name: numpy array} after a magic + JSON header, each array 8-byte aligned """
+    if sys.byteorder != 'little':
+        raise ValueError("array files are written in little-endian order")
+    directory = {}
+    offset = 0
+    for name, array in arrays.items():
+        directory[name] = [offset, array.dtype.str, len(array)]
+        offset += -(-array.nbytes // _ALIGN) * _ALIGN
+    header = json.dumps({'version': 1, **meta, 'arrays': directory}).encode('utf-8')
+    data_start = -(-(len(magic) + 8 + len(header)) // _ALIGN) * _ALIGN
+
+    # Write-then-rename so readers never map a half-written file
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(magic)
+        f.write(len(header).to_bytes(8, 'little'))
+        f.write(header)
+        f.write(b"\0" * (data_start - f.tell()))
+        for name, array in arrays.items():
+            f.write(array.tobytes())
+            f.write(b"\0" * (-array.nbytes % _ALIGN))
+    os.replace(tmp_path, path)
+
+
+def map_arrays(path, magic=MAGIC):
+    """ (mmap, header, {name: (byte offset, dtype str, length)}) of a file written by write_arrays """
+    with open(path, 'rb') as f:
+        mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    if mm[:len(magic)] != magic:
+        mm.close()
+        raise ValueError(f"{path} is not a {magic.decode()} file")
+    header_len = int.from_bytes(mm[len(magic):len(magic) + 8], 'little')
+    header = json.loads(mm[len(magic) + 8:len(magic) + 8 + header_len])
+    data_start = -(-(len(magic) + 8 + header_len) // _ALIGN) * _ALIGN
+    arrays = {name: (data_start + offset, dtype, length) for name, (offset, dtype, length) in header['arrays'].items()}
+    return mm, header, arrays
+
+
+def is_snapshot(path, magic=MAGIC):
+    try:
+        with open(path, 'rb') as f:
+            return f.read(len(magic)) == magic
+    except OSError:
+        return False
+
+
+class CatalogSnapshot:
+    """ Read-only Catalog over a memory-mapped snapshot file.
+
+    Opening it maps the file and reads a small header, so startup does not depend
+    on catalog size; processes that open the same file share its pages through
+    the OS page cache. Lookups have the same results as Catalog. Pickles as its
+    path, so pool workers reopen the mapping instead of copying it.
+    """
+
+    def __init__(self, path):
+        self.path = os.fspath(path)
+        self._mm, header, arrays = map_arrays(self.path)
+        self._size = header['rows']
+        self._strings = header['strings']
+        buffer = memoryview(self._mm)
+        self._views = [buffer]
+        for name, (start, dtype, length) in arrays.items():
+            view = buffer[start:start + length * int(dtype[2:])].cast(_FORMATS[dtype])
+            self._views.append(view)
+            setattr(self, f'_{name}', view)
+        self._string_base = arrays['string_data'][0]
+        self._names = {_NONE: None}  # code -> str, filled on demand
+        self._ids = {}       # str -> code (or None), filled on demand
+        self._by_column = {}
+        self._by_table = {}
+        self._mapping = None
+
+    def __reduce__(self):
+        return (CatalogSnapshot, (self.path,))
+
+    def __len__(self):
+        return self._size
+
+    def _id(self, name):
+        """ Code of a string via binary search over the sorted string table, or None """
+        if name in self._ids:
+            return self._ids[name]
+        key = name.encode('utf-8')
+        lo, hi = 0, self._strings
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._raw(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        code = lo if lo < self._strings and self._raw(lo) == key else None
+        self._ids[name] = code
+        return code
+
+    def _raw(self, code):
+        start, stop = self._string_offsets[code], self._string_offsets[code + 1]
+        return self._mm[self._string_base + start:self._string_base + stop]
+
+    def _rows(self, key, name):
+        code = self._id(name) if isinstance(name, str) else None
+        if code is None:
+            return ()
+        ptr = getattr(self, f'_{key}_ptr')
+        return self._materialize(key, ptr[code], ptr[code + 1])
+
+    def _materialize(self, key, start, stop):
+        """ (db, schema, table, column) string tuples of rows start:stop of the <key>-grouped copy """
+        names = self._names
+        fields = []
+        for field in _FIELDS:
+            codes = getattr(self, f'_{key}_{field}')[start:stop].tolist()
+            for code in set(codes).difference(names):
+                names[code] = sys.intern(self._raw(code).decode('utf-8'))
+            fields.append(map(names.__getitem__, codes))
+        return tuple(zip(*fields))
+
+    def columns_for(self, column):
+        """ All (db, schema, table, column) rows that define this column name """
+        rows = self._by_column.get(column)
+        if rows is None:
+            rows = self._by_column[column] = self._rows("column", column)
+        count("catalog.lookups")
+        if len(rows) > 1:
+            count("catalog.ambiguous")
+        return rows
+
+    def table_columns(self, table):
+        """ All (db, schema, table, column) rows that belong to this table name """
+        rows = self._by_table.get(table)
+        if rows is None:
+            rows = self._by_table[table] = self._rows("table", table)
+        count("catalog.lookups")
+        return rows
+
+    def table_location(self, table):
+        """ (db, schema) for a table name; either part is None when missing or ambiguous """
+        rows = self.table_columns(table)
+        if not rows:
+            count("catalog.misses")
+            return (None, None)
+        dbs = {row[0] for row in rows}
+        schemas = {row[1] for row in rows}
+        location = (rows[0][0] if len(dbs) == 1 else None, rows[0][1] if len(schemas) == 1 else None)
+        if None in location:
+            count("catalog.ambiguous")
+        return location
+
+    def table_for_column(self, column):
+        """ The first row for a column name when it lives in exactly one table, else None """
+        rows = self.columns_for(column)
+        if rows and all(row[2] == rows[0][2] for row in rows):
+            return rows[0]
+        count("catalog.ambiguous" if rows else "catalog.misses")
+        return None
+
+    def schema_mapping(self, tables=None):
+        """ Nested {db: {schema: {table: {column: type}}}} for sqlglot's MappingSchema / qualify().
+
+        Without `tables` the full mapping is built once and cached; with a list of
+        table names only those tables are included, which is all a single query's
+        qualification needs. Missing db/schema parts become "".
+        """
+        if tables is None and self._mapping is not None:
+            return self._mapping
+        if tables is None:
+            rows = self._materialize("table", 0, self._size)
+        else:
+            rows = [row for table in tables for row in self.table_columns(table)]
+        mapping = {}
+        for db, schema, table, column in rows:
+            mapping.setdefault(db or "", {}).setdefault(schema or "", {}).setdefault(table, {})[column] = UNKNOWN_TYPE
+        if tables is None:
+            self._mapping = mapping
+        return mapping
+
+    def close(self):
+        for view in reversed(self._views):
+            view.release()
+        self._views = []
+        self._mm.close()
+
+
+if __name__ == "__main__":
+    import time
+
+    start = time.perf_counter()
+    rows = write_snapshot(sys.argv[1], sys.argv[2])
+    print(f"{rows} catalog rows written to {sys.argv[2]} in {time.perf_counter() - start:.1f}s")
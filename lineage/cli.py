@@ -0,0 +1,370 @@
+""" The `lineage` command: workflow, SQL and temp-table conversion subcommands.
+
+Only the standard library is imported up front; each subcommand imports the
+modules it needs, so `lineage --help` and `lineage --version` stay cheap.
+Catalog options take an INFORMATION_SCHEMA CSV or a snapshot written by
+`lineage snapshot`, which loads without pandas in milliseconds.
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+
+from . import __version__
+
+LINEAGE_FIELDS = ["database", "schema", "table", "column"]
+
+
+class _Output:
+    """ Writes rows to stdout as CSV (with a header) or JSON lines """
+
+    def __init__(self, fmt, fields):
+        self.fields = fields
+        self._csv = None
+        if fmt == "csv":
+            self._csv = csv.writer(sys.stdout, lineterminator="\n")
+            self._csv.writerow(fields)
+
+    def write(self, row):
+        if self._csv is not None:
+            self._csv.writerow(["" if value is None else value for value in row])
+        else:
+            sys.stdout.write(json.dumps(dict(zip(self.fields, row)), ensure_ascii=False) + "\n")
+
+
+def _read_text(path):
+    if path in (None, "-"):
+        return sys.stdin.read()
+    with open(path, encoding="utf-8-sig") as f:
+        return f.read()
+
+
+def _report_error(*parts):
+    print("error: " + " | ".join(str(part) for part in parts if part is not None), file=sys.stderr)
+
+
+def _report_macros(stats):
+    """ Warns about the unresolved macros and macro cycles in a MacroResolver's stats """
+    if not stats:
+        return
+    for macro_ref, references in stats['missing'].items():
+        print(f"warning: macro not found: {macro_ref} ({references} references)", file=sys.stderr)
+    for cycle in stats['cycles']:
+        print(f"warning: macro cycle: {' -> '.join(cycle)}", file=sys.stderr)
+
+
+# --- Subcommands ---
+
+def cmd_workflows(args):
+    """ SQL (or, with --catalog, column lineage) of Alteryx workflows; directories are crawled """
+    from lxml import etree
+
+    from .alteryx_xml import iter_sql_from_alteryx_xml
+
+    resolver = None
+    if args.macros:
+        from .macros import MacroResolver
+
+        resolver = MacroResolver(args.macro_path)
+
+    def file_sql(path):
+        """ (sql_results, error) of one workflow file """
+        if resolver is not None:
+            sql_results = resolver.expand(path)
+            return sql_results, resolver.failed.get(os.path.abspath(path))
+        try:
+            return list(iter_sql_from_alteryx_xml(path)), None
+        except etree.XMLSyntaxError as e:
+            return [], str(e)
+
+    failed = 0
+    if args.catalog is None:
+        from .alteryx_crawl import crawl_workflows
+
+        out = _Output(args.format, ["workflow", "tool_id", "sql_tag", "sql"])
+        for path in args.paths:
+            if os.path.isdir(path):
+                results, stats = crawl_workflows(path, args.manifest, args.processes, args.macros, args.macro_path)
+                for workflow, sql_results in sorted(results.items()):
+                    for row in sql_results:
+                        out.write((workflow,) + tuple(row))
+                for workflow, message in stats['failed']:
+                    _report_error(workflow, message)
+                failed += len(stats['failed'])
+                _report_macros(stats.get('macros'))
+                continue
+            sql_results, error = file_sql(path)
+            for row in sql_results:
+                out.write((path,) + tuple(row))
+            if error:
+                _report_error(path, error)
+                failed += 1
+        _report_macros(resolver and resolver.stats())
+        return 1 if failed else 0
+
+    from sqlglot.errors import SqlglotError
+
+    from .catalog import load_catalog
+    from .column_lineage import extract_column_lineage, sort_records
+
+    out = _Output(args.format, ["workflow", "tool_id", "sql_tag"] + LINEAGE_FIELDS)
+    catalog = None
+    budgeted = args.timeout is not None or args.max_memory is not None
+    for path in args.paths:
+        if os.path.isdir(path) and (args.macros or budgeted):
+            # Macro expansion needs every file's macro references, so crawl first;
+            # budgets are enforced per query by lineage_batch
+            from .alteryx_crawl import crawl_workflows
+            from .column_lineage import lineage_batch
+
+            results, stats = crawl_workflows(path, args.manifest, args.processes, args.macros, args.macro_path)
+            queries = (((workflow, tool_id, sql_tag), sql)
+                       for workflow, sql_results in sorted(results.items())
+                       for tool_id, sql_tag, sql in sql_results)
+            errors = []
+            for key, *record in lineage_batch(queries, args.catalog, args.processes,
+                                               on_error=lambda key, message: errors.append(key + (message,)),
+                                               scoped=not args.flat, timeout=args.timeout,
+                                               max_memory=args.max_memory and args.max_memory << 20,
+                                               quarantine=args.quarantine):
+                out.write(key + tuple(record))
+            for workflow, message in stats['failed']:
+                _report_error(workflow, message)
+            for error in errors:
+                _report_error(*error)
+            failed += len(stats['failed']) + len(errors)
+            _report_macros(stats.get('macros'))
+            continue
+        if os.path.isdir(path):
+            from .pipeline import crawl_lineage
+
+            results, _ = crawl_lineage(path, args.catalog, resolvers=args.processes, scoped=not args.flat)
+            for workflow, (_, rows, errors) in sorted(results.items()):
+                for row in rows:
+                    out.write((workflow,) + row)
+                for error in errors:
+                    _report_error(workflow, *error)
+                failed += len(errors)
+            continue
+
+        # A single workflow is resolved in-process: no pool to start for a handful of queries
+        if catalog is None:
+            catalog = load_catalog(args.catalog)
+        sql_results, error = file_sql(path)
+        if error:
+            _report_error(path, error)
+            failed += 1
+            continue
+        for tool_id, sql_tag, sql in sql_results:
+            try:
+                records = extract_column_lineage(sql, catalog, scoped=not args.flat)
+            except (SqlglotError, RecursionError) as e:
+                _report_error(path, tool_id, sql_tag, e)
+                failed += 1
+                continue
+            for record in sort_records(records):
+                out.write((path, tool_id, sql_tag) + record)
+
+    _report_macros(resolver and resolver.stats())
+    return 1 if failed else 0
+
+
+def cmd_sql(args):
+    """ Column lineage of one SQL query, or with --tables the FROM/JOIN tables it names """
+    sql = _read_text(args.file)
+    if args.tables:
+        from .table_extract import table_rows
+
+        out = _Output(args.format, ["database", "table"])
+        for row in table_rows(sql):
+            out.write(row)
+        return 0
+
+    if args.catalog is None:
+        print("lineage sql: --catalog is required unless --tables is given", file=sys.stderr)
+        return 2
+
+    from sqlglot.errors import SqlglotError
+
+    from .catalog import load_catalog
+    from .column_lineage import extract_column_lineage, sort_records
+
+    catalog = load_catalog(args.catalog)
+    try:
+        if args.tiered:
+            from .tiered_lineage import extract_lineage_tiered
+
+            records, _ = extract_lineage_tiered(sql, catalog)
+        else:
+            records = extract_column_lineage(sql, catalog, scoped=not args.flat)
+    except (SqlglotError, RecursionError) as e:
+        _report_error(args.file, e)
+        return 1
+    out = _Output(args.format, LINEAGE_FIELDS)
+    for record in sort_records(records):
+        out.write(record)
+    return 0
+
+
+def cmd_cte(args):
+    """ Rewrites a T-SQL script's temp tables as CTEs; warnings go to stderr """
+    from .temptabletocte import convert_temp_tables_to_ctes
+
+    warnings = []
+    sys.stdout.write(convert_temp_tables_to_ctes(_read_text(args.file), engine=args.engine, warnings=warnings) + "\n")
+    for warning in warnings:
+        print(f"warning: {warning}", file=sys.stderr)
+    return 0
+
+
+def cmd_snapshot(args):
+    """ Normalizes an INFORMATION_SCHEMA CSV once into a memory-mapped catalog snapshot """
+    from .catalog_snapshot import write_snapshot
+
+    rows = write_snapshot(args.csv, args.output)
+    print(f"{rows} catalog rows written to {args.output}", file=sys.stderr)
+    return 0
+
+
+def cmd_graph(args):
+    """ Builds the column/tool lineage graph of a workflow directory and saves it """
+    from .lineage_graph import build_workflow_graph
+
+    errors = []
+    graph, stats = build_workflow_graph(args.root, args.catalog, args.manifest, args.processes, scoped=not args.flat,
+                                        macros=args.macros, macro_paths=args.macro_path,
+                                        on_error=lambda key, message: errors.append(key + (message,)))
+    graph.save(args.output)
+    for workflow, message in stats['failed']:
+        _report_error(workflow, message)
+    for error in errors:
+        _report_error(*error)
+    _report_macros(stats.get('macros'))
+    print(f"{stats['nodes']} nodes, {stats['edges']} edges written to {args.output}", file=sys.stderr)
+    return 1 if stats['failed'] or errors else 0
+
+
+def cmd_closure(args):
+    """ Upstream or downstream closure of graph nodes (columns as column, table.column, ...) """
+    from .lineage_graph import LineageGraph
+
+    graph = LineageGraph.load(args.graph)
+    out = _Output(args.format, ["node", "kind", "name"])
+    for name in args.nodes:
+        try:
+            if args.outputs:
+                rows = graph.outputs(name)
+            elif args.upstream:
+                rows = graph.upstream(name, args.kind, args.depth)
+            else:
+                rows = graph.downstream(name, args.kind, args.depth)
+        except KeyError as e:
+            _report_error(name, e.args[0])
+            return 1
+        for kind, node in rows:
+            out.write((name, kind, node))
+    return 0
+
+
+def cmd_serve(args):
+    """ Runs the lineage server until interrupted """
+    from .server import serve
+
+    where = args.socket or f"http://127.0.0.1:{args.port}"
+    print(f"lineage server listening on {where}", file=sys.stderr)
+    serve(args.catalog, args.port, args.socket, scoped=not args.flat, verbose=args.verbose)
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="lineage", description="SQL and column lineage for Alteryx workflows and SQL.")
+    parser.add_argument("--version", action="version", version=f"%(prog)s {__version__}")
+    commands = parser.add_subparsers(dest="command", metavar="COMMAND")
+
+    def add_format(command):
+        command.add_argument("--format", choices=("csv", "jsonl"), default="csv", help="output format (default: csv)")
+
+    workflows = commands.add_parser("workflows", help="extract SQL or column lineage from Alteryx workflows")
+    workflows.add_argument("paths", nargs="+", metavar="PATH", help="workflow file or directory to crawl")
+    workflows.add_argument("--catalog", help="catalog CSV or snapshot; without it the SQL itself is listed")
+    workflows.add_argument("--manifest", help="crawl manifest reused between runs (SQL listing only)")
+    workflows.add_argument("--processes", type=int, help="worker processes for directory crawls")
+    workflows.add_argument("--flat", action="store_true", help="use the flat alias-map resolver instead of the scoped one")
+    workflows.add_argument("--macros", action="store_true", help="include the SQL of called macros under caller/inner ToolID paths")
+    workflows.add_argument("--macro-path", action="append", default=[], metavar="DIR",
+                           help="directory to search for macros (repeatable)")
+    workflows.add_argument("--timeout", type=float, metavar="SECONDS",
+                           help="per-query time budget for directory crawls; slower queries are killed")
+    workflows.add_argument("--max-memory", type=int, metavar="MB",
+                           help="per-query memory budget (worker RSS growth) for directory crawls")
+    workflows.add_argument("--quarantine", metavar="FILE",
+                           help="append queries that exceed a budget to this JSON-lines file")
+    add_format(workflows)
+    workflows.set_defaults(handler=cmd_workflows)
+
+    sql = commands.add_parser("sql", help="column lineage of a SQL query")
+    sql.add_argument("file", nargs="?", help="SQL file (default: stdin)")
+    sql.add_argument("--catalog", help="catalog CSV or snapshot")
+    sql.add_argument("--tables", action="store_true", help="only list FROM/JOIN tables (regex, no catalog needed)")
+    sql.add_argument("--tiered", action="store_true", help="try the tokenizer fast path before sqlglot")
+    sql.add_argument("--flat", action="store_true", help="use the flat alias-map resolver instead of the scoped one")
+    add_format(sql)
+    sql.set_defaults(handler=cmd_sql)
+
+    cte = commands.add_parser("cte", help="convert a T-SQL script's temp tables to CTEs")
+    cte.add_argument("file", nargs="?", help="T-SQL file (default: stdin)")
+    cte.add_argument("--engine", choices=("regex", "tokens", "ast"), default="tokens", help="conversion engine (default: tokens)")
+    cte.set_defaults(handler=cmd_cte)
+
+    snapshot = commands.add_parser("snapshot", help="write a memory-mapped catalog snapshot from a CSV")
+    snapshot.add_argument("csv", help="INFORMATION_SCHEMA CSV")
+    snapshot.add_argument("output", help="snapshot file to write")
+    snapshot.set_defaults(handler=cmd_snapshot)
+
+    graph = commands.add_parser("graph", help="build the lineage graph of a workflow directory")
+    graph.add_argument("root", metavar="DIR", help="directory of workflows to crawl")
+    graph.add_argument("--catalog", required=True, help="catalog CSV or snapshot")
+    graph.add_argument("-o", "--output", required=True, help="graph file to write")
+    graph.add_argument("--manifest", help="crawl manifest reused between runs")
+    graph.add_argument("--processes", type=int, help="worker processes")
+    graph.add_argument("--flat", action="store_true", help="use the flat alias-map resolver instead of the scoped one")
+    graph.add_argument("--macros", action="store_true", help="include the SQL of called macros, feeding the calling tool")
+    graph.add_argument("--macro-path", action="append", default=[], metavar="DIR",
+                       help="directory to search for macros (repeatable)")
+    graph.set_defaults(handler=cmd_graph)
+
+    closure = commands.add_parser("closure", help="query a lineage graph for what depends on (or feeds) a node")
+    closure.add_argument("graph", help="graph file written by `lineage graph`")
+    closure.add_argument("nodes", nargs="+", metavar="NODE",
+                         help="column (column, table.column, schema.table.column, ...) or WORKFLOW|TOOL_ID")
+    closure.add_argument("--upstream", action="store_true", help="what the node depends on (default: what depends on it)")
+    closure.add_argument("--outputs", action="store_true", help="only downstream tools with no outgoing connection")
+    closure.add_argument("--kind", choices=("column", "tool"), help="only nodes of this kind")
+    closure.add_argument("--depth", type=int, help="maximum number of edges to follow")
+    add_format(closure)
+    closure.set_defaults(handler=cmd_closure)
+
+    serve = commands.add_parser("serve", help="serve lineage, table and CTE requests with a warm catalog and caches")
+    serve.add_argument("--catalog", help="catalog CSV or snapshot; needed for /lineage")
+    serve.add_argument("--port", type=int, default=8765, help="localhost port (default: 8765)")
+    serve.add_argument("--socket", metavar="PATH", help="listen on this Unix socket instead of a port")
+    serve.add_argument("--flat", action="store_true", help="default to the flat alias-map resolver")
+    serve.add_argument("--verbose", action="store_true", help="log every request to stderr")
+    serve.set_defaults(handler=cmd_serve)
+    return parser
+
+
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command is None:
+        parser.print_help()
+        return 0
+    try:
+        return args.handler(args)
+    except BrokenPipeError:
+        # Output piped into e.g. head: stop quietly, and keep the interpreter's
+        # final flush from raising again on the closed stdout
+        os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+        return 1
@@ -0,0 +1,262 @@
+from itertools import islice
+from multiprocessing import Pool
+
+from sqlglot import exp
+from sqlglot.errors import SqlglotError
+
+from . import profiling
+from .catalog import load_catalog
+from .parse_cache import parse_one
+from .profiling import count, phase
+from .scope_resolver import _QUERIES, _arg, _children, resolve_lineage, table_location, table_schema
+
+
+def resolve_column(col_name, alias, alias_map, catalog):
+    """ The rows a column reference reads: through alias_map when qualified, else the catalog """
+    col_name = col_name.lower()
+    if alias:
+        schema = alias_map.get(alias.lower())
+        return schema.get(col_name, frozenset()) if schema is not None else frozenset()
+    row = catalog.table_for_column(col_name)
+    return frozenset([(row[0], row[1], row[2], col_name)]) if row else frozenset()
+
+
+class _FlatResolver:
+    """ The flat alias-map resolver: one namespace of aliases for the whole statement.
+
+    alias_map maps CTE names, table aliases and derived-table aliases to an output
+    schema (column name -> frozenset of (db, schema, table, column) rows), as in
+    scope_resolver. Base-table schemas come from scope_resolver.table_schema, built
+    once per catalog; each CTE and derived table is resolved once, with * and
+    alias.* expanded from the cached schemas of its sources, and every later
+    reference shares that dict. A SELECT's columns are resolved as soon as its
+    sources are registered, so a later CTE reusing an alias cannot change them.
+    """
+
+    def __init__(self, catalog):
+        self.catalog = catalog
+        self.alias_map = {}
+        self.ctes = {}
+        self.records = set()
+
+    def build_alias_map(self, node):
+        """ Resolves the CTEs of node's WITH clause once each, in order """
+        with_ = _arg(node, "with")
+        if with_:
+            for cte in with_.expressions:
+                alias = cte.alias_or_name.lower()
+                self.ctes[alias] = self.alias_map[alias] = self.process_query(cte.this)
+
+    def process_query(self, query):
+        """ Registers the query's FROM/JOIN aliases, resolves its columns and returns its output schema """
+        if isinstance(query, exp.Subquery):
+            return self.process_query(query.this)
+        self.build_alias_map(query)
+        if isinstance(query, (exp.Union, exp.Except, exp.Intersect)):
+            left = self.process_query(query.this)
+            right = self.process_query(query.expression)
+            # Named after the left branch, lineage merged by position
+            return {name: rows | right_rows for (name, rows), right_rows in zip(left.items(), right.values())}
+        if not isinstance(query, exp.Select):
+            self.columns(query)
+            return {}
+
+        from_ = _arg(query, "from")
+        sources = [from_.this] + list(from_.expressions) if from_ else []
+        joins = query.args.get("joins") or []
+        sources.extend(join.this for join in joins)
+        aliases = []
+        for source in sources:
+            alias = source.alias_or_name.lower()
+            self.alias_map[alias] = self.source_schema(source)
+            aliases.append(alias)
+        outputs = self.process_projection(query.expressions, aliases)
+
+        # Join conditions, WHERE, GROUP BY, ... only record lineage
+        for join in joins:
+            for node in _children(join):
+                if node is not join.this:
+                    self.columns(node)
+        for key, value in query.args.items():
+            if key in ("with", "with_", "from", "from_", "joins", "expressions"):
+                continue
+            for node in value if isinstance(value, list) else [value]:
+                if isinstance(node, exp.Expression):
+                    self.columns(node)
+        return outputs
+
+    def process_projection(self, projection, sources=()):
+        """ Output schema of a SELECT list; * expands the sources (aliases), alias.* one of them """
+        outputs = {}
+        for proj in projection:
+            if isinstance(proj, exp.Star):
+                for source in sources:
+                    outputs.update(self.alias_map.get(source, {}))
+                count("schemas.star_expansions")
+                continue
+            if isinstance(proj, exp.Column) and isinstance(proj.this, exp.Star):
+                outputs.update(self.alias_map.get(proj.table.lower(), {}))
+                count("schemas.star_expansions")
+                continue
+            rows = set()
+            self.columns(proj, rows)
+            outputs[proj.alias_or_name.lower()] = frozenset(rows)
+        return outputs
+
+    def source_schema(self, source):
+        if isinstance(source, exp.Table) and isinstance(source.this, exp.Identifier):
+            name = source.name.lower()
+            if not source.args.get("db") and name in self.ctes:
+                return self.ctes[name]
+            return table_schema(self.catalog, table_location(self.catalog, source))
+        if isinstance(source, exp.Subquery):
+            return self.process_query(source.this)
+        self.columns(source)  # table functions, VALUES, ...: no schema, but their arguments read columns
+        return {}
+
+    def columns(self, node, rows=None):
+        """ Resolves every column under node into records (and rows); nested queries are processed in turn """
+        stack = [node]
+        while stack:
+            current = stack.pop()
+            if isinstance(current, exp.Column):
+                if not isinstance(current.this, exp.Star):
+                    resolved = self.resolve(current)
+                    if rows is not None:
+                        rows.update(resolved)
+            elif isinstance(current, _QUERIES):
+                for resolved in self.process_query(current).values():
+                    if rows is not None:
+                        rows.update(resolved)
+            elif not isinstance(current, exp.With):  # resolved by build_alias_map of the owning query
+                stack.extend(_children(current))
+
+    def resolve(self, column):
+        count("nodes.columns")
+        resolved = resolve_column(column.name, column.table, self.alias_map, self.catalog)
+        self.records.update(resolved)
+        return resolved
+
+    def process_statement(self, statement):
+        """ INSERT/UPDATE/DELETE/CREATE ... AS SELECT: the queries inside plus the statement's own tables """
+        self.build_alias_map(statement)
+        for table in statement.find_all(exp.Table):
+            alias = table.alias_or_name.lower()
+            if alias not in self.alias_map:
+                self.alias_map[alias] = self.source_schema(table)
+        self.columns(statement)
+
+
+def extract_column_lineage(sql, catalog, scoped=False):
+    """ Returns the set of (db, schema, table, column) rows one query reads.
+
+    scoped=True uses the single-traversal, per-scope resolver (scope_resolver.py)
+    instead of the flat alias map.
+    """
+    parsed = parse_one(sql)
+    if scoped:
+        with phase("resolve"):
+            return resolve_lineage(parsed, catalog)
+    resolver = _FlatResolver(catalog)
+    with phase("resolve"):
+        if isinstance(parsed, _QUERIES):
+            # The output columns count as read, including those that only arrive through * / alias.*
+            for rows in resolver.process_query(parsed).values():
+                resolver.records.update(rows)
+        else:
+            resolver.process_statement(parsed)
+    return resolver.records
+
+
+def sort_records(records):
+    """ Sorts lineage tuples, ordering unresolved (None) parts first """
+    return sorted(records, key=lambda row: tuple("" if v is None else v for v in row))
+
+
+# --- Batch API: each worker loads the catalog once and resolves chunks of queries ---
+
+_worker_catalog = None
+_worker_scoped = False
+_worker_profile = False
+
+
+def _init_worker(catalog_source, scoped=False, profile=False):
+    global _worker_catalog, _worker_scoped, _worker_profile
+    _worker_catalog = load_catalog(catalog_source)
+    _worker_scoped = scoped
+    _worker_profile = profile
+
+
+def _resolve_chunk(chunk):
+    rows = []
+    errors = []
+    profiler = profiling.enable() if _worker_profile else None
+    for query_id, sql in chunk:
+        try:
+            with profiling.span(query_id):
+                records = extract_column_lineage(sql, _worker_catalog, _worker_scoped)
+        except (SqlglotError, RecursionError) as e:
+            errors.append((query_id, str(e)))
+            continue
+        rows.extend((query_id,) + record for record in sort_records(records))
+    # Each chunk ships its own timings and spans back to the parent's profiler
+    report = profiling.disable().report(top=0, spans=True) if profiler else None
+    return rows, errors, report
+
+
+def _resolve_one(sql):
+    return sort_records(extract_column_lineage(sql, _worker_catalog, _worker_scoped))
+
+
+def _chunks(queries, chunksize):
+    queries = iter(queries)
+    while True:
+        chunk = list(islice(queries, chunksize))
+        if not chunk:
+            return
+        yield chunk
+
+
+def lineage_batch(queries, catalog_source, processes=None, chunksize=64, on_error=None, scoped=False,
+                  timeout=None, max_memory=None, quarantine=None):
+    """ Resolves an iterable of (query_id, sql) over a process pool.
+
+    Yields (query_id, db, schema, table, column) rows as chunks complete, so
+    rows of one query stay together but queries arrive out of input order.
+    catalog_source is anything load_catalog accepts; it is loaded once per
+    worker. Queries that fail to parse are reported to on_error(query_id, message).
+    scoped selects the per-scope resolver, as in extract_column_lineage.
+    When profiling is enabled in the caller, workers record a span per query
+    and their timings are merged into the caller's profiler. To keep millions
+    of rows compact, extend a lineage_table.LineageTable with the output.
+
+    With a timeout (seconds) or max_memory (bytes) per query, queries run on a
+    budget.BudgetedPool instead: a query over budget has its worker killed and
+    replaced, is reported to on_error and is appended to the quarantine file.
+    Worker timings are not merged into the caller's profiler on that path.
+    """
+    if timeout is not None or max_memory is not None:
+        from .budget import BudgetedPool
+
+        pool = BudgetedPool(_resolve_one, processes, timeout, max_memory, initializer=_init_worker,
+                            initargs=(catalog_source, scoped), chunksize=max(1, chunksize // 16),
+                            quarantine=quarantine)
+        for query_id, records, error in pool.imap(queries):
+            if error is not None:
+                if on_error:
+                    on_error(query_id, error)
+                continue
+            for record in records:
+                yield (query_id,) + record
+        return
+
+    profiler = profiling.active()
+    initargs = (catalog_source, scoped, profiler is not None)
+    with Pool(processes, initializer=_init_worker, initargs=initargs) as pool:
+        for rows, errors, report in pool.imap_unordered(_resolve_chunk, _chunks(queries, chunksize)):
+            if report:
+                profiler.merge(report)
+            if on_error:
+                for query_id, message in errors:
+                    on_error(query_id, message)
+            yield from rows
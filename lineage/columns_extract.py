@@ -2,17 +2,6 @@ import re
 import pandas as pd
 from collections import defaultdict
 
-# Provided column lookup
-column_lookup = {
-    "Database Name": ["profile", "profile", "profile", "profile", "profile"],
-    "Table Name": ["users", "users", "addresses", "addresses", "addresses"],
-    "Column Name": ["id", "name", "address", "id", "status"]
-}
-
-# Create DataFrame from the dictionary
-df_columns = pd.DataFrame(column_lookup)
-df_columns["Column Name"] = df_columns["Column Name"].str.lower()  # Normalize case
-
 
 def extract_columns_from_case(case_expr, table_aliases):
     """ Extracts columns from a nested CASE statement """
@@ -134,24 +123,36 @@ def extract_tables_and_columns(sql_query, df_columns):
 
     return pd.DataFrame(data)
 
-# **Example Query with Nested CASE Statements:**
-sql_query = """
-SELECT 
-    a.id, 
-    CASE 
-        WHEN b.status = 'active' THEN 
-            CASE 
-                WHEN a.name IS NOT NULL THEN b.address 
-                ELSE 'Unknown' 
-            END
-        ELSE 'Inactive'
-    END AS status_column
-FROM profile.users a 
-LEFT JOIN profile.addresses b ON a.id = b.id
-WHERE b.status = 'active'
-ORDER BY a.name
-"""
-
-df = extract_tables_and_columns(sql_query, df_columns)
-df = df[df['Database Name'].isin(list(df_columns['Database Name']))]
-print(df)
+if __name__ == "__main__":
+    # Provided column lookup
+    column_lookup = {
+        "Database Name": ["profile", "profile", "profile", "profile", "profile"],
+        "Table Name": ["users", "users", "addresses", "addresses", "addresses"],
+        "Column Name": ["id", "name", "address", "id", "status"]
+    }
+
+    # Create DataFrame from the dictionary
+    df_columns = pd.DataFrame(column_lookup)
+    df_columns["Column Name"] = df_columns["Column Name"].str.lower()  # Normalize case
+
+    # **Example Query with Nested CASE Statements:**
+    sql_query = """
+    SELECT 
+        a.id, 
+        CASE 
+            WHEN b.status = 'active' THEN 
+                CASE 
+                    WHEN a.name IS NOT NULL THEN b.address 
+                    ELSE 'Unknown' 
+                END
+            ELSE 'Inactive'
+        END AS status_column
+    FROM profile.users a 
+    LEFT JOIN profile.addresses b ON a.id = b.id
+    WHERE b.status = 'active'
+    ORDER BY a.name
+    """
+
+    df = extract_tables_and_columns(sql_query, df_columns)
+    df = df[df['Database Name'].isin(list(df_columns['Database Name']))]
+    print(df)
@@ -0,0 +1,276 @@
+""" Column lineage across Alteryx tool connections, as a CSR graph of integer node ids.
+
+Nodes are catalog columns ("db.schema.table.column", lower-cased) and workflow
+tools ("<workflow>|<tool_id>"). Edges point the way data flows: a column feeds
+every tool whose SQL reads it, and each Connection wires its origin tool to its
+destination. A macro's inner tool "12/5" feeds its calling tool "12".
+
+Node names are kept sorted in one string table, so a name is found by binary
+search, and edges are stored twice, grouped by source and by destination
+(offset array + neighbour array), so upstream and downstream closures are
+breadth-first searches over numpy slices.
+"""
+from array import array
+
+import numpy as np
+
+from .catalog_snapshot import map_arrays, write_arrays
+
+MAGIC = b"LINGRF01"
+
+COLUMN = 0
+TOOL = 1
+KIND_NAMES = ("column", "tool")
+
+_TOOL_SEPARATOR = "|"
+
+
+def tool_key(workflow, tool_id):
+    return f"{workflow}{_TOOL_SEPARATOR}{tool_id}"
+
+
+def column_key(db, schema, table, column):
+    """ Node name of a catalog column; missing db/schema parts are left out """
+    return ".".join(part.lower() for part in (db, schema, table, column) if part)
+
+
+class LineageGraphBuilder:
+    """ Collects nodes and edges with interned ids; build() freezes them into a LineageGraph """
+
+    def __init__(self):
+        self._ids = {}
+        self._kinds = array('b')
+        self._src = array('i')
+        self._dst = array('i')
+
+    def node(self, name, kind):
+        id_ = self._ids.get(name)
+        if id_ is None:
+            id_ = self._ids[name] = len(self._kinds)
+            self._kinds.append(kind)
+        return id_
+
+    def add_edge(self, src, dst):
+        self._src.append(src)
+        self._dst.append(dst)
+
+    def add_tool(self, workflow, tool_id):
+        name = tool_key(workflow, tool_id)
+        id_ = self._ids.get(name)
+        if id_ is None:
+            id_ = self.node(name, TOOL)
+            caller, _, _ = tool_id.rpartition('/')
+            if caller:
+                self.add_edge(id_, self.add_tool(workflow, caller))
+        return id_
+
+    def add_workflow(self, workflow, tool_ids, connections):
+        """ Tool nodes of one workflow and an edge per (origin, destination) connection """
+        for tool_id in tool_ids:
+            self.add_tool(workflow, tool_id)
+        for origin, destination in connections:
+            self.add_edge(self.add_tool(workflow, origin), self.add_tool(workflow, destination))
+
+    def add_read(self, workflow, tool_id, db, schema, table, column):
+        """ Edge from a column to a tool whose SQL reads it (one lineage_batch row) """
+        self.add_edge(self.node(column_key(db, schema, table, column), COLUMN), self.add_tool(workflow, tool_id))
+
+    def build(self):
+        names = list(self._ids)
+        order = np.array(sorted(range(len(names)), key=names.__getitem__), dtype=np.int64)
+        remap = np.empty(len(names), dtype=np.int32)
+        remap[order] = np.arange(len(names), dtype=np.int32)
+
+        # Deduplicated (src, dst) pairs in source order
+        src = remap[np.frombuffer(self._src, dtype=np.int32)].astype(np.int64)
+        dst = remap[np.frombuffer(self._dst, dtype=np.int32)].astype(np.int64)
+        pairs = np.unique((src << 32) | dst)
+        src = (pairs >> 32).astype(np.int32)
+        dst = (pairs & 0xFFFFFFFF).astype(np.int32)
+
+        encoded = [names[i].encode('utf-8') for i in order]
+        offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+        np.cumsum([len(b) for b in encoded], out=offsets[1:])
+        by_dst = np.argsort(dst, kind="stable")
+        return LineageGraph({
+            'string_offsets': offsets,
+            'string_data': np.frombuffer(b"".join(encoded), dtype=np.uint8),
+            'kinds': np.frombuffer(self._kinds, dtype=np.int8)[order],
+            'out_ptr': _offsets(src, len(names)),
+            'out_idx': dst,
+            'in_ptr': _offsets(dst, len(names)),
+            'in_idx': src[by_dst],
+        })
+
+
+def _offsets(ids, n):
+    ptr = np.zeros(n + 1, dtype=np.int64)
+    np.cumsum(np.bincount(ids, minlength=n), out=ptr[1:])
+    return ptr
+
+
+class LineageGraph:
+    """ Read-only lineage graph over CSR arrays; load() memory-maps a saved graph """
+
+    def __init__(self, arrays, mm=None):
+        self._offsets = arrays['string_offsets']
+        self._data = arrays['string_data']
+        self.kinds = arrays['kinds']
+        self.out_ptr = arrays['out_ptr']
+        self.out_idx = arrays['out_idx']
+        self.in_ptr = arrays['in_ptr']
+        self.in_idx = arrays['in_idx']
+        self._mm = mm
+        self._by_column_name = None
+
+    @classmethod
+    def load(cls, path):
+        mm, _, arrays = map_arrays(path, MAGIC)
+        return cls({name: np.frombuffer(mm, dtype=dtype, count=length, offset=start)
+                    for name, (start, dtype, length) in arrays.items()}, mm)
+
+    def save(self, path):
+        arrays = {
+            'string_offsets': self._offsets,
+            'string_data': self._data,
+            'kinds': self.kinds,
+            'out_ptr': self.out_ptr,
+            'out_idx': self.out_idx,
+            'in_ptr': self.in_ptr,
+            'in_idx': self.in_idx,
+        }
+        write_arrays(path, arrays, {'nodes': len(self), 'edges': self.edges}, MAGIC)
+
+    def close(self):
+        if self._mm is not None:
+            self._offsets = self._data = self.kinds = None
+            self.out_ptr = self.out_idx = self.in_ptr = self.in_idx = None
+            self._mm.close()
+            self._mm = None
+
+    def __len__(self):
+        return len(self.kinds)
+
+    @property
+    def edges(self):
+        return len(self.out_idx)
+
+    # --- Names ---
+
+    def _raw(self, id_):
+        return self._data[self._offsets[id_]:self._offsets[id_ + 1]].tobytes()
+
+    def name(self, id_):
+        return self._raw(id_).decode('utf-8')
+
+    def node_id(self, name):
+        """ Id of an exact node name via binary search over the sorted names, or None """
+        key = name.encode('utf-8')
+        lo, hi = 0, len(self)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._raw(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo if lo < len(self) and self._raw(lo) == key else None
+
+    def find(self, name):
+        """ Ids of a node name: an exact name, or a column given as column, table.column, ... """
+        id_ = self.node_id(name)
+        if id_ is not None:
+            return [id_]
+        dotted = name.lower()
+        if self._by_column_name is None:
+            # Built on the first partial lookup: last name part -> column node ids
+            self._by_column_name = {}
+            for id_ in np.flatnonzero(self.kinds == COLUMN).tolist():
+                self._by_column_name.setdefault(self.name(id_).rpartition('.')[2], []).append(id_)
+        return [id_ for id_ in self._by_column_name.get(dotted.rpartition('.')[2], ())
+                if self.name(id_).endswith("." + dotted) or self.name(id_) == dotted]
+
+    # --- Closures ---
+
+    def closure(self, ids, upstream=False, max_depth=None):
+        """ Sorted ids reachable from ids (excluding them) along edges, or against them if upstream """
+        ptr, idx = (self.in_ptr, self.in_idx) if upstream else (self.out_ptr, self.out_idx)
+        start = np.unique(np.asarray(ids, dtype=np.int64))
+        visited = np.zeros(len(self), dtype=bool)
+        visited[start] = True
+        frontier = start
+        depth = 0
+        while frontier.size and (max_depth is None or depth < max_depth):
+            lo = ptr[frontier]
+            lengths = ptr[frontier + 1] - lo
+            total = int(lengths.sum())
+            if not total:
+                break
+            # Concatenated neighbour slices idx[lo[i]:lo[i] + lengths[i]] without a Python loop
+            positions = np.repeat(lo - np.cumsum(lengths) + lengths, lengths) + np.arange(total)
+            neighbours = idx[positions]
+            frontier = np.unique(neighbours[~visited[neighbours]])
+            visited[frontier] = True
+            depth += 1
+        visited[start] = False
+        return np.flatnonzero(visited)
+
+    def _resolve(self, names):
+        if isinstance(names, str):
+            names = [names]
+        ids = []
+        for name in names:
+            found = self.find(name)
+            if not found:
+                raise KeyError(f"no lineage graph node matches {name!r}")
+            ids.extend(found)
+        return ids
+
+    def _named(self, ids, kind):
+        if kind is not None:
+            ids = ids[self.kinds[ids] == KIND_NAMES.index(kind)]
+        return [(KIND_NAMES[self.kinds[id_]], self.name(id_)) for id_ in ids.tolist()]
+
+    def downstream(self, names, kind=None, max_depth=None):
+        """ (kind, name) of every node that depends on the named nodes """
+        return self._named(self.closure(self._resolve(names), max_depth=max_depth), kind)
+
+    def upstream(self, names, kind=None, max_depth=None):
+        """ (kind, name) of every node the named nodes depend on """
+        return self._named(self.closure(self._resolve(names), upstream=True, max_depth=max_depth), kind)
+
+    def outputs(self, names):
+        """ (kind, name) of the downstream tools with no outgoing connection: the workflow outputs """
+        ids = self.closure(self._resolve(names))
+        ids = ids[(self.kinds[ids] == TOOL) & (self.out_ptr[ids + 1] == self.out_ptr[ids])]
+        return self._named(ids, None)
+
+
+def build_workflow_graph(root_dir, catalog_source, manifest_path=None, processes=None, scoped=True,
+                         macros=False, macro_paths=(), on_error=None):
+    """ Crawls root_dir and builds the lineage graph of its workflows.
+
+    The crawl (and its manifest) supplies each workflow's SQL and connections;
+    the SQL is resolved against the catalog with lineage_batch. Queries that
+    fail are reported to on_error((workflow, tool_id, sql_tag), message).
+    Returns (LineageGraph, crawl stats with 'nodes' and 'edges' added).
+    """
+    from .alteryx_crawl import crawl_manifest, manifest_sql
+    from .column_lineage import lineage_batch
+
+    manifest, stats = crawl_manifest(root_dir, manifest_path, processes)
+    results = manifest_sql(manifest, stats, macros, macro_paths)
+    builder = LineageGraphBuilder()
+    for workflow, entry in manifest.items():
+        builder.add_workflow(workflow, [row[0] for row in results[workflow]], entry['connections'])
+
+    queries = (((workflow, tool_id, sql_tag), sql)
+               for workflow, sql_results in results.items()
+               for tool_id, sql_tag, sql in sql_results)
+    for (workflow, tool_id, _), db, schema, table, column in lineage_batch(
+            queries, catalog_source, processes, on_error=on_error, scoped=scoped):
+        builder.add_read(workflow, tool_id, db, schema, table, column)
+
+    graph = builder.build()
+    stats['nodes'] = len(graph)
+    stats['edges'] = graph.edges
+    return graph, stats
@@ -0,0 +1,168 @@
+import sqlite3
+from itertools import islice
+
+# Names (databases, schemas, tables, columns) and query ids are interned once, so the
+# index tables are integer-only and each lookup is a range scan on a covering index.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS names (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE);
+CREATE TABLE IF NOT EXISTS queries (id INTEGER PRIMARY KEY, query TEXT NOT NULL UNIQUE);
+CREATE TABLE IF NOT EXISTS reads (
+    column_id INTEGER NOT NULL,
+    table_id INTEGER NOT NULL,
+    schema_id INTEGER NOT NULL,
+    db_id INTEGER NOT NULL,
+    query_id INTEGER NOT NULL,
+    PRIMARY KEY (column_id, table_id, schema_id, db_id, query_id)
+) WITHOUT ROWID;
+"""
+
+INDEXES = """
+CREATE INDEX IF NOT EXISTS reads_by_table ON reads (table_id, schema_id, db_id, column_id, query_id);
+CREATE INDEX IF NOT EXISTS reads_by_schema ON reads (schema_id, db_id, table_id, column_id, query_id);
+CREATE INDEX IF NOT EXISTS reads_by_query ON reads (query_id);
+"""
+
+_UNKNOWN = 0  # id stored for an unresolved (None) db or schema
+
+_SELECT = """
+SELECT q.query, d.name, s.name, t.name, c.name
+FROM reads r
+JOIN queries q ON q.id = r.query_id
+LEFT JOIN names d ON d.id = r.db_id
+LEFT JOIN names s ON s.id = r.schema_id
+JOIN names t ON t.id = r.table_id
+JOIN names c ON c.id = r.column_id
+"""
+
+
+class LineageIndex:
+    """ On-disk reverse index of (query, db, schema, table, column) lineage rows """
+
+    def __init__(self, path):
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA cache_size=-262144")  # 256 MB page cache for bulk loads
+        self.conn.executescript(SCHEMA)
+        self.conn.executescript(INDEXES)
+        self._names = None
+        self._queries = None
+
+    def close(self):
+        self.conn.close()
+
+    def __len__(self):
+        return self.conn.execute("SELECT COUNT(*) FROM reads").fetchone()[0]
+
+    # --- Interning ---
+
+    def _load_ids(self):
+        if self._names is None:
+            self._names = {name: id_ for id_, name in self.conn.execute("SELECT id, name FROM names")}
+            self._queries = {query: id_ for id_, query in self.conn.execute("SELECT id, query FROM queries")}
+
+    def _intern(self, ids, value, new_rows):
+        id_ = ids.get(value)
+        if id_ is None:
+            id_ = len(ids) + 1
+            ids[value] = id_
+            new_rows.append((id_, value))
+        return id_
+
+    # --- Writes ---
+
+    def add_rows(self, rows, batch_size=100000, bulk=None):
+        """ Bulk-inserts (query, db, schema, table, column) rows, e.g. straight from lineage_batch.
+
+        Names are interned in memory and rows are written in sorted executemany
+        batches inside one transaction. Duplicate rows are ignored. With bulk
+        (the default for an empty index) the secondary indexes are dropped for
+        the load and rebuilt once at the end. Returns the number of rows read.
+        """
+        self._load_ids()
+        names, queries = self._names, self._queries
+        if bulk is None:
+            bulk = self.conn.execute("SELECT 1 FROM reads LIMIT 1").fetchone() is None
+        count = 0
+        rows = iter(rows)
+        try:
+            with self.conn:
+                if bulk:
+                    for name in ('reads_by_table', 'reads_by_schema', 'reads_by_query'):
+                        self.conn.execute(f"DROP INDEX IF EXISTS {name}")
+                while True:
+                    batch = list(islice(rows, batch_size))
+                    if not batch:
+                        break
+                    count += len(batch)
+                    new_names, new_queries, encoded = [], [], []
+                    for query, db, schema, table, column in batch:
+                        encoded.append((
+                            self._intern(names, column.lower(), new_names),
+                            self._intern(names, table.lower(), new_names),
+                            self._intern(names, schema.lower(), new_names) if schema else _UNKNOWN,
+                            self._intern(names, db.lower(), new_names) if db else _UNKNOWN,
+                            self._intern(queries, str(query), new_queries),
+                        ))
+                    self.conn.executemany("INSERT INTO names VALUES (?, ?)", new_names)
+                    self.conn.executemany("INSERT INTO queries VALUES (?, ?)", new_queries)
+                    encoded.sort()  # primary key order keeps the B-tree inserts local
+                    self.conn.executemany("INSERT OR IGNORE INTO reads VALUES (?, ?, ?, ?, ?)", encoded)
+        except BaseException:
+            # The in-memory ids may now point at rolled back rows
+            self._names = self._queries = None
+            raise
+        finally:
+            self.conn.executescript(INDEXES)
+        return count
+
+    def remove_query(self, query):
+        """ Drops every row of one query, so it can be re-indexed after it changes """
+        row = self.conn.execute("SELECT id FROM queries WHERE query = ?", (str(query),)).fetchone()
+        if row:
+            with self.conn:
+                self.conn.execute("DELETE FROM reads WHERE query_id = ?", row)
+
+    # --- Reverse lookups ---
+
+    def _name_id(self, name):
+        row = self.conn.execute("SELECT id FROM names WHERE name = ?", (name.lower(),)).fetchone()
+        return row[0] if row else None
+
+    def lookup(self, column=None, table=None, schema=None, db=None):
+        """ Returns (query, db, schema, table, column) rows matching every name given.
+
+        The most selective name picks the index: column, then table, then schema.
+        """
+        given = [('column_id', column), ('table_id', table), ('schema_id', schema), ('db_id', db)]
+        conditions = []
+        params = []
+        for key, name in given:
+            if name is None:
+                continue
+            id_ = self._name_id(name)
+            if id_ is None:
+                return []
+            conditions.append(f"r.{key} = ?")
+            params.append(id_)
+        if not conditions:
+            raise ValueError("lookup needs at least one of column, table, schema or db")
+        sql = _SELECT + " WHERE " + " AND ".join(conditions) + " ORDER BY q.query, t.name, c.name"
+        return self.conn.execute(sql, params).fetchall()
+
+    def find(self, dotted):
+        """ Looks up a dotted name: column, table.column, db_or_schema.table.column or db.schema.table.column """
+        parts = dotted.split('.')
+        if len(parts) == 3:
+            # mg.loan.npdd may name either the database or the schema
+            rows = self.lookup(column=parts[2], table=parts[1], schema=parts[0])
+            rows += self.lookup(column=parts[2], table=parts[1], db=parts[0])
+            return sorted(set(rows), key=lambda row: tuple("" if v is None else v for v in row))
+        if not 1 <= len(parts) <= 4:
+            raise ValueError(f"Cannot interpret {dotted!r} as a column reference")
+        column, table, schema, db = (list(reversed(parts)) + [None] * 3)[:4]
+        return self.lookup(column=column, table=table, schema=schema, db=db)
+
+    def queries_reading(self, column=None, table=None, schema=None, db=None):
+        """ Distinct queries that read anything matching the given names """
+        return sorted({row[0] for row in self.lookup(column, table, schema, db)})
@@ -0,0 +1,127 @@
+import hashlib
+import sqlite3
+
+from sqlglot.errors import SqlglotError
+
+from .alteryx_crawl import crawl_workflows
+from .column_lineage import extract_column_lineage
+from .parse_cache import normalize_sql
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tools (
+    workflow TEXT NOT NULL,
+    tool_id TEXT NOT NULL,
+    sql_tag TEXT NOT NULL,
+    sql_hash TEXT NOT NULL,
+    error TEXT,
+    PRIMARY KEY (workflow, tool_id, sql_tag)
+);
+CREATE TABLE IF NOT EXISTS lineage (
+    workflow TEXT NOT NULL,
+    tool_id TEXT NOT NULL,
+    sql_tag TEXT NOT NULL,
+    db TEXT,
+    schema_name TEXT,
+    table_name TEXT,
+    column_name TEXT
+);
+CREATE INDEX IF NOT EXISTS lineage_by_tool ON lineage (workflow, tool_id, sql_tag);
+"""
+
+
+def sql_hash(sql):
+    """ Hash of whitespace/case-normalized SQL, so cosmetic edits do not trigger re-resolution """
+    return hashlib.sha256(normalize_sql(sql).encode('utf-8')).hexdigest()
+
+
+class LineageStore:
+    """ SQLite store of per-tool lineage keyed by (workflow, ToolID, sql tag, SQL hash) """
+
+    def __init__(self, path):
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        self.conn.close()
+
+    def update_workflow(self, workflow, sql_results, catalog, scoped=True, force=False):
+        """ Re-resolves only the tools of one workflow whose SQL hash changed.
+
+        sql_results is the (tool_id, sql_tag, sql) list the XML extractors return.
+        Tools missing from it are deleted. Returns per-run counts.
+        """
+        stats = {'tools': 0, 'unchanged': 0, 'resolved': 0, 'failed': 0, 'deleted': 0}
+        stored = {(tool_id, sql_tag): digest for tool_id, sql_tag, digest in self.conn.execute(
+            "SELECT tool_id, sql_tag, sql_hash FROM tools WHERE workflow = ?", (workflow,))}
+
+        current = {}
+        for tool_id, sql_tag, sql in sql_results:
+            current[(tool_id, sql_tag)] = sql
+
+        with self.conn:
+            for (tool_id, sql_tag), sql in current.items():
+                stats['tools'] += 1
+                digest = sql_hash(sql)
+                if not force and stored.get((tool_id, sql_tag)) == digest:
+                    stats['unchanged'] += 1
+                    continue
+
+                error = None
+                try:
+                    records = extract_column_lineage(sql, catalog, scoped=scoped)
+                except (SqlglotError, RecursionError) as e:
+                    records = ()
+                    error = str(e)
+                stats['failed' if error else 'resolved'] += 1
+
+                key = (workflow, tool_id, sql_tag)
+                self.conn.execute("DELETE FROM lineage WHERE workflow = ? AND tool_id = ? AND sql_tag = ?", key)
+                self.conn.executemany("INSERT INTO lineage VALUES (?, ?, ?, ?, ?, ?, ?)",
+                                      [key + record for record in records])
+                self.conn.execute("INSERT OR REPLACE INTO tools VALUES (?, ?, ?, ?, ?)", key + (digest, error))
+
+            for tool_id, sql_tag in stored.keys() - current.keys():
+                key = (workflow, tool_id, sql_tag)
+                self.conn.execute("DELETE FROM lineage WHERE workflow = ? AND tool_id = ? AND sql_tag = ?", key)
+                self.conn.execute("DELETE FROM tools WHERE workflow = ? AND tool_id = ? AND sql_tag = ?", key)
+                stats['deleted'] += 1
+        return stats
+
+    def remove_workflows_except(self, workflows):
+        """ Drops every stored workflow that is not in workflows; returns how many tools went with them """
+        workflows = set(workflows)
+        stale = [row[0] for row in self.conn.execute("SELECT DISTINCT workflow FROM tools")
+                 if row[0] not in workflows]
+        deleted = 0
+        with self.conn:
+            for workflow in stale:
+                deleted += self.conn.execute("DELETE FROM tools WHERE workflow = ?", (workflow,)).rowcount
+                self.conn.execute("DELETE FROM lineage WHERE workflow = ?", (workflow,))
+        return deleted
+
+    def lineage_for(self, workflow):
+        return self.conn.execute(
+            "SELECT tool_id, sql_tag, db, schema_name, table_name, column_name FROM lineage "
+            "WHERE workflow = ? ORDER BY tool_id, sql_tag", (workflow,)).fetchall()
+
+
+def refresh_lineage(store, root_dir, catalog, manifest_path=None, processes=None, scoped=True,
+                    macros=False, macro_paths=()):
+    """ Crawls root_dir and brings the store up to date, re-resolving only changed tools.
+
+    Returns a summary with the crawl counts and how many tools were skipped,
+    resolved, failed and deleted. macros/macro_paths are passed to
+    crawl_workflows, so macro SQL is stored under the calling tool's ToolID path.
+    """
+    results, crawl_stats = crawl_workflows(root_dir, manifest_path, processes, macros, macro_paths)
+    summary = {'tools': 0, 'unchanged': 0, 'resolved': 0, 'failed': 0, 'deleted': 0}
+    for workflow, sql_results in results.items():
+        for key, value in store.update_workflow(workflow, sql_results, catalog, scoped).items():
+            summary[key] += value
+    # Workflows that failed to parse this time keep their previous lineage
+    keep = set(results) | {path for path, error in crawl_stats['failed']}
+    summary['deleted'] += store.remove_workflows_except(keep)
+    summary['skipped_ratio'] = summary['unchanged'] / summary['tools'] if summary['tools'] else 0.0
+    summary['crawl'] = crawl_stats
+    return summary
@@ -0,0 +1,151 @@
+from array import array
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_COLUMNS = ("Database", "Schema", "Table", "Column")
+
+# Pending (not yet deduplicated) rows that trigger an automatic dedupe
+_DEDUPE_AT = 1 << 20
+
+
+def _pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError as e:
+        raise ImportError("Arrow/Parquet output needs pyarrow (pip install pyarrow)") from e
+    return pyarrow
+
+
+class LineageTable:
+    """ Columnar lineage rows: one int32 code array per column over that column's string dictionary.
+
+    Each distinct name is stored once, however many rows repeat it; None is code -1
+    (the pandas Categorical convention). Rows are appended as codes and deduplicated
+    on codes, so Python string tuples are never kept around. Values other than
+    str (lineage_batch's int or tuple query ids) are stored as their str(), so
+    sorting and Arrow export see one type.
+    """
+
+    def __init__(self, columns=DEFAULT_COLUMNS):
+        self.columns = tuple(columns)
+        self.names = [[] for _ in self.columns]   # per column: code -> string
+        self._codes = [{} for _ in self.columns]  # per column: string -> code
+        self._data = [array('i') for _ in self.columns]
+        self._deduped = True
+        self._dedupe_at = _DEDUPE_AT
+
+    @classmethod
+    def from_records(cls, records, columns=DEFAULT_COLUMNS):
+        table = cls(columns)
+        table.extend(records)
+        return table
+
+    def __len__(self):
+        self.dedupe()
+        return len(self._data[0])
+
+    def extend(self, rows):
+        """ Appends row tuples (e.g. an extractor's record set, or lineage_batch output) """
+        fields = list(zip(self._data, self._codes, self.names))
+        for row in rows:
+            for (data, codes, names), value in zip(fields, row):
+                if value is None:
+                    data.append(-1)
+                    continue
+                code = codes.get(value)
+                if code is None:
+                    if not isinstance(value, str):
+                        value = str(value)
+                        code = codes.get(value)
+                    if code is None:
+                        code = codes[value] = len(names)
+                        names.append(value)
+                data.append(code)
+        self._deduped = False
+        if len(self._data[0]) >= self._dedupe_at:
+            # Keeps memory proportional to distinct rows when a batch repeats itself
+            self.dedupe()
+            self._dedupe_at = max(_DEDUPE_AT, 2 * len(self._data[0]))
+
+    def codes(self):
+        """ (rows, columns) int32 matrix of codes, deduplicated """
+        self.dedupe()
+        if not self._data[0]:
+            return np.empty((0, len(self.columns)), dtype=np.int32)
+        return np.column_stack([np.frombuffer(column, dtype=np.int32) for column in self._data])
+
+    def dedupe(self):
+        if self._deduped:
+            return
+        if self._data[0]:
+            matrix = np.column_stack([np.frombuffer(column, dtype=np.int32) for column in self._data])
+            unique = np.unique(matrix, axis=0)
+            self._data = [array('i', unique[:, i].tobytes()) for i in range(len(self.columns))]
+        self._deduped = True
+
+    def clear(self):
+        """ Drops the rows but keeps the dictionary, so codes stay stable across flushes """
+        self._data = [array('i') for _ in self.columns]
+        self._deduped = True
+
+    def _sorted_codes(self):
+        # Same order as sort_records(): by string value per column, None first
+        matrix = self.codes()
+        if not len(matrix):
+            return matrix
+        ranked = np.empty(matrix.shape, dtype=np.int64)
+        for i, names in enumerate(self.names):
+            rank = np.empty(len(names) + 1, dtype=np.int64)
+            rank[np.argsort(np.array(names, dtype=object), kind="stable")] = np.arange(len(names))
+            rank[-1] = -1  # code -1 indexes the last slot
+            ranked[:, i] = rank[matrix[:, i]]
+        order = np.lexsort([ranked[:, i] for i in reversed(range(ranked.shape[1]))])
+        return matrix[order]
+
+    def to_frame(self, sort=True):
+        """ DataFrame with one Categorical column per field; drop-in for the extractors' df_result """
+        matrix = self._sorted_codes() if sort else self.codes()
+        return pd.DataFrame({
+            name: pd.Categorical.from_codes(matrix[:, i], categories=pd.Index(self.names[i], dtype=object))
+            for i, name in enumerate(self.columns)
+        })
+
+    def to_arrow(self, sort=False):
+        """ pyarrow Table of DictionaryArrays over this table's per-column dictionaries """
+        pa = _pyarrow()
+        matrix = self._sorted_codes() if sort else self.codes()
+        arrays = []
+        for i, names in enumerate(self.names):
+            codes = matrix[:, i]
+            indices = pa.array(codes, type=pa.int32(), mask=codes < 0)
+            arrays.append(pa.DictionaryArray.from_arrays(indices, pa.array(names, type=pa.string())))
+        return pa.Table.from_arrays(arrays, names=list(self.columns))
+
+
+class ParquetAppender:
+    """ Appends LineageTable contents to one Parquet file, a row group per flush """
+
+    def __init__(self, path, columns=DEFAULT_COLUMNS):
+        pa = _pyarrow()
+        self.path = path
+        schema = pa.schema([(name, pa.dictionary(pa.int32(), pa.string())) for name in columns])
+        self._writer = pa.parquet.ParquetWriter(path, schema)
+        self.rows = 0
+
+    def flush(self, table):
+        """ Writes the table's deduplicated rows and clears them from the table """
+        if len(table):
+            self._writer.write_table(table.to_arrow())
+            self.rows += len(table)
+        table.clear()
+
+    def close(self):
+        self._writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,130 @@
+import ntpath
+import os
+import re
+from collections import Counter
+
+from lxml import etree
+
+from .alteryx_xml import iter_alteryx_items
+from .profiling import count
+
+# C:\..., \\server\share\... : Windows-absolute macro paths saved by Designer
+_WINDOWS_ABSOLUTE = re.compile(r'^(?:[A-Za-z]:[\\/]|\\\\)')
+
+
+def scan_workflow(path):
+    """ (sql_results, macro_refs) of one workflow or macro file: [(tool_id, tag, sql)], [(tool_id, macro_path)] """
+    sql_results = []
+    macro_refs = []
+    for item in iter_alteryx_items(path):
+        if item[0] == "sql":
+            sql_results.append(item[1:])
+        elif item[0] == "macro":
+            macro_refs.append(item[1:])
+    return sql_results, macro_refs
+
+
+class MacroResolver:
+    """ Expands the macros a workflow calls into its SQL, parsing each macro file once.
+
+    A macro's SQL is attributed to the calling tool's ToolID path: SQL in tool 7
+    of a macro called by tool 12 becomes tool "12/7", and so on down nested
+    macros. Expansions are memoized per file, so a macro shared by hundreds of
+    workflows is parsed and expanded once per resolver. Macro paths are tried
+    relative to the calling file, then in search_paths (by relative path, then
+    by file name, which also covers Windows-absolute paths on another machine).
+    scans preloads {path: (sql_results, macro_refs)}, e.g. from a crawl, so
+    those files are not read again.
+    """
+
+    def __init__(self, search_paths=(), scans=None):
+        self.search_paths = [os.path.abspath(p) for p in search_paths]
+        self._scans = {os.path.abspath(path): scan for path, scan in (scans or {}).items()}
+        self._expanded = {}   # abs path -> expanded rows, ToolID paths relative to that file
+        self._located = {}    # (caller dir, macro ref) -> abs path or None
+        self._active = []     # files being expanded, for cycle detection
+        self.parsed = 0
+        self.references = 0
+        self.hits = Counter()     # macro path -> expansions served from the memo
+        self.missing = Counter()  # unresolved macro ref -> references
+        self.cycles = []          # (file, ..., file) chains that lead back to themselves
+        self.failed = {}          # macro path -> XML error
+
+    def scan(self, path):
+        scan = self._scans.get(path)
+        if scan is None:
+            try:
+                scan = scan_workflow(path)
+            except (etree.XMLSyntaxError, OSError) as e:
+                self.failed[path] = str(e)
+                scan = ([], [])
+            self._scans[path] = scan
+            self.parsed += 1
+            count("macros.parsed")
+        return scan
+
+    def locate(self, macro_ref, caller):
+        """ Absolute path of a macro referenced from the caller file, or None """
+        caller_dir = os.path.dirname(caller)
+        key = (caller_dir, macro_ref)
+        if key in self._located:
+            return self._located[key]
+
+        relative = macro_ref.replace('\\', os.sep) if os.sep != '\\' else macro_ref
+        name = ntpath.basename(macro_ref)
+        if _WINDOWS_ABSOLUTE.match(macro_ref) or os.path.isabs(relative):
+            candidates = [relative] + [os.path.join(d, name) for d in [caller_dir] + self.search_paths]
+        else:
+            candidates = ([os.path.join(d, relative) for d in [caller_dir] + self.search_paths]
+                          + [os.path.join(d, name) for d in self.search_paths])
+        found = next((os.path.abspath(c) for c in candidates if os.path.isfile(c)), None)
+        self._located[key] = found
+        return found
+
+    def expand(self, path):
+        """ [(tool_path, sql_tag, sql)] of a workflow, including the SQL of every macro it calls """
+        path = os.path.abspath(path)
+        rows = self._expanded.get(path)
+        if rows is not None:
+            return rows
+
+        self._active.append(path)
+        sql_results, macro_refs = self.scan(path)
+        rows = [tuple(row) for row in sql_results]
+        for tool_id, macro_ref in macro_refs:
+            self.references += 1
+            macro = self.locate(macro_ref, path)
+            if macro is None:
+                self.missing[macro_ref] += 1
+                continue
+            if macro in self._active:
+                # Cut the cycle here and report the chain; the files on it keep the
+                # expansion cut at this point for the rest of the run
+                self.cycles.append(tuple(self._active[self._active.index(macro):]) + (macro,))
+                continue
+            if macro in self._expanded:
+                self.hits[macro] += 1
+                count("macros.hits")
+            for inner_tool, sql_tag, sql in self.expand(macro):
+                rows.append((f"{tool_id}/{inner_tool}", sql_tag, sql))
+        self._active.pop()
+        self._expanded[path] = rows
+        return rows
+
+    def stats(self):
+        hits = sum(self.hits.values())
+        return {
+            'files_parsed': self.parsed,
+            'macro_references': self.references,
+            'cache_hits': hits,
+            'hit_rate': hits / self.references if self.references else 0.0,
+            'top_macros': self.hits.most_common(10),
+            'missing': dict(self.missing),
+            'cycles': list(self.cycles),
+            'failed': dict(self.failed),
+        }
+
+
+def expand_workflow(path, search_paths=()):
+    """ One-off MacroResolver.expand for a single workflow """
+    return MacroResolver(search_paths).expand(path)
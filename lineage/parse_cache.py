@@ -0,0 +1,136 @@
+import hashlib
+import os
+import pickle
+import re
+import sqlite3
+import threading
+from collections import OrderedDict
+
+import sqlglot
+
+from .profiling import count, phase
+
+# Quoted literals/identifiers keep their exact text; everything else is
+# whitespace-collapsed and lowercased before hashing
+# Comments are whole tokens kept verbatim, with the newline that ends a "--" comment,
+# so the newline is never collapsed into a space that would comment out the next line
+_NORMALIZE_PATTERN = re.compile(
+    r"""('(?:[^']|'')*'|"(?:[^"]|"")*"|\[[^\]]*\]|`[^`]*`)|(--[^\n]*\n?|/\*.*?\*/)|(\s+)|([^'"\[`\s/-]+|.)""",
+    re.DOTALL
+)
+
+
+def normalize_sql(sql):
+    """ Whitespace/case-normalizes SQL outside of quoted strings, identifiers and comments """
+    parts = []
+    for quoted, comment, space, text in _NORMALIZE_PATTERN.findall(sql.strip()):
+        if quoted or comment:
+            parts.append(quoted or comment)
+        elif space:
+            parts.append(' ')
+        else:
+            parts.append(text.lower())
+    return ''.join(parts)
+
+
+def cache_key(sql, dialect=None):
+    payload = f"{sqlglot.__version__}\0{dialect or ''}\0{normalize_sql(sql)}"
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class ParseCache:
+    """ Two-tier cache in front of sqlglot.parse_one: a bounded in-process LRU plus an optional SQLite store.
+
+    Cached ASTs are shared between callers; copy() one before transforming it.
+    """
+
+    def __init__(self, maxsize=4096, path=None):
+        self.maxsize = maxsize
+        self.path = path
+        self._lru = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+    def _store(self):
+        if self._db is None and self.path:
+            self._db = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("CREATE TABLE IF NOT EXISTS asts (key TEXT PRIMARY KEY, ast BLOB NOT NULL)")
+        return self._db
+
+    def _remember(self, key, expression):
+        self._lru[key] = expression
+        if len(self._lru) > self.maxsize:
+            self._lru.popitem(last=False)
+
+    def parse_one(self, sql, dialect=None):
+        key = cache_key(sql, dialect)
+
+        with self._lock:
+            expression = self._lru.get(key)
+            if expression is not None:
+                self._lru.move_to_end(key)
+                self.memory_hits += 1
+                count("cache.memory_hits")
+                return expression
+
+            db = self._store()
+            if db is not None:
+                row = db.execute("SELECT ast FROM asts WHERE key = ?", (key,)).fetchone()
+                if row:
+                    expression = pickle.loads(row[0])
+                    self._remember(key, expression)
+                    self.disk_hits += 1
+                    count("cache.disk_hits")
+                    return expression
+
+        count("cache.misses")
+        with phase("parse"):
+            expression = sqlglot.parse_one(sql, read=dialect)
+
+        with self._lock:
+            self.misses += 1
+            self._remember(key, expression)
+            db = self._store()
+            if db is not None:
+                try:
+                    blob = pickle.dumps(expression, protocol=pickle.HIGHEST_PROTOCOL)
+                except RecursionError:
+                    blob = None  # too deep to pickle; keep it in memory only
+                if blob is not None:
+                    with db:
+                        db.execute("INSERT OR IGNORE INTO asts (key, ast) VALUES (?, ?)", (key, blob))
+        return expression
+
+    def stats(self):
+        lookups = self.memory_hits + self.disk_hits + self.misses
+        return {
+            'memory_hits': self.memory_hits,
+            'disk_hits': self.disk_hits,
+            'misses': self.misses,
+            'hit_rate': (self.memory_hits + self.disk_hits) / lookups if lookups else 0.0,
+            'entries': len(self._lru),
+        }
+
+    def clear(self):
+        with self._lock:
+            self._lru.clear()
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
+
+
+# Process-wide cache used by the extractors; set LINEAGE_PARSE_CACHE to a file path
+# to enable the on-disk tier (shared by batch workers)
+default_cache = ParseCache(path=os.environ.get("LINEAGE_PARSE_CACHE"))
+
+
+def parse_one(sql, dialect=None):
+    """ Drop-in replacement for sqlglot.parse_one that goes through default_cache """
+    return default_cache.parse_one(sql, dialect)
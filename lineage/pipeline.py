@@ -0,0 +1,293 @@
+import asyncio
+import inspect
+import io
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from time import perf_counter
+
+from lxml import etree
+from sqlglot.errors import SqlglotError
+
+from .alteryx_crawl import iter_workflow_files
+from .alteryx_xml import iter_sql_from_alteryx_xml
+from .catalog import load_catalog
+from .column_lineage import extract_column_lineage, sort_records
+
+_DONE = object()  # end-of-stream marker, one per downstream worker
+
+
+class Stage:
+    """ One pipeline step: `workers` tasks pulling items from a bounded input queue.
+
+    fn takes one item and returns the next item, or None to drop it. It runs
+    in `executor` (a thread or process pool) when given, is awaited when it is a
+    coroutine function, and is called inline otherwise. Items are tuples whose
+    first element identifies them in the error list.
+    """
+
+    def __init__(self, name, fn, workers=1, executor=None):
+        self.name = name
+        self.fn = fn
+        self.workers = workers
+        self.executor = executor
+        self.items = 0
+        self.errors = []          # (item key, message)
+        self.busy = 0.0           # seconds inside fn, summed over workers
+        self.wait_input = 0.0     # seconds idle on an empty input queue
+        self.wait_output = 0.0    # seconds blocked on a full output queue (backpressure)
+        self.max_depth = 0
+        self._depth_total = 0
+        self._depth_samples = 0
+
+    async def _call(self, item):
+        if self.executor is not None:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, self.fn, item)
+        if inspect.iscoroutinefunction(self.fn):
+            return await self.fn(item)
+        return self.fn(item)
+
+    async def _work(self, inbox, outbox):
+        while True:
+            start = perf_counter()
+            item = await inbox.get()
+            self.wait_input += perf_counter() - start
+            if item is _DONE:
+                return
+            depth = inbox.qsize()
+            self.max_depth = max(self.max_depth, depth)
+            self._depth_total += depth
+            self._depth_samples += 1
+
+            start = perf_counter()
+            try:
+                result = await self._call(item)
+            except Exception as e:
+                self.errors.append((item[0], f"{type(e).__name__}: {e}"))
+                continue
+            finally:
+                self.busy += perf_counter() - start
+            self.items += 1
+
+            if result is not None and outbox is not None:
+                start = perf_counter()
+                await outbox.put(result)
+                self.wait_output += perf_counter() - start
+
+    async def run(self, inbox, outbox, downstream_workers):
+        await asyncio.gather(*(self._work(inbox, outbox) for _ in range(self.workers)))
+        if outbox is not None:
+            for _ in range(downstream_workers):
+                await outbox.put(_DONE)
+
+    def summary(self):
+        return {
+            'workers': self.workers,
+            'items': self.items,
+            'errors': len(self.errors),
+            'busy_s': round(self.busy, 3),
+            'wait_input_s': round(self.wait_input, 3),
+            'wait_output_s': round(self.wait_output, 3),
+            'max_queue': self.max_depth,
+            'mean_queue': round(self._depth_total / self._depth_samples, 2) if self._depth_samples else 0.0,
+        }
+
+
+async def run_pipeline(source, stages, queue_size=64):
+    """ Streams items from the (blocking) source iterable through the stages.
+
+    Stages are joined by queues of at most queue_size items, so a slow stage
+    holds back the ones before it instead of letting work pile up in memory.
+    The source is iterated in a thread. Returns the run summary.
+    """
+    loop = asyncio.get_running_loop()
+    queues = [asyncio.Queue(queue_size) for _ in stages]
+    fed = {'items': 0, 'wait_output_s': 0.0}
+
+    async def feed():
+        items = iter(source)
+        while True:
+            item = await loop.run_in_executor(None, next, items, _DONE)
+            if item is _DONE:
+                break
+            start = perf_counter()
+            await queues[0].put(item)
+            fed['wait_output_s'] += perf_counter() - start
+            fed['items'] += 1
+        for _ in range(stages[0].workers):
+            await queues[0].put(_DONE)
+
+    start = perf_counter()
+    tasks = [feed()]
+    for i, stage in enumerate(stages):
+        last = i == len(stages) - 1
+        outbox = None if last else queues[i + 1]
+        downstream = 0 if last else stages[i + 1].workers
+        tasks.append(stage.run(queues[i], outbox, downstream))
+    await asyncio.gather(*tasks)
+
+    fed['wait_output_s'] = round(fed['wait_output_s'], 3)
+    return {
+        'seconds': round(perf_counter() - start, 3),
+        'source': fed,
+        'stages': {stage.name: stage.summary() for stage in stages},
+        'errors': {stage.name: stage.errors for stage in stages if stage.errors},
+    }
+
+
+def format_summary(summary):
+    """ Text table of a run_pipeline summary """
+    lines = [f"pipeline: {summary['seconds']:.3f}s, {summary['source']['items']} items in"]
+    if 'peak_bytes_in_flight' in summary:
+        lines[0] += f", peak {summary['peak_bytes_in_flight'] / (1 << 20):.1f} MB read ahead"
+    lines.append(f"{'stage':<10} {'workers':>7} {'items':>7} {'errors':>6} {'busy s':>9} "
+                 f"{'wait in s':>9} {'wait out s':>10} {'max q':>6} {'mean q':>7}")
+    for name, s in summary['stages'].items():
+        lines.append(f"{name:<10} {s['workers']:>7} {s['items']:>7} {s['errors']:>6} {s['busy_s']:>9.3f} "
+                     f"{s['wait_input_s']:>9.3f} {s['wait_output_s']:>10.3f} {s['max_queue']:>6} {s['mean_queue']:>7.2f}")
+    return "\n".join(lines)
+
+
+# --- Workflow crawl stages: read (threads) -> extract + lineage (processes) -> write ---
+
+_worker_catalog = None
+_worker_scoped = True
+
+
+def _init_worker(catalog_source, scoped):
+    global _worker_catalog, _worker_scoped
+    _worker_catalog = load_catalog(catalog_source)
+    _worker_scoped = scoped
+
+
+class _ByteBudget:
+    """ Blocks readers while more than `limit` bytes of file contents are in flight.
+
+    A file larger than the limit is still let through once nothing else is
+    in flight, so the peak is max(limit, largest file) plus one file per reader.
+    """
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.used = 0
+        self.peak = 0
+        self._cond = threading.Condition()
+
+    def acquire(self, size):
+        with self._cond:
+            while self.used and self.used + size > self.limit:
+                self._cond.wait()
+            self.used += size
+            self.peak = max(self.peak, self.used)
+
+    def release(self, size):
+        with self._cond:
+            self.used -= size
+            self._cond.notify_all()
+
+
+def _read_file(item, budget):
+    path, size, _ = item  # size as seen by the crawl; the same amount is released after extraction
+    budget.acquire(size)
+    try:
+        with open(path, 'rb') as f:
+            return path, f.read(), size
+    except BaseException:
+        budget.release(size)
+        raise
+
+
+def _extract_sql(item):
+    path, data = item
+    try:
+        return path, list(iter_sql_from_alteryx_xml(io.BytesIO(data))), None
+    except etree.XMLSyntaxError as e:
+        return path, [], str(e)
+
+
+def _resolve_workflow(item):
+    # Parsing and resolving share a stage: handing ASTs between processes would
+    # cost more in pickling than the parse itself
+    path, sql_results, error = item
+    rows = []
+    errors = [(None, None, error)] if error else []
+    for tool_id, sql_tag, sql in sql_results:
+        try:
+            records = extract_column_lineage(sql, _worker_catalog, _worker_scoped)
+        except (SqlglotError, RecursionError) as e:
+            errors.append((tool_id, sql_tag, str(e)))
+            continue
+        rows.extend((tool_id, sql_tag) + record for record in sort_records(records))
+    return path, sql_results, rows, errors
+
+
+async def crawl_lineage_async(root_dir, catalog_source, on_result=None, readers=8, extractors=None,
+                              resolvers=None, writers=1, queue_size=64, scoped=True, max_bytes=256 << 20):
+    """ Pipelined crawl: file reads, XML extraction, lineage and writing all overlap.
+
+    Besides the queue_size bound on items, readers wait while more than
+    max_bytes of file contents are read but not yet extracted, so a run of
+    very large workflows cannot fill memory.
+
+    on_result(path, sql_results, rows, errors) is called once per workflow from
+    the writer threads; rows are (tool_id, sql_tag, db, schema, table, column)
+    and errors are (tool_id, sql_tag, message), with tool_id None for a file that
+    is not valid XML. Without on_result the results are collected and returned
+    as {path: (sql_results, rows, errors)}. Returns (results, summary).
+    """
+    cpus = os.cpu_count() or 1
+    extractors = extractors or max(1, cpus // 4)
+    resolvers = resolvers or max(1, cpus - extractors)
+
+    results = None
+    if on_result is None:
+        results = {}
+
+        def on_result(path, sql_results, rows, errors):
+            results[path] = (sql_results, rows, errors)
+
+    def write(item):
+        on_result(*item)
+
+    loop = asyncio.get_running_loop()
+    budget = _ByteBudget(max_bytes)
+
+    async def extract(item):
+        path, data, size = item
+        try:
+            return await loop.run_in_executor(cpu_pool, _extract_sql, (path, data))
+        finally:
+            budget.release(size)
+
+    with ThreadPoolExecutor(readers) as read_pool, \
+            ThreadPoolExecutor(writers) as write_pool, \
+            ProcessPoolExecutor(extractors + resolvers, initializer=_init_worker,
+                                initargs=(catalog_source, scoped)) as cpu_pool:
+        stages = [
+            Stage("read", partial(_read_file, budget=budget), readers, read_pool),
+            Stage("extract", extract, extractors),
+            Stage("lineage", _resolve_workflow, resolvers, cpu_pool),
+            Stage("write", write, writers, write_pool),
+        ]
+        walk_errors = []
+        source = iter_workflow_files(root_dir, on_error=lambda path, message: walk_errors.append((path, message)))
+        summary = await run_pipeline(source, stages, queue_size)
+    summary['peak_bytes_in_flight'] = budget.peak
+    if walk_errors:
+        summary['errors']['walk'] = walk_errors
+    return results, summary
+
+
+def crawl_lineage(root_dir, catalog_source, **kwargs):
+    """ Synchronous wrapper around crawl_lineage_async """
+    return asyncio.run(crawl_lineage_async(root_dir, catalog_source, **kwargs))
+
+
+if __name__ == "__main__":
+    import sys
+
+    results, summary = crawl_lineage(sys.argv[1], sys.argv[2])
+    for path, (sql_results, rows, errors) in sorted((results or {}).items()):
+        print(f"{path}: {len(sql_results)} queries, {len(rows)} lineage rows, {len(errors)} errors")
+    print(format_summary(summary))
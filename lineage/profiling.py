@@ -0,0 +1,177 @@
+""" Opt-in timers and counters for the lineage pipeline.
+
+Nothing is recorded until enable() is called (or LINEAGE_PROFILE names a
+report file), so the hooks cost one global check when profiling is off.
+Phases are timed inclusively: a phase nested in another counts in both.
+"""
+import atexit
+import json
+import os
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager, nullcontext
+
+_NULL = nullcontext()
+_active = None
+
+
+class Profiler:
+    """ Accumulates phase timings and counters, overall and per query span """
+
+    def __init__(self):
+        self.phases = defaultdict(lambda: [0, 0.0])  # name -> [calls, seconds]
+        self.counters = defaultdict(int)
+        self.spans = []
+        self._local = threading.local()  # the span open on this thread, if any
+
+    def _span(self):
+        return getattr(self._local, 'span', None)
+
+    def add_time(self, name, seconds):
+        entry = self.phases[name]
+        entry[0] += 1
+        entry[1] += seconds
+        span = self._span()
+        if span is not None:
+            span['phases'][name] = span['phases'].get(name, 0.0) + seconds
+
+    def add_count(self, name, n=1):
+        self.counters[name] += n
+        span = self._span()
+        if span is not None:
+            span['counters'][name] = span['counters'].get(name, 0) + n
+
+    @contextmanager
+    def phase(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    @contextmanager
+    def span(self, query_id):
+        """ Attributes everything recorded inside to query_id """
+        outer = self._span()
+        span = {'id': query_id, 'seconds': 0.0, 'phases': {}, 'counters': {}}
+        self._local.span = span
+        start = time.perf_counter()
+        try:
+            yield span
+        except BaseException as e:
+            span['error'] = f"{type(e).__name__}: {e}"
+            raise
+        finally:
+            span['seconds'] = time.perf_counter() - start
+            self._local.span = outer
+            self.spans.append(span)
+
+    def merge(self, report):
+        """ Folds in a report() from another profiler, e.g. one returned by a worker process """
+        for name, entry in report['phases'].items():
+            self.phases[name][0] += entry['calls']
+            self.phases[name][1] += entry['seconds']
+        for name, n in report['counters'].items():
+            self.counters[name] += n
+        self.spans.extend(report.get('spans', ()))
+
+    def report(self, top=20, spans=False):
+        """ JSON-ready summary; the top slowest spans are always included, all of them with spans=True """
+        report = {
+            'phases': {name: {'calls': calls, 'seconds': round(seconds, 6)}
+                       for name, (calls, seconds) in sorted(self.phases.items(), key=lambda item: -item[1][1])},
+            'counters': dict(sorted(self.counters.items())),
+            'queries': len(self.spans),
+            'slowest': sorted(self.spans, key=lambda span: span['seconds'], reverse=True)[:top],
+        }
+        if spans:
+            report['spans'] = self.spans
+        return report
+
+    def write_report(self, path, top=20):
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.report(top), f, indent=2, default=str)
+
+    def write_spans(self, path):
+        """ One JSON line per query span, for sorting/filtering a large batch afterwards """
+        with open(path, 'w', encoding='utf-8') as f:
+            for span in self.spans:
+                f.write(json.dumps(span, default=str) + '\n')
+
+
+def enable():
+    """ Starts recording into a fresh process-wide profiler and returns it """
+    global _active
+    _active = Profiler()
+    return _active
+
+
+def disable():
+    """ Stops recording and returns the profiler that was active, if any """
+    global _active
+    profiler, _active = _active, None
+    return profiler
+
+
+def active():
+    return _active
+
+
+@contextmanager
+def profiled():
+    """ with profiled() as profiler: ... records only inside the block """
+    global _active
+    outer = _active
+    profiler = enable()
+    try:
+        yield profiler
+    finally:
+        _active = outer
+
+
+# --- Hooks used by the extractors; all of them are no-ops while profiling is off ---
+
+def phase(name):
+    return _NULL if _active is None else _active.phase(name)
+
+
+def count(name, n=1):
+    if _active is not None:
+        _active.add_count(name, n)
+
+
+def span(query_id):
+    return _NULL if _active is None else _active.span(query_id)
+
+
+def laps(prefix):
+    """ Returns lap(step) which times the code since the previous lap as phase prefix.step.
+
+    Handy for long functions made of "# --- Step N ---" blocks, which can then
+    be timed without re-indenting them.
+    """
+    if _active is None:
+        return _no_lap
+    profiler = _active
+    last = [time.perf_counter()]
+
+    def lap(step):
+        now = time.perf_counter()
+        profiler.add_time(f"{prefix}.{step}", now - last[0])
+        last[0] = now
+    return lap
+
+
+def _no_lap(step):
+    pass
+
+
+def _write_at_exit(path):
+    if _active is not None:
+        _active.write_report(path)
+
+
+if os.environ.get("LINEAGE_PROFILE"):
+    enable()
+    atexit.register(_write_at_exit, os.environ["LINEAGE_PROFILE"])
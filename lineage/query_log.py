@@ -0,0 +1,138 @@
+import hashlib
+import re
+from collections import Counter
+
+import pandas as pd
+
+from .column_lineage import lineage_batch, sort_records
+from .profiling import count, phase
+
+# Fingerprinting steps, applied in order to every statement of a chunk. Comments go
+# first (string literals are matched so a "--" inside one survives), then literals
+# become "?", IN/VALUES lists of placeholders collapse to one, and whitespace and
+# case are normalized.
+_FINGERPRINT_STEPS = (
+    (re.compile(r"('(?:[^']|'')*')|--[^\n]*|/\*.*?\*/", re.DOTALL), r"\1"),
+    (re.compile(r"'(?:[^']|'')*'"), "?"),
+    (re.compile(r"\b0x[0-9a-fA-F]+\b|\b\d+(?:\.\d+)?(?:[eE][+-]?\d+)?\b"), "?"),
+    (re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)"), "(?)"),
+    (re.compile(r"\s+"), " "),
+)
+
+DEFAULT_CHUNKSIZE = 100_000
+
+
+def fingerprint_sql(sql):
+    """ Literal-, whitespace- and case-normalized template text of one statement """
+    for pattern, repl in _FINGERPRINT_STEPS:
+        sql = pattern.sub(repl, sql)
+    return sql.strip().lower()
+
+
+def fingerprint_series(sql):
+    """ fingerprint_sql over a whole Series of statements, as pandas string operations """
+    for pattern, repl in _FINGERPRINT_STEPS:
+        sql = sql.str.replace(pattern, repl, regex=True)
+    return sql.str.strip().str.lower()
+
+
+def fingerprint_id(template):
+    """ Short stable id for a fingerprint template, used as the lineage query_id """
+    return hashlib.blake2b(template.encode('utf-8'), digest_size=8).hexdigest()
+
+
+def iter_log_chunks(path, sql_column="query_text", chunksize=DEFAULT_CHUNKSIZE):
+    """ Yields the SQL column of a CSV or JSONL query log as Series of at most chunksize rows.
+
+    Compression (.gz, .bz2, .zip, .xz, .zst) is inferred from the file name; only
+    the SQL column is kept, so a chunk's memory does not depend on the log width.
+    """
+    name = path.lower()
+    for suffix in ('.gz', '.bz2', '.zip', '.xz', '.zst'):
+        if name.endswith(suffix):
+            name = name[:-len(suffix)]
+    if name.endswith(('.jsonl', '.ndjson', '.json')):
+        reader = pd.read_json(path, lines=True, chunksize=chunksize, dtype=False)
+    else:
+        reader = pd.read_csv(path, usecols=[sql_column], chunksize=chunksize, dtype=str)
+    with reader:
+        for chunk in reader:
+            yield chunk[sql_column]
+
+
+class QueryLogIngest:
+    """ Collapses a query log stream to distinct fingerprints with execution counts.
+
+    Only one sample statement per fingerprint is kept, so memory grows with the
+    number of distinct templates, not with the number of log rows. resolve() then
+    runs each sample through the lineage path exactly once.
+    """
+
+    def __init__(self):
+        self.executions = Counter()  # template -> executions
+        self.samples = {}            # template -> first statement seen
+        self.statements = 0
+        self.chunks = 0
+
+    def add_chunk(self, sql):
+        """ Counts one Series (or iterable) of SQL statements """
+        sql = pd.Series(sql, dtype=object).dropna()
+        sql = sql[sql.str.strip() != ""]
+        if sql.empty:
+            return
+        with phase("log.fingerprint"):
+            templates = fingerprint_series(sql)
+        with phase("log.count"):
+            self.executions.update(templates.value_counts().to_dict())
+            first = ~templates.duplicated()
+            for template, statement in zip(templates[first], sql[first]):
+                if template not in self.samples:
+                    self.samples[template] = statement
+        self.statements += len(sql)
+        self.chunks += 1
+        count("log.statements", len(sql))
+
+    def add_file(self, path, sql_column="query_text", chunksize=DEFAULT_CHUNKSIZE):
+        for chunk in iter_log_chunks(path, sql_column, chunksize):
+            self.add_chunk(chunk)
+
+    def resolve(self, catalog_source, processes=None, scoped=True, on_error=None):
+        """ Yields (fingerprint, executions, db, schema, table, column) rows.
+
+        Each distinct fingerprint is parsed and resolved once over lineage_batch's
+        process pool, using the first statement seen for it. Fingerprints that fail
+        to parse are reported to on_error(fingerprint, message).
+        """
+        templates = {fingerprint_id(template): template for template in self.samples}
+        queries = ((fp, self.samples[template]) for fp, template in templates.items())
+        for fp, *record in lineage_batch(queries, catalog_source, processes=processes,
+                                         on_error=on_error, scoped=scoped):
+            yield (fp, self.executions[templates[fp]], *record)
+
+    def to_frame(self, catalog_source, processes=None, scoped=True, on_error=None):
+        """ resolve() as a DataFrame, sorted like sort_records """
+        rows = sort_records(self.resolve(catalog_source, processes, scoped, on_error))
+        return pd.DataFrame(rows, columns=["Fingerprint", "Executions", "Database", "Schema", "Table", "Column"])
+
+    def templates(self):
+        """ DataFrame of fingerprint, executions, template and sample statement, busiest first """
+        rows = [(fingerprint_id(template), executions, template, self.samples[template])
+                for template, executions in self.executions.most_common()]
+        return pd.DataFrame(rows, columns=["Fingerprint", "Executions", "Template", "Sample"])
+
+    def stats(self):
+        return {
+            'statements': self.statements,
+            'chunks': self.chunks,
+            'fingerprints': len(self.samples),
+            'dedup_ratio': self.statements / len(self.samples) if self.samples else 0.0,
+        }
+
+
+def ingest_query_logs(paths, catalog_source, sql_column="query_text", chunksize=DEFAULT_CHUNKSIZE,
+                      processes=None, scoped=True, on_error=None):
+    """ Streams the logs through QueryLogIngest and returns (lineage DataFrame, ingest) """
+    ingest = QueryLogIngest()
+    for path in paths:
+        ingest.add_file(path, sql_column, chunksize)
+    return ingest.to_frame(catalog_source, processes, scoped, on_error), ingest
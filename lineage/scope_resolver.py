@@ -0,0 +1,247 @@
+import weakref
+
+from sqlglot import exp
+
+from .parse_cache import parse_one
+from .profiling import count
+
+_QUERIES = (exp.Select, exp.Union, exp.Except, exp.Intersect)
+
+# catalog -> {(db, schema, table): output schema}, so a base table's columns are
+# read from the catalog once however many queries (and CTEs) reference it
+_table_schemas = weakref.WeakKeyDictionary()
+
+
+def _arg(node, name):
+    # Newer sqlglot releases store WITH/FROM under "with_"/"from_"
+    value = node.args.get(name)
+    return value if value is not None else node.args.get(name + "_")
+
+
+def _children(node):
+    # Expression.iter_expressions() changed shape across sqlglot releases, so walk args directly
+    for value in node.args.values():
+        if isinstance(value, list):
+            for item in value:
+                if isinstance(item, exp.Expression):
+                    yield item
+        elif isinstance(value, exp.Expression):
+            yield value
+
+
+def table_location(catalog, table):
+    """ (db, schema, table) of a Table expression; missing parts are filled in from the catalog """
+    name = table.name.lower()
+    db = table.args.get("catalog")
+    schema = table.args.get("db")
+    db = db.name.lower() if db else None
+    schema = schema.name.lower() if schema else None
+    if db is None or schema is None:
+        known_db, known_schema = catalog.table_location(name)
+        db = db or known_db
+        schema = schema or known_schema
+    return (db, schema, name)
+
+
+def table_schema(catalog, location):
+    """ Output schema of a base table: column name -> frozenset([(db, schema, table, column)]) """
+    schemas = _table_schemas.get(catalog)
+    if schemas is None:
+        schemas = _table_schemas[catalog] = {}
+    schema = schemas.get(location)
+    if schema is None:
+        db, schema_name, table = location
+        schema = {row[3]: frozenset([(db, schema_name, table, row[3])]) for row in catalog.table_columns(table)}
+        schemas[location] = schema
+        count("schemas.tables")
+    return schema
+
+
+class _Scope:
+    """ Symbol table for one SELECT: visible CTEs and the sources of its FROM/JOIN clauses """
+
+    def __init__(self, parent=None):
+        self.parent = parent
+        self.ctes = {}     # name -> output schema
+        self.sources = {}  # alias -> ('table', (db, schema, table)) or ('derived', output schema)
+
+    def find_cte(self, name):
+        scope = self
+        while scope is not None:
+            if name in scope.ctes:
+                return scope.ctes[name]
+            scope = scope.parent
+        return None
+
+
+class _Resolver:
+    """ Resolves a statement in a single traversal, computing each scope's output columns once.
+
+    An output schema is a dict of column name -> frozenset of (db, schema, table, column)
+    rows it is derived from; CTEs and derived tables are resolved once into one and every
+    later reference is a dict lookup.
+    """
+
+    def __init__(self, catalog):
+        self.catalog = catalog
+        self.records = set()
+
+    # --- Scopes ---
+
+    def resolve_query(self, query, parent):
+        """ Resolves a SELECT or set operation and returns its output schema """
+        if isinstance(query, exp.Subquery):
+            return self.resolve_query(query.this, parent)
+        if isinstance(query, (exp.Union, exp.Except, exp.Intersect)):
+            scope = _Scope(parent)
+            self._add_ctes(query, scope)
+            left = self.resolve_query(query.this, scope)
+            right = self.resolve_query(query.expression, scope)
+            # Set operations name their columns after the left branch and merge lineage by position
+            return {name: rows | right_rows for (name, rows), right_rows in zip(left.items(), right.values())}
+        if not isinstance(query, exp.Select):
+            self._visit(query, _Scope(parent), set())
+            return {}
+
+        scope = _Scope(parent)
+        self._add_ctes(query, scope)
+
+        from_ = _arg(query, "from")
+        sources = []
+        if from_:
+            sources.append(from_.this)
+            sources.extend(from_.expressions)
+        joins = query.args.get("joins") or []
+        sources.extend(join.this for join in joins)
+        for source in sources:
+            self._add_source(source, scope)
+
+        outputs = {}
+        for projection in query.expressions:
+            if isinstance(projection, exp.Star):
+                for source in scope.sources.values():
+                    outputs.update(self._source_schema(source))
+                continue
+            if isinstance(projection, exp.Column) and isinstance(projection.this, exp.Star):
+                source = scope.sources.get(projection.table.lower())
+                if source:
+                    outputs.update(self._source_schema(source))
+                continue
+            rows = set()
+            self._visit(projection, scope, rows)
+            outputs[projection.alias_or_name.lower()] = frozenset(rows)
+
+        # Everything else in the SELECT (join conditions, WHERE, GROUP BY, ...) only records lineage
+        for join in joins:
+            for node in _children(join):
+                if node is not join.this:
+                    self._visit(node, scope, set())
+        for key, value in query.args.items():
+            if key in ("with", "with_", "from", "from_", "joins", "expressions"):
+                continue
+            for node in value if isinstance(value, list) else [value]:
+                if isinstance(node, exp.Expression):
+                    self._visit(node, scope, set(), outputs)
+        return outputs
+
+    def _add_ctes(self, query, scope):
+        with_ = _arg(query, "with")
+        if with_:
+            for cte in with_.expressions:
+                scope.ctes[cte.alias_or_name.lower()] = self.resolve_query(cte.this, scope)
+
+    def _add_source(self, source, scope):
+        alias = source.alias_or_name.lower()
+        if isinstance(source, exp.Table) and isinstance(source.this, exp.Identifier):
+            cte = None if source.args.get("db") else scope.find_cte(source.name.lower())
+            if cte is not None:
+                scope.sources[alias] = ('derived', cte)
+            else:
+                scope.sources[alias] = ('table', table_location(self.catalog, source))
+        elif isinstance(source, exp.Subquery):
+            scope.sources[alias] = ('derived', self.resolve_query(source.this, scope))
+        else:
+            # Table functions, UNNEST, VALUES, ...: no schema, but their arguments still read columns
+            self._visit(source, scope, set())
+            scope.sources[alias] = ('derived', {})
+
+    def _source_schema(self, source):
+        kind, value = source
+        return table_schema(self.catalog, value) if kind == 'table' else value
+
+    # --- Columns ---
+
+    def _visit(self, node, scope, rows, outputs=None):
+        """ Resolves every column under node; nested queries get their own scope """
+        stack = [node]
+        visited = 0
+        while stack:
+            current = stack.pop()
+            visited += 1
+            if isinstance(current, exp.Column):
+                if not isinstance(current.this, exp.Star):
+                    rows.update(self._resolve_column(current, scope, outputs))
+            elif isinstance(current, _QUERIES) or isinstance(current, exp.Subquery):
+                for columns in self.resolve_query(current, scope).values():
+                    rows.update(columns)
+            else:
+                stack.extend(_children(current))
+        count("nodes.visited", visited)
+
+    def _resolve_column(self, column, scope, outputs=None):
+        name = column.name.lower()
+        qualifier = column.table.lower()
+        resolved = self._lookup(name, qualifier, scope)
+        if resolved is None and outputs is not None and not qualifier and name in outputs:
+            # ORDER BY / HAVING may refer to a projection alias of the same SELECT
+            return outputs[name]
+        if resolved is None and not qualifier:
+            row = self.catalog.table_for_column(name)
+            resolved = frozenset([(row[0], row[1], row[2], name)]) if row else frozenset()
+        resolved = resolved or frozenset()
+        self.records.update(resolved)
+        return resolved
+
+    def _lookup(self, name, qualifier, scope):
+        while scope is not None:
+            if qualifier:
+                source = scope.sources.get(qualifier)
+                if source is not None:
+                    kind, value = source
+                    if kind == 'table':
+                        return frozenset([value + (name,)])
+                    return value.get(name, frozenset())
+            else:
+                matches = [schema[name] for schema in map(self._source_schema, scope.sources.values())
+                           if name in schema]
+                if len(matches) == 1:
+                    return matches[0]
+                if len(matches) > 1:
+                    return frozenset()  # ambiguous reference
+                if len(scope.sources) == 1:
+                    kind, value = next(iter(scope.sources.values()))
+                    if kind == 'table':
+                        return frozenset([value + (name,)])
+            scope = scope.parent
+        return None
+
+
+def resolve_lineage(parsed, catalog):
+    """ Returns the set of (db, schema, table, column) rows a parsed statement reads """
+    resolver = _Resolver(catalog)
+    if isinstance(parsed, _QUERIES):
+        outputs = resolver.resolve_query(parsed, None)
+    else:
+        # INSERT/CREATE ... AS SELECT and friends: resolve the queries inside, with the statement's CTEs
+        scope = _Scope()
+        resolver._add_ctes(parsed, scope)
+        resolver._visit(parsed, scope, set())
+        outputs = {}
+    # Top-level outputs include columns that only arrive through SELECT * expansion
+    for rows in outputs.values():
+        resolver.records.update(rows)
+    return resolver.records
+
+
+def extract_scoped_lineage(sql, catalog):
+    return resolve_lineage(parse_one(sql), catalog)
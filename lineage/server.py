@@ -0,0 +1,302 @@
+""" Long-running lineage server: the catalog, parse cache and imports stay warm between requests.
+
+Serves JSON over HTTP on localhost or on a Unix socket:
+
+    POST /lineage  {"sql": ..., "flat": false, "tiered": false}  -> {"records": [[db, schema, table, column], ...]}
+    POST /tables   {"sql": ...}                                  -> {"tables": [[database, table], ...]}
+    POST /cte      {"sql": ..., "engine": "tokens"}              -> {"sql": ..., "warnings": [...]}
+    GET  /metrics  per-endpoint request counts, errors and latency percentiles, cache stats
+    GET  /health
+
+    curl -s --unix-socket /tmp/lineage.sock localhost/lineage -d '{"sql": "SELECT npdd FROM mg.loan"}'
+
+Requests are handled on threads. Results are memoized per normalized SQL and
+options, so a repeated query is a dictionary lookup.
+"""
+import errno
+import json
+import os
+import socket
+import socketserver
+import stat
+import threading
+import time
+from collections import OrderedDict, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from sqlglot.errors import SqlglotError
+
+from .catalog import load_catalog
+from .column_lineage import extract_column_lineage, sort_records
+from .parse_cache import cache_key, default_cache
+from .table_extract import table_rows
+from .temptabletocte import convert_temp_tables_to_ctes
+from .tiered_lineage import extract_lineage_tiered
+
+DEFAULT_PORT = 8765
+MAX_BODY = 64 << 20
+
+_PERCENTILES = (50, 90, 99)
+
+
+class RequestError(Exception):
+    """ A request the server cannot serve; reported to the client with its HTTP status """
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+class _EndpointMetrics:
+    """ Request/error counts and the latencies of the most recent requests of one endpoint """
+
+    def __init__(self, window=4096):
+        self.requests = 0
+        self.errors = 0
+        self.seconds = 0.0
+        self.max_seconds = 0.0
+        self.recent = deque(maxlen=window)
+
+    def add(self, seconds, error):
+        self.requests += 1
+        self.errors += error
+        self.seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+        self.recent.append(seconds)
+
+    def report(self):
+        report = {
+            'requests': self.requests,
+            'errors': self.errors,
+            'mean_ms': round(1000 * self.seconds / self.requests, 3) if self.requests else 0.0,
+            'max_ms': round(1000 * self.max_seconds, 3),
+        }
+        latencies = sorted(self.recent)
+        for p in _PERCENTILES:
+            value = latencies[min(len(latencies) - 1, len(latencies) * p // 100)] if latencies else 0.0
+            report[f'p{p}_ms'] = round(1000 * value, 3)
+        return report
+
+
+class LineageService:
+    """ The request handlers, independent of the transport, over a catalog loaded once """
+
+    def __init__(self, catalog_source=None, scoped=True, result_cache=4096):
+        self.catalog = load_catalog(catalog_source) if catalog_source is not None else None
+        self.scoped = scoped
+        self.started = time.time()
+        self._results = OrderedDict()
+        self._result_cache = result_cache
+        self._result_hits = 0
+        self._lock = threading.Lock()
+        self._metrics = {}
+
+    def warm_up(self):
+        """ Runs each handler once so the first real request does not pay lazy initialization """
+        self.tables({'sql': "SELECT a FROM db.t JOIN db.u ON t.a = u.a"})
+        self.cte({'sql': "SELECT * INTO #t FROM db.t; SELECT * FROM #t"})
+        if self.catalog is not None:
+            self.lineage({'sql': "SELECT a FROM t"})
+        with self._lock:
+            self._results.clear()
+
+    # --- Handlers: request dict -> response dict ---
+
+    def lineage(self, request):
+        if self.catalog is None:
+            raise RequestError("the server was started without a catalog")
+        sql = _sql(request)
+        scoped = not request.get('flat', not self.scoped)
+        tiered = bool(request.get('tiered'))
+        key = ('lineage', scoped, tiered, cache_key(sql))
+
+        def resolve():
+            if tiered:
+                records, _ = extract_lineage_tiered(sql, self.catalog)
+            else:
+                records = extract_column_lineage(sql, self.catalog, scoped=scoped)
+            return {'records': [list(record) for record in sort_records(records)]}
+        return self._memoized(key, resolve)
+
+    def tables(self, request):
+        sql = _sql(request)
+        return self._memoized(('tables', cache_key(sql)), lambda: {'tables': [list(row) for row in table_rows(sql)]})
+
+    def cte(self, request):
+        sql = _sql(request)
+        engine = request.get('engine', 'tokens')
+        if engine not in ('regex', 'tokens', 'ast'):
+            raise RequestError(f"unknown engine {engine!r}")
+
+        def convert():
+            warnings = []
+            converted = convert_temp_tables_to_ctes(sql, engine=engine, warnings=warnings)
+            return {'sql': converted, 'warnings': warnings}
+        # Whitespace and case are significant in the converted script, so key on the exact text
+        return self._memoized(('cte', engine, sql), convert)
+
+    def _memoized(self, key, compute):
+        with self._lock:
+            result = self._results.get(key)
+            if result is not None:
+                self._results.move_to_end(key)
+                self._result_hits += 1
+                return result
+        result = compute()
+        with self._lock:
+            self._results[key] = result
+            if len(self._results) > self._result_cache:
+                self._results.popitem(last=False)
+        return result
+
+    # --- Metrics ---
+
+    def record(self, endpoint, seconds, error=False):
+        with self._lock:
+            metrics = self._metrics.get(endpoint)
+            if metrics is None:
+                metrics = self._metrics[endpoint] = _EndpointMetrics()
+            metrics.add(seconds, error)
+
+    def metrics(self):
+        with self._lock:
+            endpoints = {name: metrics.report() for name, metrics in sorted(self._metrics.items())}
+            results = {'entries': len(self._results), 'hits': self._result_hits}
+        return {
+            'uptime_s': round(time.time() - self.started, 1),
+            'catalog_rows': len(self.catalog) if self.catalog is not None else 0,
+            'endpoints': endpoints,
+            'result_cache': results,
+            'parse_cache': default_cache.stats(),
+        }
+
+
+def _sql(request):
+    sql = request.get('sql')
+    if not isinstance(sql, str) or not sql.strip():
+        raise RequestError("request needs a non-empty 'sql' string")
+    return sql
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive, so a client can reuse its connection
+    server_version = "lineage-server"
+
+    def do_GET(self):
+        service = self.server.service
+        if self.path == "/health":
+            self._send(200, {'status': 'ok'})
+        elif self.path == "/metrics":
+            self._send(200, service.metrics())
+        else:
+            self._send(404, {'error': f"no such endpoint: {self.path}"})
+
+    def do_POST(self):
+        service = self.server.service
+        endpoint = self.path.strip("/")
+        handler = {'lineage': service.lineage, 'tables': service.tables, 'cte': service.cte}.get(endpoint)
+        if handler is None:
+            self._send(404, {'error': f"no such endpoint: {self.path}"})
+            return
+        start = time.perf_counter()
+        status = 200
+        try:
+            response = handler(self._read_request())
+        except RequestError as e:
+            status, response = e.status, {'error': str(e)}
+        except (SqlglotError, RecursionError) as e:
+            status, response = 422, {'error': str(e)}
+        except Exception as e:  # one bad query must not take the server down
+            status, response = 500, {'error': f"{type(e).__name__}: {e}"}
+        service.record(endpoint, time.perf_counter() - start, error=status != 200)
+        self._send(status, response)
+
+    def _read_request(self):
+        header = self.headers.get("Content-Length") or "0"
+        # Only plain digits: a negative length would make rfile.read() wait for EOF
+        if not (header.isascii() and header.isdigit()):
+            self.close_connection = True  # the body is left unread, so the connection cannot be reused
+            raise RequestError(f"invalid Content-Length: {header!r}")
+        length = int(header)
+        if length > MAX_BODY:
+            self.close_connection = True
+            raise RequestError("request body too large", 413)
+        body = self.rfile.read(length)
+        try:
+            request = json.loads(body or b"{}")
+        except ValueError as e:
+            raise RequestError(f"invalid JSON: {e}")
+        if not isinstance(request, dict):
+            raise RequestError("request body must be a JSON object")
+        return request
+
+    def _send(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def address_string(self):
+        # Unix socket peers have no (host, port) address
+        return self.client_address[0] if isinstance(self.client_address, tuple) else "unix"
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+def _remove_stale_socket(path):
+    """ Removes a socket left by a server that did not shut down cleanly; anything else at path is in use """
+    try:
+        mode = os.lstat(path).st_mode
+    except FileNotFoundError:
+        return
+    if not stat.S_ISSOCK(mode):
+        raise OSError(errno.EADDRINUSE, f"{path} exists and is not a socket")
+    probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        probe.connect(path)
+    except ConnectionRefusedError:
+        os.unlink(path)  # nobody is listening on it
+        return
+    finally:
+        probe.close()
+    raise OSError(errno.EADDRINUSE, f"a server is already listening on {path}")
+
+
+class _UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def server_bind(self):
+        _remove_stale_socket(self.server_address)
+        super().server_bind()
+        self.server_name, self.server_port = "localhost", 0
+
+
+def make_server(service, port=DEFAULT_PORT, socket_path=None, host="127.0.0.1", verbose=False):
+    """ An HTTP server for the service on a Unix socket (socket_path) or host:port; call serve_forever() """
+    if socket_path:
+        server = _UnixHTTPServer(socket_path, _Handler)
+    else:
+        server = ThreadingHTTPServer((host, port), _Handler)
+        server.daemon_threads = True
+    server.service = service
+    server.verbose = verbose
+    return server
+
+
+def serve(catalog_source=None, port=DEFAULT_PORT, socket_path=None, scoped=True, verbose=False):
+    """ Loads the catalog, warms the caches and serves until interrupted """
+    service = LineageService(catalog_source, scoped=scoped)
+    service.warm_up()
+    server = make_server(service, port, socket_path, verbose=verbose)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        if socket_path and os.path.exists(socket_path):
+            os.unlink(socket_path)
@@ -0,0 +1,102 @@
+import sqlglot
+from sqlglot import expressions as exp
+import pandas as pd
+from .catalog import Catalog
+from .lineage_table import LineageTable
+from .parse_cache import parse_one
+from .profiling import count, phase
+
+
+def extract_lineage(sql, catalog):
+    """ Returns the set of (db, schema, table, column) rows the query reads """
+    parsed = parse_one(sql)
+
+    # Extract CTE names
+    cte_names = set()
+    with_expr = parsed.args.get("with")
+    if with_expr:
+        for cte in with_expr.expressions:
+            cte_names.add(cte.alias)
+
+    # Helper to collect alias mappings
+    alias_map = {}
+
+    def process_tables(expr):
+        for table_expr in expr.find_all(exp.Table):
+            alias = table_expr.alias_or_name
+            table = table_expr.name.lower()
+
+            if table in cte_names:
+                continue  # skip CTEs
+
+            db_expr = table_expr.args.get("db")
+            schema_expr = table_expr.args.get("catalog")
+
+            db = db_expr.name.lower() if db_expr else None
+            schema = schema_expr.name.lower() if schema_expr else None
+
+            known_db, known_schema = catalog.table_location(table)
+            if not db and known_db:
+                db = known_db
+            if not schema and known_schema:
+                schema = known_schema
+
+            alias_map[alias] = (db, schema, table)
+
+    with phase("alias_map"):
+        process_tables(parsed)
+
+    # Extract columns
+    records = set()
+
+    # find_all rather than walk(): walk() yields (node, parent, key) tuples in older sqlglot releases
+    with phase("resolve"):
+        for node in parsed.find_all(exp.Column):
+            count("nodes.columns")
+            col = node.name.strip().lower()
+            alias = node.table
+
+            if alias and alias in alias_map:
+                db, schema, table = alias_map[alias]
+                records.add((db, schema, table, col))
+            else:
+                for row in catalog.columns_for(col):
+                    records.add(row)
+
+    return records
+
+
+if __name__ == "__main__":
+    # Reference column metadata (lowercased and stripped)
+    df_columns = pd.DataFrame({
+        "Database Name": ["ip", "ip", "ip", "ip", "ip", "ip", "ip", "ip"],
+        "Schema Name": ["mg", "mg", "mg", "mg", "mg", "delq", "delq", "mg"],
+        "Table Name": ["loan", "loan", "loan", "letter", "letter", "delq", "delq", "letter"],
+        "Column Name": ["loan_number", "fpb", "npdd", "loan_number", "letter_date", "loan_number", "dpd", "letter_id"]
+    })
+    df_columns = df_columns.astype(str).apply(lambda col: col.str.strip().str.lower())
+    catalog = Catalog.from_frame(df_columns)
+
+    # Sample SQL with CTEs and subquery
+    sql = """
+    WITH cte1 AS (
+        SELECT loan_number, dpd FROM delq
+    ),
+    cte2 AS (
+        SELECT loan_number, letter_date FROM mg.letter
+    )
+    SELECT
+        a.loan_number,
+        b.letter_date,
+        c.dpd
+    FROM (SELECT * FROM mg.loan) a
+    LEFT JOIN cte2 b ON a.loan_number = b.loan_number
+    LEFT JOIN cte1 c ON a.loan_number = c.loan_number
+    """
+
+    records = extract_lineage(sql, catalog)
+
+    # Result
+    with phase("dataframe"):
+        df_result = LineageTable.from_records(records, columns=["Database", "Schema", "Table", "Column"]).to_frame()
+    print(df_result)
@@ -0,0 +1,37 @@
+import pandas as pd
+from .catalog import Catalog, normalize_columns
+from .column_lineage import extract_column_lineage
+from .lineage_table import LineageTable
+from .profiling import phase
+
+if __name__ == "__main__":
+    sql = """
+    WITH cte1 AS (
+        SELECT h.hi, h.hj FROM mg.hope h
+    ),
+    cte2 AS (
+        SELECT p.pr, p.pz, cte1.hi FROM mg.pro p JOIN cte1 ON cte1.hi = p.hi
+    ),
+    final_cte AS (
+        SELECT cte2.*, ROW_NUMBER() OVER (PARTITION BY cte2.hi ORDER BY cte2.pr) AS rn FROM cte2
+    )
+    SELECT f.hi, f.pr
+    FROM final_cte f
+    WHERE f.rn = 1
+    """
+
+    df_columns = normalize_columns(pd.DataFrame({
+        "Database Name": ["mg"] * 5 + ["mg"] * 3,
+        "Schema Name": ["mg"] * 8,
+        "Table Name": ["hope"] * 3 + ["pro"] * 3 + ["hope", "pro"],
+        "Column Name": ["hi", "hj", "hk", "pr", "pz", "hi", "hj", "pr"]
+    }))
+    catalog = Catalog.from_frame(df_columns)
+
+    # Column lineage logic lives in column_lineage.py so it can also run in batch
+    # (see column_lineage.lineage_batch for the process-pool API)
+    final_records = extract_column_lineage(sql, catalog)
+
+    with phase("dataframe"):
+        df_result = LineageTable.from_records(final_records, columns=["Database", "Schema", "Table", "Column"]).to_frame()
+    print(df_result)
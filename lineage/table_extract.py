@@ -0,0 +1,75 @@
+import re
+import pandas as pd
+
+FROM_PATTERN = re.compile(r'\bfrom\s+((?:\w+\.){0,2}\w+)\s*(\w+)?', re.IGNORECASE)
+JOIN_PATTERN = re.compile(r'\bjoin\s+((?:\w+\.){0,2}\w+)\s*(\w+)?', re.IGNORECASE)
+
+# Bulk variant: FROM and JOIN in one pattern, so the alias must not swallow the keyword that follows
+_NOT_ALIAS = r'(?:join|inner|left|right|full|outer|cross|on|where|group|order|having|union|limit|as)\b'
+BULK_TABLE_PATTERN = (r'\b(?:from|join)\s+(?P<table>(?:\w+\.){0,2}\w+)'
+                      r'(?:\s+(?:as\s+)?(?!' + _NOT_ALIAS + r')(?P<alias>\w+))?')
+
+
+# Function to extract database and table names (without columns)
+def extract_databases_and_tables(sql_query):
+    table_info = []
+
+    # Normalize query to handle case variations
+    sql_query = sql_query.strip().lower()  # Convert SQL to lowercase
+
+    # Regex to find table aliases in FROM and JOIN clauses (including database names)
+    table_pattern = FROM_PATTERN.findall(sql_query)
+    table_pattern += JOIN_PATTERN.findall(sql_query)
+
+    # Loop through the matches and extract database and table information
+    for table, alias in table_pattern:
+        # Split database and table (if database is present)
+        if '.' in table:
+            db, tbl = table.split('.', 1)
+        else:
+            db = None
+            tbl = table
+        
+        # Append to the table_info list
+        table_info.append({"Database Name": db, "Table Name": tbl})
+    
+    # Convert the list of dictionaries to a DataFrame
+    df = pd.DataFrame(table_info)
+
+    return df
+
+
+def table_rows(sql_query):
+    """ (database, table) tuples of extract_databases_and_tables, with None (not NaN) for a missing database """
+    df = extract_databases_and_tables(sql_query)
+    return [tuple(None if pd.isna(value) else value for value in row) for row in df.itertuples(index=False)]
+
+
+def extract_databases_and_tables_bulk(sql_queries):
+    """ Extracts FROM/JOIN tables from a whole Series of SQL text at once.
+
+    Returns one long DataFrame of (row_id, Database Name, Table Name, Alias),
+    row_id being the Series index label, with one row per table reference in
+    query order. The scan runs as pandas string operations over the column;
+    no DataFrame is built per query.
+    """
+    sql_queries = pd.Series(sql_queries)
+    matches = sql_queries.str.lower().str.extractall(BULK_TABLE_PATTERN)
+    # "db.table" splits on the first dot, as in extract_databases_and_tables
+    names = matches["table"].str.extract(r'^(?:(?P<db>\w+)\.)?(?P<tbl>.+)$')
+    return pd.DataFrame({
+        "row_id": matches.index.get_level_values(0),
+        "Database Name": names["db"].to_numpy(),
+        "Table Name": names["tbl"].to_numpy(),
+        "Alias": matches["alias"].to_numpy(),
+    })
+
+
+if __name__ == "__main__":
+    # Example usage
+    sql_query = """
+    SELECT a.id, name, address FROM profile.users a 
+    LEFT JOIN profile.address b ON a.id = b.id
+    """
+    df = extract_databases_and_tables(sql_query)
+    print(df)
@@ -0,0 +1,583 @@
+import re
+from collections import defaultdict, deque
+
+from .profiling import count, laps, phase
+
+def topo_sort(dep_dict):
+    sorted_list = []
+    visited = {}
+    def visit(node):
+        if node in visited:
+            if visited[node] == 1:
+                raise ValueError(f"Circular dependency detected at {node}")
+            return
+        visited[node] = 1
+        for dep in dep_dict[node]:
+            visit(dep)
+        visited[node] = 2
+        sorted_list.append(node)
+    for node in dep_dict:
+        if node not in visited:
+            visit(node)
+    # Post-order already lists every temp table after the ones it reads from,
+    # which is the order CTEs must be declared in
+    return sorted_list
+
+
+def build_ctes(temp_tables, warnings):
+    # --- Step 4: Topological sort of temp tables based on dependencies ---
+    dependency_map = {k: v['depends'] for k,v in temp_tables.items()}
+    try:
+        sorted_temps = topo_sort(dependency_map)
+    except ValueError as e:
+        warnings.append(f"⚠️ {str(e)}. Cannot convert due to circular temp table dependencies.")
+        sorted_temps = list(temp_tables.keys())  # fallback, no ordering
+
+    # --- Step 5: Build CTEs in dependency order ---
+    cte_list = []
+    for temp_name in sorted_temps:
+        cte_list.append(f"{temp_name} AS (\n    {temp_tables[temp_name]['query']}\n)")
+
+    ctes_sql = ""
+    if cte_list:
+        ctes_sql = "WITH " + ",\n".join(cte_list) + "\n"
+    return ctes_sql
+
+
+def assemble_script(ctes_sql, tsql_script, warnings):
+    count("cte.regex_passes", 2)
+
+    # --- Step 9: Warn on table variables (skip converting) ---
+    if re.search(r"DECLARE\s+@\w+\s+TABLE", tsql_script, re.IGNORECASE):
+        warnings.append("⚠️ Table variables (@Table) detected — not converted to CTEs due to scope and mutability.")
+
+    # --- Step 10: Assemble final script ---
+    final_script = ctes_sql + tsql_script.strip()
+
+    if warnings:
+        final_script = "-- " + "\n-- ".join(warnings) + "\n\n" + final_script
+
+    # Clean multiple blank lines
+    final_script = re.sub(r'\n\s*\n', '\n\n', final_script)
+
+    return final_script.strip()
+
+
+def convert_temp_tables_to_ctes(tsql_script: str, engine: str = "regex", warnings: list = None) -> str:
+    # Pass a list as warnings to also receive the conversion warnings separately
+    if engine == "tokens":
+        with phase("cte.tokens"):
+            return convert_temp_tables_to_ctes_tokens(tsql_script, warnings)
+    if engine == "ast":
+        from .temptabletocte_ast import convert_temp_tables_to_ctes_ast
+        with phase("cte.ast"):
+            return convert_temp_tables_to_ctes_ast(tsql_script, warnings)
+    if engine != "regex":
+        raise ValueError(f"Unknown conversion engine: {engine}")
+
+    warnings = [] if warnings is None else warnings
+    variables = {}
+    lap = laps("cte.regex")
+
+    # --- Step 0: Extract and replace scalar variables ---
+    # DECLARE @var TYPE = value;
+    declare_assignments = re.findall(
+        r"DECLARE\s+@(\w+)\s+\w+(?:\s*=\s*('[^']*'|\d+))?",
+        tsql_script,
+        flags=re.IGNORECASE
+    )
+    for var_name, value in declare_assignments:
+        if value:
+            variables[f"@{var_name}"] = value
+
+    # SET @var = value;
+    set_assignments = re.findall(
+        r"SET\s+@(\w+)\s*=\s*('[^']*'|\d+)",
+        tsql_script,
+        flags=re.IGNORECASE
+    )
+    for var_name, value in set_assignments:
+        variables[f"@{var_name}"] = value
+
+    # Remove DECLARE and SET statements
+    tsql_script = re.sub(
+        r"DECLARE\s+@(\w+)\s+\w+(\s*=\s*('[^']*'|\d+))?;",
+        '',
+        tsql_script,
+        flags=re.IGNORECASE
+    )
+    tsql_script = re.sub(
+        r"SET\s+@(\w+)\s*=\s*('[^']*'|\d+);",
+        '',
+        tsql_script,
+        flags=re.IGNORECASE
+    )
+
+    # Replace scalar variables throughout script
+    # (\b cannot match before '@', so anchor on "not preceded by a word char or @")
+    for var, value in variables.items():
+        tsql_script = re.sub(r'(?<![\w@])' + re.escape(var) + r'\b', value, tsql_script, flags=re.IGNORECASE)
+    count("cte.regex_passes", 4 + len(variables))
+    lap("variables")
+
+    # --- Step 1: Remove DROP TABLE statements with or without IF OBJECT_ID ---
+    tsql_script = re.sub(
+        r"IF\s+OBJECT_ID\s*\(\s*'[^']*?[#]{1,2}\w+'\s*\)\s+IS\s+NOT\s+NULL\s+DROP\s+TABLE\s+[#]{1,2}\w+;\s*",
+        '',
+        tsql_script,
+        flags=re.IGNORECASE
+    )
+    tsql_script = re.sub(
+        r"DROP\s+TABLE\s+[#]{1,2}\w+;\s*",
+        '',
+        tsql_script,
+        flags=re.IGNORECASE
+    )
+
+    count("cte.regex_passes", 2)
+    lap("drops")
+
+    # --- Step 2: Find all temp table definitions ---
+
+    # Pattern for SELECT INTO #Temp FROM ...
+    select_into_pattern = re.compile(
+        r"SELECT\s+(.*?)\s+INTO\s+(#|##)(\w+)\s+FROM\s+(.*?)(?=;\s*|\Z)",
+        re.IGNORECASE | re.DOTALL
+    )
+    # Pattern for CREATE TABLE #Temp (...) + INSERT INTO #Temp (...) SELECT ...
+    create_table_pattern = re.compile(
+        r"CREATE\s+TABLE\s+(#|##)(\w+)\s*\((.*?)\);\s*",
+        re.IGNORECASE | re.DOTALL
+    )
+    insert_into_pattern = re.compile(
+        r"INSERT\s+INTO\s+(#|##)(\w+)\s*\((.*?)\)\s*SELECT\s+(.*?)\s+FROM\s+(.*?)(?=;\s*|\Z)",
+        re.IGNORECASE | re.DOTALL
+    )
+
+    # Dict to store temp table definitions:
+    # temp_name -> {'type': '#'/ '##', 'query': SQL string, 'depends': set()}
+    temp_tables = {}
+
+    # Find all SELECT INTO temp tables
+    for match in select_into_pattern.finditer(tsql_script):
+        columns = match.group(1).strip()
+        temp_type = match.group(2)
+        temp_name = match.group(3).strip()
+        source = match.group(4).strip()
+
+        full_name = temp_type + temp_name
+        temp_tables[temp_name] = {
+            'type': temp_type,
+            'query': f"SELECT {columns} FROM {source}",
+            'depends': set()
+        }
+
+    # Find all CREATE TABLE + INSERT INTO temp tables
+    create_tables = {}
+    for match in create_table_pattern.finditer(tsql_script):
+        temp_type = match.group(1)
+        temp_name = match.group(2).strip()
+        create_tables[temp_name] = {
+            'type': temp_type,
+            'definition': match.group(3)
+        }
+
+    for match in insert_into_pattern.finditer(tsql_script):
+        temp_type = match.group(1)
+        temp_name = match.group(2).strip()
+        insert_columns = match.group(3).strip()
+        select_columns = match.group(4).strip()
+        source = match.group(5).strip()
+
+        if temp_name in create_tables:
+            temp_tables[temp_name] = {
+                'type': temp_type,
+                'query': f"SELECT {select_columns} FROM {source}",
+                'depends': set()
+            }
+
+    count("cte.regex_passes", 3)
+    lap("definitions")
+
+    # --- Step 3: Analyze dependencies between temp tables ---
+    temp_names = set(temp_tables.keys())
+
+    for temp_name, info in temp_tables.items():
+        query = info['query'].lower()
+        dependencies = set()
+        for other_temp in temp_names:
+            if other_temp == temp_name:
+                continue
+            # Look for references to #other_temp or ##other_temp inside the query (including joins/subqueries)
+            pattern = re.compile(rf"([#]{{1,2}}){re.escape(other_temp)}\b", re.IGNORECASE)
+            if pattern.search(query):
+                dependencies.add(other_temp)
+        temp_tables[temp_name]['depends'] = dependencies
+    count("cte.regex_passes", len(temp_names) * (len(temp_names) - 1))
+    lap("dependencies")
+
+    # --- Steps 4-5: Order temp tables and build the CTEs ---
+    ctes_sql = build_ctes(temp_tables, warnings)
+    lap("build_ctes")
+
+    # --- Step 6: Remove temp table creation and insertion and SELECT INTO from original script ---
+
+    # Remove SELECT INTO statements for all temp tables
+    tsql_script = select_into_pattern.sub('', tsql_script)
+
+    # Remove CREATE TABLE statements for all temp tables
+    tsql_script = create_table_pattern.sub('', tsql_script)
+
+    # Remove INSERT INTO statements for all temp tables
+    tsql_script = insert_into_pattern.sub('', tsql_script)
+
+    # --- Step 7: Replace all references to temp tables (#Temp, ##Temp) with just CTE names ---
+    for temp_name in temp_tables.keys():
+        tsql_script = re.sub(
+            rf"([#]{{1,2}}){re.escape(temp_name)}\b",
+            temp_name,
+            tsql_script,
+            flags=re.IGNORECASE
+        )
+
+    # --- Step 8: Remove leftover DROP TABLE statements again ---
+    tsql_script = re.sub(
+        r"IF\s+OBJECT_ID\s*\(\s*'[^']*?[#]{1,2}\w+'\s*\)\s+IS\s+NOT\s+NULL\s+DROP\s+TABLE\s+[#]{1,2}\w+;\s*",
+        '',
+        tsql_script,
+        flags=re.IGNORECASE
+    )
+    tsql_script = re.sub(
+        r"DROP\s+TABLE\s+[#]{1,2}\w+;\s*",
+        '',
+        tsql_script,
+        flags=re.IGNORECASE
+    )
+    count("cte.regex_passes", 5 + len(temp_tables))
+    lap("rewrite")
+
+    return assemble_script(ctes_sql, tsql_script, warnings)
+
+
+# --- Token engine: one tokenizing pass, then per-statement matching over the token index ---
+
+# Comments and [..] / ".." identifiers are single tokens, so a quote or ';' inside them
+# cannot break the statement split
+_TOKEN_PATTERN = re.compile(
+    r"(\s+)|(--[^\n]*|/\*.*?\*/)|(\[(?:[^\]]|\]\])*\]|\"(?:[^\"]|\"\")*\")|('[^']*')"
+    r"|(#{1,2}\w+)|(@@\w+)|(@\w+)|(\w+)|(;)|(.)",
+    re.DOTALL
+)
+_WS, _COMMENT, _IDENT, _STR, _TEMP, _SYSVAR, _VAR, _WORD, _SEMI, _OTHER = range(10)
+_OBJECT_ID_NAME = re.compile(r"'[^']*?[#]{1,2}\w+'")
+
+
+def _tokenize_statements(tsql_script):
+    """ Splits the script once into ';'-terminated statements of (kind, text) tokens """
+    statements = []
+    current = []
+    for match in _TOKEN_PATTERN.finditer(tsql_script):
+        kind = match.lastindex - 1
+        current.append((kind, match.group()))
+        if kind == _SEMI:
+            statements.append(current)
+            current = []
+    if current:
+        statements.append(current)
+    return statements
+
+
+def _is_word(tokens, i, word):
+    return i < len(tokens) and tokens[i][0] == _WORD and tokens[i][1].upper() == word
+
+
+def _is_kind(tokens, i, kind, text=None):
+    return i < len(tokens) and tokens[i][0] == kind and (text is None or tokens[i][1] == text)
+
+
+def _opt_ws(tokens, i):
+    return i + 1 if _is_kind(tokens, i, _WS) else i
+
+
+def _match_words(tokens, i, *words):
+    # word (\s+ word)* — returns the index after the last word, or None
+    for n, word in enumerate(words):
+        if n:
+            if not _is_kind(tokens, i, _WS):
+                return None
+            i += 1
+        if not _is_word(tokens, i, word):
+            return None
+        i += 1
+    return i
+
+
+def _match_value(tokens, i):
+    # \s*=\s*('[^']*'|\d+) — returns (value, index after it) or None
+    i = _opt_ws(tokens, i)
+    if not _is_kind(tokens, i, _OTHER, '='):
+        return None
+    i = _opt_ws(tokens, i + 1)
+    if _is_kind(tokens, i, _STR) or (_is_kind(tokens, i, _WORD) and tokens[i][1].isdigit()):
+        return tokens[i][1], i + 1
+    return None
+
+
+def _match_declare(tokens, i):
+    # DECLARE @var TYPE [= value] — returns (name, value, end)
+    if not (_match_words(tokens, i, 'DECLARE') and _is_kind(tokens, i + 1, _WS)
+            and _is_kind(tokens, i + 2, _VAR) and _is_kind(tokens, i + 3, _WS) and _is_kind(tokens, i + 4, _WORD)):
+        return None
+    assignment = _match_value(tokens, i + 5)
+    if assignment:
+        return tokens[i + 2][1], assignment[0], assignment[1]
+    return tokens[i + 2][1], None, i + 5
+
+
+def _match_set(tokens, i):
+    # SET @var = value — returns (name, value, end)
+    if not (_match_words(tokens, i, 'SET') and _is_kind(tokens, i + 1, _WS) and _is_kind(tokens, i + 2, _VAR)):
+        return None
+    assignment = _match_value(tokens, i + 3)
+    if assignment:
+        return tokens[i + 2][1], assignment[0], assignment[1]
+    return None
+
+
+def _match_drop(tokens, i):
+    # [IF OBJECT_ID('..#t') IS NOT NULL] DROP TABLE #t — returns the index after the temp name
+    if _is_word(tokens, i, 'IF'):
+        j = _match_words(tokens, i, 'IF', 'OBJECT_ID')
+        if j is None:
+            return None
+        j = _opt_ws(tokens, j)
+        if not _is_kind(tokens, j, _OTHER, '('):
+            return None
+        j = _opt_ws(tokens, j + 1)
+        if not (_is_kind(tokens, j, _STR) and _OBJECT_ID_NAME.fullmatch(tokens[j][1])):
+            return None
+        j = _opt_ws(tokens, j + 1)
+        if not (_is_kind(tokens, j, _OTHER, ')') and _is_kind(tokens, j + 1, _WS)):
+            return None
+        i = _match_words(tokens, j + 2, 'IS', 'NOT', 'NULL')
+        if i is None or not _is_kind(tokens, i, _WS):
+            return None
+        i += 1
+    j = _match_words(tokens, i, 'DROP', 'TABLE')
+    if j is None or not (_is_kind(tokens, j, _WS) and _is_kind(tokens, j + 1, _TEMP)):
+        return None
+    return j + 2
+
+
+def _find_word(tokens, start, end, word):
+    for i in range(start, end):
+        if tokens[i][0] == _WORD and tokens[i][1].upper() == word:
+            return i
+    return None
+
+
+def _match_select_into(tokens, i, end):
+    # SELECT cols INTO #t FROM source — returns (cols range, temp token, source start)
+    if not _is_kind(tokens, i + 1, _WS):
+        return None
+    k = i + 3
+    while True:
+        k = _find_word(tokens, k, end, 'INTO')
+        if k is None:
+            return None
+        if (_is_kind(tokens, k - 1, _WS) and _is_kind(tokens, k + 1, _WS) and _is_kind(tokens, k + 2, _TEMP)
+                and _is_kind(tokens, k + 3, _WS) and _is_word(tokens, k + 4, 'FROM') and _is_kind(tokens, k + 5, _WS)):
+            return (i + 2, k - 1), tokens[k + 2][1], k + 6
+        k += 1
+
+
+def _match_create(tokens, i, end):
+    # CREATE TABLE #t (definition) directly followed by ';'
+    j = _match_words(tokens, i, 'CREATE', 'TABLE')
+    if j is None or not (_is_kind(tokens, j, _WS) and _is_kind(tokens, j + 1, _TEMP)):
+        return None
+    k = _opt_ws(tokens, j + 2)
+    if not (_is_kind(tokens, k, _OTHER, '(') and end - 1 > k and _is_kind(tokens, end - 1, _OTHER, ')')
+            and _is_kind(tokens, end, _SEMI)):
+        return None
+    return tokens[j + 1][1]
+
+
+def _match_insert(tokens, i, end):
+    # INSERT INTO #t (cols) SELECT cols FROM source — returns (temp token, select cols range, source start)
+    j = _match_words(tokens, i, 'INSERT', 'INTO')
+    if j is None or not (_is_kind(tokens, j, _WS) and _is_kind(tokens, j + 1, _TEMP)):
+        return None
+    k = _opt_ws(tokens, j + 2)
+    if not _is_kind(tokens, k, _OTHER, '('):
+        return None
+    k += 1
+    while k < end:
+        if _is_kind(tokens, k, _OTHER, ')'):
+            s = _opt_ws(tokens, k + 1)
+            if _is_word(tokens, s, 'SELECT') and _is_kind(tokens, s + 1, _WS):
+                f = s + 3
+                while True:
+                    f = _find_word(tokens, f, end, 'FROM')
+                    if f is None:
+                        return None
+                    if _is_kind(tokens, f - 1, _WS) and _is_kind(tokens, f + 1, _WS):
+                        return tokens[j + 1][1], (s + 2, f - 1), f + 2
+                    f += 1
+        k += 1
+    return None
+
+
+def _split_temp(token):
+    name = token.lstrip('#')
+    return token[:len(token) - len(name)], name
+
+
+def convert_temp_tables_to_ctes_tokens(tsql_script: str, warnings: list = None) -> str:
+    """ Same conversion as the regex engine, but tokenizes the script once.
+
+    Every statement is classified from the token stream, #temp references and
+    @variables come from the same index, and the dependency graph is built from
+    it, so the cost is linear in script size instead of patterns × size and
+    temp tables². Definitions are matched within one ';'-terminated statement.
+    """
+    warnings = [] if warnings is None else warnings
+    variables = {}
+    statements = _tokenize_statements(tsql_script)
+    count("cte.regex_passes")
+    count("cte.statements", len(statements))
+
+    # Per statement: (tokens, body end, remove ranges); a range is (start, stop, eat following whitespace)
+    plans = []
+    select_intos = []
+    creates = {}
+    inserts = []
+
+    # --- Step 0-2: Classify every statement from its tokens ---
+    for n, tokens in enumerate(statements):
+        end = len(tokens) - 1 if tokens[-1][0] == _SEMI else len(tokens)
+        terminated = end < len(tokens)
+        removals = []
+        words = [i for i in range(end) if tokens[i][0] == _WORD]
+
+        for i in words:
+            upper = tokens[i][1].upper()
+            if upper == 'DECLARE' or upper == 'SET':
+                match = _match_declare(tokens, i) if upper == 'DECLARE' else _match_set(tokens, i)
+                if match:
+                    name, value, stop = match
+                    if value:
+                        variables[name] = value
+                    if terminated and stop == end:
+                        removals.append((i, len(tokens), False))
+                    break
+
+        if not removals and terminated:
+            for i in words:
+                if tokens[i][1].upper() in ('IF', 'DROP') and _match_drop(tokens, i) == end:
+                    removals.append((i, len(tokens), True))
+                    break
+
+        if not removals:
+            first_select = next((i for i in words if tokens[i][1].upper() == 'SELECT'
+                                 and _is_kind(tokens, i + 1, _WS)), None)
+            match = first_select is not None and _match_select_into(tokens, first_select, end)
+            if match:
+                select_intos.append((n, match))
+                removals.append((first_select, end, False))
+
+        if not removals:
+            for i in words:
+                upper = tokens[i][1].upper()
+                if upper == 'CREATE':
+                    temp = _match_create(tokens, i, end)
+                    if temp:
+                        temp_type, temp_name = _split_temp(temp)
+                        creates[temp_name] = temp_type
+                        removals.append((i, len(tokens), True))
+                        break
+                elif upper == 'INSERT':
+                    match = _match_insert(tokens, i, end)
+                    if match:
+                        inserts.append((n, match))
+                        removals.append((i, end, False))
+                        break
+
+        plans.append((tokens, removals))
+
+    lower_variables = {}
+    for var, value in variables.items():
+        lower_variables.setdefault(var.lower(), value)
+
+    def render(tokens, start, stop):
+        return ''.join(lower_variables.get(text.lower(), text) if kind == _VAR else text
+                       for kind, text in tokens[start:stop])
+
+    def temp_refs(tokens, ranges):
+        return {tokens[i][1].lstrip('#').lower() for start, stop in ranges
+                for i in range(start, stop) if tokens[i][0] == _TEMP}
+
+    # --- Step 2: Temp table definitions, in the same order as the regex engine ---
+    temp_tables = {}
+    definitions = []
+    for n, ((col_start, col_stop), temp, source_start) in select_intos:
+        tokens, _ = plans[n]
+        end = len(tokens) - 1 if tokens[-1][0] == _SEMI else len(tokens)
+        temp_type, temp_name = _split_temp(temp)
+        temp_tables[temp_name] = {
+            'type': temp_type,
+            'query': f"SELECT {render(tokens, col_start, col_stop).strip()} FROM {render(tokens, source_start, end).strip()}",
+            'depends': set()
+        }
+        definitions.append((temp_name, temp_refs(tokens, [(col_start, col_stop), (source_start, end)])))
+    for n, (temp, (col_start, col_stop), source_start) in inserts:
+        tokens, _ = plans[n]
+        end = len(tokens) - 1 if tokens[-1][0] == _SEMI else len(tokens)
+        temp_type, temp_name = _split_temp(temp)
+        if temp_name in creates:
+            temp_tables[temp_name] = {
+                'type': temp_type,
+                'query': f"SELECT {render(tokens, col_start, col_stop).strip()} FROM {render(tokens, source_start, end).strip()}",
+                'depends': set()
+            }
+            definitions.append((temp_name, temp_refs(tokens, [(col_start, col_stop), (source_start, end)])))
+
+    # --- Step 3: Dependencies straight from the #temp reference index ---
+    names_by_lower = defaultdict(list)
+    for temp_name in temp_tables:
+        names_by_lower[temp_name.lower()].append(temp_name)
+    for temp_name, refs in definitions:
+        temp_tables[temp_name]['depends'] = {
+            other for ref in refs for other in names_by_lower.get(ref, ()) if other != temp_name
+        }
+
+    # --- Steps 4-5: Order temp tables and build the CTEs ---
+    ctes_sql = build_ctes(temp_tables, warnings)
+
+    # --- Steps 6-8: Emit the remaining tokens with temp references replaced ---
+    replacements = {lower: names[0] for lower, names in names_by_lower.items()}
+    out = []
+    eat_whitespace = False
+    for tokens, removals in plans:
+        i = 0
+        if eat_whitespace and tokens[0][0] == _WS:
+            i = 1
+        eat_whitespace = False
+        for start, stop, eat in removals:
+            out.append(_render_kept(tokens, i, start, lower_variables, replacements))
+            i = stop
+            eat_whitespace = eat and stop == len(tokens)
+        out.append(_render_kept(tokens, i, len(tokens), lower_variables, replacements))
+
+    return assemble_script(ctes_sql, ''.join(out), warnings)
+
+
+def _render_kept(tokens, start, stop, variables, replacements):
+    parts = []
+    for kind, text in tokens[start:stop]:
+        if kind == _VAR:
+            text = variables.get(text.lower(), text)
+        elif kind == _TEMP:
+            text = replacements.get(text.lstrip('#').lower(), text)
+        parts.append(text)
+    return ''.join(parts)
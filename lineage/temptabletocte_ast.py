@@ -0,0 +1,234 @@
+import re
+from functools import reduce
+
+import sqlglot
+from sqlglot import exp
+from sqlglot.errors import SqlglotError
+
+from .temptabletocte import assemble_script, convert_temp_tables_to_ctes_tokens, topo_sort
+
+# Body of a DECLARE that sqlglot keeps as a raw Command: @name TYPE [= value]
+_DECLARE_PATTERN = re.compile(r"@(\w+)\s+(\w+)(?:\s*\(\s*\d+(?:\s*,\s*\d+)?\s*\))?(?:\s*=\s*('[^']*'|-?\d+(?:\.\d+)?))?", re.IGNORECASE)
+_TEMP_REFERENCE = re.compile(r"#{1,2}(\w+)")
+_QUERIES = (exp.Select, exp.Union, exp.Except, exp.Intersect)
+_MUTATIONS = tuple(getattr(exp, name) for name in ('Update', 'Delete', 'Merge', 'AlterTable', 'Alter') if hasattr(exp, name))
+
+
+def _temp_name(node):
+    """ Name of a #temp/##global table or column qualifier (an Identifier), or None for a regular table """
+    ident = node if isinstance(node, exp.Identifier) else node.this
+    if isinstance(ident, exp.Identifier) and (ident.args.get("temporary") or ident.args.get("global")):
+        return ident.name
+    name = node.name
+    return name.lstrip('#') if name.startswith('#') else None
+
+
+def _target_table(node):
+    target = node.this
+    if isinstance(target, exp.Schema):
+        target = target.this
+    return target if isinstance(target, exp.Table) else None
+
+
+def _literal(text):
+    if text.startswith("'"):
+        return exp.Literal.string(text[1:-1])
+    return exp.Literal.number(text)
+
+
+def _convert(tsql_script, warnings):
+    statements = [s for s in sqlglot.parse(tsql_script, read="tsql") if s is not None]
+
+    entries = []          # per statement: [statement, role, target temp/variable, temp refs, temp table/qualifier nodes, variable nodes]
+    definitions = {}      # temp (lowercase) -> {'name', 'bodies', 'columns', 'refs'}
+    created_columns = {}  # temp (lowercase) -> column identifiers from CREATE TABLE
+    assignments = {}      # variable (lowercase) -> list of literal texts, None for non-literal assignments
+    blocked = set()       # temps that cannot become CTEs (mutated, or used in raw statements)
+
+    # --- Step 1: One pass per statement to classify it and index temp tables and variables ---
+    for statement in statements:
+        temp_nodes = []
+        variable_nodes = []
+        for node in statement.find_all(exp.Table, exp.Parameter, exp.Column):
+            if isinstance(node, exp.Table):
+                if _temp_name(node):
+                    temp_nodes.append(node)
+            elif isinstance(node, exp.Column):
+                qualifier = node.args.get("table")
+                if isinstance(qualifier, exp.Identifier) and _temp_name(qualifier):
+                    temp_nodes.append(qualifier)  # #t.x -> t.x along with the table itself
+            elif isinstance(node.this, exp.Var) and not isinstance(node.parent, exp.Parameter):
+                variable_nodes.append(node)
+        refs = {_temp_name(node).lower() for node in temp_nodes}
+        role, temp = 'keep', None
+
+        if isinstance(statement, exp.Command):
+            text = statement.expression.name if isinstance(statement.expression, exp.Literal) else ''
+            declare = _DECLARE_PATTERN.fullmatch(text.strip()) if statement.name.upper() == 'DECLARE' else None
+            if declare and declare.group(2).upper() != 'TABLE':
+                role, temp = 'declare', declare.group(1).lower()
+                assignments.setdefault(temp, [])
+                if declare.group(3):
+                    assignments[temp].append(declare.group(3))
+            else:
+                # Raw statements (TRUNCATE, EXEC, ...) are not rewritten, so their temps must stay temps
+                blocked.update(name.lower() for name in _TEMP_REFERENCE.findall(text))
+
+        elif isinstance(statement, exp.Set):
+            role, temp = 'set', []
+            for item in statement.expressions:
+                eq = item.this
+                if (isinstance(eq, exp.EQ) and isinstance(eq.this, exp.Parameter)
+                        and isinstance(eq.this.this, exp.Var)):
+                    name = eq.this.this.name.lower()
+                    value = eq.expression
+                    literal = value.sql(dialect="tsql") if isinstance(value, exp.Literal) else None
+                    assignments.setdefault(name, []).append(literal)
+                    temp.append(name)
+                    variable_nodes.remove(eq.this)  # the assigned variable itself is never inlined
+                else:
+                    role = 'keep'
+
+        elif isinstance(statement, exp.Drop) and len(refs) == 1:
+            role, temp = 'drop', next(iter(refs))
+
+        elif isinstance(statement, exp.Create) and _target_table(statement) is not None \
+                and _temp_name(_target_table(statement)):
+            role, temp = 'create', _temp_name(_target_table(statement)).lower()
+            if isinstance(statement.this, exp.Schema):
+                created_columns[temp] = [col.this for col in statement.this.expressions
+                                         if isinstance(col, exp.ColumnDef)]
+
+        elif isinstance(statement, exp.Insert) and _target_table(statement) is not None \
+                and _temp_name(_target_table(statement)) and isinstance(statement.expression, _QUERIES):
+            target = _target_table(statement)
+            role, temp = 'define', _temp_name(target).lower()
+            columns = statement.this.expressions if isinstance(statement.this, exp.Schema) else None
+            definition = definitions.setdefault(temp, {'name': _temp_name(target), 'bodies': [], 'columns': None, 'refs': set()})
+            definition['bodies'].append(statement.expression)
+            definition['columns'] = definition['columns'] or columns
+            definition['refs'] |= refs - {temp}
+
+        elif isinstance(statement, exp.Select) and isinstance(statement.args.get("into"), exp.Into) \
+                and _temp_name(statement.args["into"].this):
+            into = statement.args["into"].this
+            role, temp = 'define', _temp_name(into).lower()
+            temp_nodes.remove(into)  # INTO is dropped in step 4, once the temp is known to convert
+            definition = definitions.setdefault(temp, {'name': _temp_name(into), 'bodies': [], 'columns': None, 'refs': set()})
+            definition['bodies'].append(statement)
+            definition['refs'] |= refs - {temp}
+
+        elif isinstance(statement, _MUTATIONS):
+            target = _target_table(statement)
+            if target is not None and _temp_name(target):
+                blocked.add(_temp_name(target).lower())
+
+        entries.append([statement, role, temp, refs, temp_nodes, variable_nodes])
+
+    # --- Step 2: Decide which temp tables become CTEs and which variables can be inlined ---
+    for temp in sorted(blocked & definitions.keys()):
+        warnings.append(f"⚠️ #{definitions[temp]['name']} is modified or used outside plain SQL — left as a temp table.")
+    converted = {temp: d for temp, d in definitions.items() if temp not in blocked}
+
+    inline = {name: _literal(values[0]) for name, values in assignments.items()
+              if len(values) == 1 and values[0] is not None}
+
+    # --- Step 3: Dependency order of the converted temp tables (existing topo_sort) ---
+    dependency_map = {temp: {dep for dep in d['refs'] if dep in converted} for temp, d in converted.items()}
+    try:
+        order = topo_sort(dependency_map)
+    except ValueError as e:
+        warnings.append(f"⚠️ {str(e)}. Cannot convert due to circular temp table dependencies.")
+        order = list(converted)
+    position = {temp: i for i, temp in enumerate(order)}
+
+    # --- Step 4: Apply the indexed rewrites ---
+    for statement, role, temp, refs, temp_nodes, variable_nodes in entries:
+        for node in temp_nodes:
+            name = _temp_name(node).lower()
+            if name in converted:
+                cte_name = exp.to_identifier(converted[name]['name'])
+                if isinstance(node, exp.Identifier):
+                    node.replace(cte_name)
+                else:
+                    node.set("this", cte_name)
+        for node in variable_nodes:
+            value = inline.get(node.this.name.lower())
+            if value is not None:
+                node.replace(value.copy())
+
+    ctes = {}
+    for temp in order:
+        definition = converted[temp]
+        hoisted = []
+        bodies = []
+        for body in definition['bodies']:
+            body.set("into", None)
+            # T-SQL does not allow nested WITH, so a body's own CTEs move up to the chain
+            inner = body.args.get("with")
+            if inner:
+                hoisted.extend(inner.expressions)
+                body.set("with", None)
+            bodies.append(body)
+        body = reduce(lambda left, right: exp.union(left, right, distinct=False), bodies)
+        columns = definition['columns'] or created_columns.get(temp)
+        alias = exp.TableAlias(this=exp.to_identifier(definition['name']),
+                               columns=[col.copy() for col in columns] if columns else None)
+        ctes[temp] = hoisted + [exp.CTE(this=body, alias=alias)]
+
+    # --- Step 5: Attach the needed CTEs to every statement that still reads them, then generate once ---
+    output = []
+    attached = set()
+    for statement, role, temp, refs, temp_nodes, variable_nodes in entries:
+        if role in ('define', 'create', 'drop') and temp in converted:
+            continue
+        if role == 'declare' and temp in inline:
+            continue
+        if role == 'set' and all(name in inline for name in temp):
+            continue
+
+        needed = set()
+        stack = [ref for ref in refs if ref in converted]
+        while stack:
+            ref = stack.pop()
+            if ref not in needed:
+                needed.add(ref)
+                stack.extend(dependency_map[ref])
+        if needed:
+            # The first statement takes the CTE trees as they are; later ones get copies
+            chain = []
+            for ref in sorted(needed, key=position.get):
+                chain.extend(cte.copy() if ref in attached else cte for cte in ctes[ref])
+                attached.add(ref)
+            existing = statement.args.get("with")
+            if existing:
+                chain.extend(existing.expressions)
+            statement.set("with", exp.With(expressions=chain))
+        output.append(statement.sql(dialect="tsql", pretty=True) + ";")
+
+    return assemble_script("", "\n\n".join(output), warnings)
+
+
+def convert_temp_tables_to_ctes_ast(tsql_script: str, warnings: list = None) -> str:
+    """ Converts temp tables to CTEs by rewriting the sqlglot T-SQL AST.
+
+    The script is parsed once. One pass over each statement classifies it and
+    indexes its temp table and @variable nodes. The rewrites (temp table ->
+    CTE, variable -> literal) are applied to those indexed nodes, and SQL is
+    generated once at the end. Unlike the text engines, this also converts
+    INSERT INTO #t SELECT without a column list, SELECT ... INTO with its own
+    WITH clause, and several INSERTs into one temp table (as UNION ALL). Temp
+    tables that are modified after being filled are left alone. Scripts
+    sqlglot cannot parse fall back to the token engine.
+    """
+    warnings = [] if warnings is None else warnings
+    attempt = list(warnings)  # discarded if the AST path gives up half way
+    try:
+        script = _convert(tsql_script, attempt)
+        warnings.extend(attempt[len(warnings):])
+        return script
+    except SqlglotError as e:  # parse and tokenizer errors (unterminated quotes, CRLF, ...)
+        warnings.append(f"⚠️ T-SQL parser failed ({str(e).splitlines()[0]}); converted with the token engine instead.")
+    except RecursionError:
+        warnings.append("⚠️ Script is nested too deeply for the T-SQL parser; converted with the token engine instead.")
+    return convert_temp_tables_to_ctes_tokens(tsql_script, warnings)
@@ -0,0 +1,154 @@
+import json
+import os
+import re
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+
+from .temptabletocte import convert_temp_tables_to_ctes
+
+# sqlcmd/SSMS batch separator: GO alone on its line, with an optional repeat count or comment
+GO_PATTERN = re.compile(r"^\s*GO(?:\s+\d+)?\s*(?:--.*)?$", re.IGNORECASE)
+
+
+def iter_sql_files(source):
+    """ Yields the .sql files under a directory in a stable order, or the single file given """
+    if os.path.isfile(source):
+        yield source
+        return
+    for dirpath, dirnames, filenames in os.walk(source):
+        dirnames.sort()
+        for filename in sorted(filenames):
+            if filename.lower().endswith('.sql'):
+                yield os.path.join(dirpath, filename)
+
+
+def iter_go_batches(source, encoding='utf-8-sig'):
+    """ Streams (file, first line number, batch text) from a .sql file or directory, split on GO lines.
+
+    Files are read line by line, so only one batch is ever held in memory.
+    """
+    for path in iter_sql_files(source):
+        with open(path, encoding=encoding, errors='replace') as f:
+            lines = []
+            start = 1
+            for line_number, line in enumerate(f, 1):
+                if GO_PATTERN.match(line):
+                    text = ''.join(lines)
+                    if text.strip():
+                        yield path, start, text
+                    lines = []
+                    start = line_number + 1
+                else:
+                    lines.append(line)
+            text = ''.join(lines)
+            if text.strip():
+                yield path, start, text
+
+
+def _conversion_errors(engine):
+    # Only the AST engine can raise sqlglot errors; the text engines never import sqlglot
+    if engine != 'ast':
+        return (ValueError, RecursionError)
+    from sqlglot.errors import SqlglotError
+    return (ValueError, RecursionError, SqlglotError)
+
+
+def convert_batch(batch, engine='tokens'):
+    """ Converts one batch; failures are returned with the original text instead of raised """
+    path, line, text = batch
+    warnings = []
+    try:
+        converted = convert_temp_tables_to_ctes(text, engine=engine, warnings=warnings)
+        error = None
+    except _conversion_errors(engine) as e:
+        converted = f"-- ⚠️ Conversion failed: {e}\n{text.strip()}"
+        error = str(e)
+    return {'file': path, 'line': line, 'script': converted, 'warnings': warnings, 'error': error}
+
+
+def _convert_text(text, engine='tokens'):
+    # Budgeted path: only the text goes to the worker (and to the quarantine file)
+    return convert_batch((None, None, text), engine)
+
+
+def _failed_batch(batch, error):
+    path, line, text = batch
+    return {'file': path, 'line': line, 'script': f"-- ⚠️ Conversion failed: {error}\n{text.strip()}",
+            'warnings': [], 'error': error}
+
+
+def iter_converted_batches(source, processes=None, engine='tokens', encoding='utf-8-sig',
+                           timeout=None, max_memory=None, quarantine=None):
+    """ Converts every GO batch under source in worker processes, yielding results in input order.
+
+    At most a few batches per worker are in flight, so memory stays bounded no
+    matter how large the dump is, and one slow batch only delays the output behind it.
+    With a timeout (seconds) or max_memory (bytes) per batch, a batch over budget
+    has its worker killed (see budget.BudgetedPool), is written to the quarantine
+    file and comes out unconverted, like a batch that failed to convert.
+    """
+    if timeout is not None or max_memory is not None:
+        from .budget import BudgetedPool
+
+        pending = deque()  # batches handed to the pool, in input order like its output
+
+        def items():
+            for batch in iter_go_batches(source, encoding):
+                pending.append(batch)
+                yield f"{batch[0]}:{batch[1]}", batch[2]
+
+        pool = BudgetedPool(partial(_convert_text, engine=engine), processes, timeout, max_memory,
+                            chunksize=1, quarantine=quarantine)
+        for _, result, error in pool.imap(items(), ordered=True):
+            batch = pending.popleft()
+            if error is not None:
+                yield _failed_batch(batch, error)
+                continue
+            result['file'], result['line'] = batch[0], batch[1]
+            yield result
+        return
+
+    convert = partial(convert_batch, engine=engine)
+    with ProcessPoolExecutor(processes) as pool:
+        window = (processes or os.cpu_count() or 1) * 4
+        pending = deque()
+        for batch in iter_go_batches(source, encoding):
+            pending.append(pool.submit(convert, batch))
+            if len(pending) >= window:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def convert_bulk(source, output_path, warnings_path=None, processes=None, engine='tokens', encoding='utf-8-sig',
+                 timeout=None, max_memory=None, quarantine=None):
+    """ Writes the converted batches (GO-separated) to output_path as they finish.
+
+    Each batch's warnings also go to warnings_path as JSON lines when given.
+    timeout, max_memory and quarantine are per-batch budgets, as in
+    iter_converted_batches. Returns a summary of batches converted, with
+    warnings and failed.
+    """
+    summary = {'batches': 0, 'with_warnings': 0, 'failed': 0}
+    warnings_file = open(warnings_path, 'w', encoding='utf-8') if warnings_path else None
+    try:
+        with open(output_path, 'w', encoding='utf-8') as out:
+            for result in iter_converted_batches(source, processes, engine, encoding, timeout, max_memory, quarantine):
+                summary['batches'] += 1
+                summary['with_warnings'] += bool(result['warnings'])
+                summary['failed'] += bool(result['error'])
+                out.write(f"-- {result['file']}:{result['line']}\n{result['script']}\nGO\n\n")
+                if warnings_file and (result['warnings'] or result['error']):
+                    record = {k: result[k] for k in ('file', 'line', 'warnings', 'error')}
+                    warnings_file.write(json.dumps(record, ensure_ascii=False) + '\n')
+    finally:
+        if warnings_file:
+            warnings_file.close()
+    return summary
+
+
+if __name__ == "__main__":
+    import sys
+
+    print(convert_bulk(sys.argv[1], sys.argv[2], sys.argv[3] if len(sys.argv) > 3 else None))
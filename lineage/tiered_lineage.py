@@ -0,0 +1,374 @@
+import random
+import re
+from collections import Counter
+
+from sqlglot.errors import SqlglotError
+
+from .column_lineage import extract_column_lineage
+from .profiling import count, phase
+
+# One pass over the query: comments and whitespace (skipped), string literals,
+# numbers, plain or dotted identifiers, and single-character operators
+_TOKEN_PATTERN = re.compile(
+    r"\s+|--[^\n]*|/\*.*?\*/"
+    r"|([NnXxBb]?'(?:[^']|'')*')"
+    r"|(\d+(?:\.\d*)?(?:[eE][-+]?\d+)?)"
+    r"|([A-Za-z_][\w$]*(?:\.[A-Za-z_][\w$]*)*)"
+    r"|(\S)",
+    re.DOTALL,
+)
+_STR, _NUM, _IDENT, _OP = 1, 2, 3, 4
+
+_CLAUSES = {'FROM', 'WHERE', 'GROUP', 'HAVING', 'ORDER', 'LIMIT'}
+_JOINS = {'JOIN', 'INNER', 'LEFT', 'RIGHT', 'FULL', 'OUTER', 'CROSS'}
+_VALUES = {'NULL', 'TRUE', 'FALSE'}
+_KEYWORDS = _CLAUSES | _JOINS | _VALUES | {
+    'SELECT', 'DISTINCT', 'ALL', 'AS', 'ON', 'BY', 'AND', 'OR', 'NOT', 'IS', 'IN',
+    'LIKE', 'ILIKE', 'BETWEEN', 'ESCAPE', 'ASC', 'DESC', 'NULLS', 'FIRST', 'LAST',
+    'CURRENT_DATE', 'CURRENT_TIME', 'CURRENT_TIMESTAMP',
+}
+# The keywords _column_refs accepts where a value is expected, and after a value;
+# any other keyword there (FIRST, LEFT, ALL, ...) may be a column name, so the query escalates
+_OPERAND_KEYWORDS = _VALUES | {'NOT', 'CURRENT_DATE', 'CURRENT_TIME', 'CURRENT_TIMESTAMP'}
+_OPERATOR_KEYWORDS = {'AND', 'OR', 'NOT', 'IS', 'IN', 'LIKE', 'ILIKE', 'BETWEEN', 'ESCAPE', 'AS', 'ASC', 'DESC', 'NULLS'}
+_BEFORE_OPERAND = {'AND', 'OR', 'NOT', 'IS', 'IN', 'LIKE', 'ILIKE', 'BETWEEN', 'ESCAPE'}
+# Anything that can nest a scope, rename columns or change how names parse goes to sqlglot
+_ESCALATE = {
+    'WITH', 'UNION', 'INTERSECT', 'EXCEPT', 'MINUS', 'CASE', 'OVER', 'INTO', 'EXISTS', 'VALUES',
+    'PIVOT', 'UNPIVOT', 'LATERAL', 'APPLY', 'QUALIFY', 'WINDOW', 'USING', 'NATURAL', 'CAST',
+    'TRY_CAST', 'CONVERT', 'EXTRACT', 'INTERVAL', 'DATEADD', 'DATEDIFF', 'DATEPART', 'DATENAME',
+    'DATE_TRUNC', 'FILTER', 'WITHIN', 'ANY', 'SOME', 'OFFSET', 'FETCH', 'COLLATE', 'ROLLUP',
+    'CUBE', 'GROUPING', 'SETS', 'FOR', 'INSERT', 'UPDATE', 'DELETE', 'MERGE', 'CREATE', 'DROP',
+    'ALTER', 'TRUNCATE', 'EXEC', 'EXECUTE', 'DECLARE', 'SET', 'TOP',
+}
+
+
+class _Escalate(Exception):
+    """ The query is outside what the fast path handles; carries the reason """
+
+
+def _tokenize(sql):
+    tokens = []
+    for match in _TOKEN_PATTERN.finditer(sql):
+        kind = match.lastindex
+        if kind is None:
+            continue
+        text = match.group(kind)
+        if kind == _IDENT:
+            upper = text.upper()
+            if upper in _ESCALATE:
+                raise _Escalate(upper.lower())
+            tokens.append((kind, text, upper))
+        elif kind == _OP:
+            if text in '*([`"@#:?$':
+                if text == '(':
+                    tokens.append((kind, text, text))
+                    continue
+                raise _Escalate('*' if text == '*' else 'syntax')
+            tokens.append((kind, text, text))
+        else:
+            tokens.append((kind, text, text))
+    if tokens and tokens[-1][1] == ';':
+        tokens.pop()
+    if any(token[1] == ';' for token in tokens):
+        raise _Escalate('multiple statements')
+    return tokens
+
+
+def _split_clauses(tokens):
+    """ (clause, start, stop) for SELECT and each top-level clause after it """
+    if not tokens or tokens[0][2] != 'SELECT':
+        raise _Escalate('not a select')
+    clauses = []
+    depth = 0
+    current, start = 'SELECT', 1
+    for i, (kind, text, upper) in enumerate(tokens):
+        if text == '(':
+            depth += 1
+        elif text == ')':
+            depth -= 1
+        elif kind == _IDENT and i > 0:
+            if upper == 'SELECT':
+                raise _Escalate('subquery')
+            if upper in _CLAUSES and depth == 0:
+                clauses.append((current, start, i))
+                current, start = upper, i + 1
+    clauses.append((current, start, len(tokens)))
+    return clauses
+
+
+def _split_list(tokens, start, stop):
+    """ (start, stop) of each top-level comma-separated item """
+    items = []
+    depth = 0
+    begin = start
+    for i in range(start, stop):
+        text = tokens[i][1]
+        if text == '(':
+            depth += 1
+        elif text == ')':
+            depth -= 1
+        elif text == ',' and depth == 0:
+            items.append((begin, i))
+            begin = i + 1
+    items.append((begin, stop))
+    return items
+
+
+def _is_keyword(token):
+    return token[0] == _IDENT and '.' not in token[1] and token[2] in _KEYWORDS
+
+
+def _check_keyword(prev, token, following):
+    """ Escalates unless the keyword token can only be a keyword where it stands """
+    upper = token[2]
+    if prev is None or (prev[0] == _OP and prev[1] != ')') or (_is_keyword(prev) and prev[2] in _BEFORE_OPERAND):
+        ok = (upper in _OPERAND_KEYWORDS
+              or (upper in ('DISTINCT', 'ALL') and prev is not None and prev[1] == '(')   # COUNT(DISTINCT a)
+              or (upper in ('LEFT', 'RIGHT') and following is not None and following[1] == '(')
+              or (upper in ('IN', 'LIKE', 'ILIKE', 'BETWEEN') and prev is not None and prev[2] == 'NOT'))
+    elif prev[2] == 'AS':
+        ok = False
+    else:
+        ok = upper in _OPERATOR_KEYWORDS or (upper in ('FIRST', 'LAST') and prev[2] == 'NULLS')
+    if not ok:
+        raise _Escalate('keyword as name')
+
+
+def _parse_from(tokens, start, stop):
+    """ Returns ([(alias, parts)], [(start, stop)] of ON conditions) for a flat FROM/JOIN list """
+    sources = []
+    conditions = []
+    i = start
+    expect_table = True
+    while i < stop:
+        kind, text, upper = tokens[i]
+        if expect_table:
+            if kind != _IDENT or _is_keyword(tokens[i]):
+                raise _Escalate('derived table')
+            parts = text.lower().split('.')
+            if len(parts) > 3:
+                raise _Escalate('syntax')
+            i += 1
+            alias = parts[-1]
+            if i < stop and tokens[i][2] == 'AS':
+                i += 1
+                if i >= stop or tokens[i][0] != _IDENT or _is_keyword(tokens[i]):
+                    raise _Escalate('syntax')
+            if i < stop and tokens[i][0] == _IDENT and not _is_keyword(tokens[i]):
+                if '.' in tokens[i][1]:
+                    raise _Escalate('syntax')
+                alias = tokens[i][1].lower()
+                i += 1
+            sources.append((alias, parts))
+            expect_table = False
+        elif text == ',':
+            expect_table = True
+            i += 1
+        elif upper in _JOINS:
+            while i < stop and tokens[i][2] in _JOINS and tokens[i][2] != 'JOIN':
+                i += 1
+            if i >= stop or tokens[i][2] != 'JOIN':
+                raise _Escalate('syntax')
+            expect_table = True
+            i += 1
+        elif upper == 'ON':
+            i += 1
+            begin = i
+            depth = 0
+            while i < stop:
+                if tokens[i][1] == '(':
+                    depth += 1
+                elif tokens[i][1] == ')':
+                    depth -= 1
+                elif depth == 0 and (tokens[i][2] in _JOINS or tokens[i][1] == ','):
+                    break
+                i += 1
+            conditions.append((begin, i))
+        else:
+            raise _Escalate('syntax')
+    if expect_table and sources:
+        raise _Escalate('syntax')
+    return sources, conditions
+
+
+def _column_refs(tokens, start, stop, aliases=None):
+    """ (qualifier, name) of every column reference in tokens[start:stop].
+
+    In a projection, pass a list as aliases to receive its output alias.
+    """
+    refs = []
+    prev = None
+    for i in range(start, stop):
+        token = tokens[i]
+        kind, text, upper = token
+        following = tokens[i + 1] if i + 1 < stop else None
+        if _is_keyword(token):
+            _check_keyword(prev, token, following)
+        elif kind == _IDENT:
+            if following is not None and following[1] == '(':
+                if '.' in text:
+                    raise _Escalate('syntax')
+            elif following is not None and following[0] == _STR:
+                raise _Escalate('typed literal')
+            elif aliases is not None and prev is not None and (
+                    prev[2] == 'AS'
+                    or (prev[0] == _IDENT and (not _is_keyword(prev) or prev[2] in _VALUES))
+                    or prev[0] in (_STR, _NUM) or prev[1] == ')'):
+                aliases.append(text.lower())  # output alias, with or without AS
+            else:
+                parts = text.lower().split('.')
+                if len(parts) > 3:
+                    raise _Escalate('syntax')
+                if parts[-1].upper() in _OPERAND_KEYWORDS:
+                    raise _Escalate('keyword as name')  # p.true, t.current_date: not plain columns to sqlglot
+                refs.append((parts[-2] if len(parts) > 1 else '', parts[-1]))
+        prev = token
+    return refs
+
+
+def fast_lineage(sql, catalog):
+    """ Column lineage for a flat SELECT ... FROM ... JOIN query without sqlglot.
+
+    Follows the scoped resolver's rules (scope_resolver.py) for the query shapes
+    it accepts; raises _Escalate for anything else.
+    """
+    tokens = _tokenize(sql)
+    clauses = _split_clauses(tokens)
+
+    sources = {}
+    conditions = []
+    for clause, start, stop in clauses:
+        if clause == 'FROM':
+            from_sources, conditions = _parse_from(tokens, start, stop)
+            for alias, parts in from_sources:
+                name = parts[-1]
+                schema = parts[-2] if len(parts) > 1 else None
+                db = parts[-3] if len(parts) > 2 else None
+                if db is None or schema is None:
+                    known_db, known_schema = catalog.table_location(name)
+                    db = db or known_db
+                    schema = schema or known_schema
+                sources[alias] = (db, schema, name)
+    schemas = {alias: {row[3] for row in catalog.table_columns(location[2])} for alias, location in sources.items()}
+
+    def resolve(qualifier, name, outputs=None):
+        count("nodes.columns")
+        if qualifier:
+            location = sources.get(qualifier)
+            return {location + (name,)} if location is not None else set()
+        matches = [alias for alias, columns in schemas.items() if name in columns]
+        if len(matches) == 1:
+            return {sources[matches[0]] + (name,)}
+        if len(matches) > 1:
+            return set()  # ambiguous reference
+        if len(sources) == 1:
+            return {next(iter(sources.values())) + (name,)}
+        if outputs is not None and name in outputs:
+            # WHERE / GROUP BY / ORDER BY may refer to a projection of the same SELECT
+            return outputs[name]
+        row = catalog.table_for_column(name)
+        return {(row[0], row[1], row[2], name)} if row else set()
+
+    # Skip SELECT DISTINCT / ALL before the projections
+    select_start, select_stop = clauses[0][1], clauses[0][2]
+    while select_start < select_stop and tokens[select_start][2] in ('DISTINCT', 'ALL'):
+        select_start += 1
+
+    records = set()
+    outputs = {}
+    for start, stop in _split_list(tokens, select_start, select_stop):
+        if start == stop:
+            raise _Escalate('syntax')
+        aliases = []
+        refs = _column_refs(tokens, start, stop, aliases)
+        rows = set()
+        for qualifier, name in refs:
+            rows |= resolve(qualifier, name)
+        if aliases:
+            outputs[aliases[-1]] = rows
+        elif len(refs) == 1 and stop - start == 1:
+            outputs[refs[0][1]] = rows  # a bare column keeps its name
+        records |= rows
+
+    for start, stop in conditions:
+        for qualifier, name in _column_refs(tokens, start, stop):
+            records |= resolve(qualifier, name)
+    for clause, start, stop in clauses[1:]:
+        if clause in ('GROUP', 'ORDER'):
+            if not (start < stop and tokens[start][2] == 'BY'):
+                raise _Escalate('keyword as name')  # e.g. a column named "group"
+            start += 1
+        if clause != 'FROM':
+            for qualifier, name in _column_refs(tokens, start, stop):
+                records |= resolve(qualifier, name, outputs)
+    return records
+
+
+class TieredExtractor:
+    """ Routes each query to the regex/tokenizer fast path or to the full sqlglot resolver.
+
+    Queries with CTEs, subqueries, *, CASE, set operations and similar go to the
+    scoped resolver; the rest never touch sqlglot. With verify_rate > 0, that share
+    of fast-path queries is also run through sqlglot and any difference is recorded
+    (and the sqlglot result returned).
+    """
+
+    def __init__(self, catalog, verify_rate=0.0, seed=0):
+        self.catalog = catalog
+        self.verify_rate = verify_rate
+        self._random = random.Random(seed)
+        self.tiers = Counter()
+        self.reasons = Counter()
+        self.verified = 0
+        self.mismatches = []  # (query_id, only in fast path, only in sqlglot or the sqlglot error)
+        self.routes = []      # (query_id, tier, reason) per query
+
+    def extract(self, sql, query_id=None):
+        """ Returns the query's (db, schema, table, column) rows; see routes for the tier used """
+        try:
+            with phase("tier.fast"):
+                records = fast_lineage(sql, self.catalog)
+        except _Escalate as e:
+            reason = str(e)
+            self.tiers['full'] += 1
+            self.reasons[reason] += 1
+            self.routes.append((query_id, 'full', reason))
+            count("tier.full")
+            return extract_column_lineage(sql, self.catalog, scoped=True)
+
+        self.tiers['fast'] += 1
+        self.routes.append((query_id, 'fast', None))
+        count("tier.fast")
+        if self.verify_rate and self._random.random() < self.verify_rate:
+            self.verified += 1
+            try:
+                expected = set(extract_column_lineage(sql, self.catalog, scoped=True))
+            except (SqlglotError, RecursionError) as e:
+                # The fast path accepted something sqlglot cannot parse: worth a look, not a crash
+                self.mismatches.append((query_id, records, str(e)))
+                return records
+            if expected != records:
+                self.mismatches.append((query_id, records - expected, expected - records))
+                return expected
+        return records
+
+    def report(self):
+        total = sum(self.tiers.values())
+        return {
+            'queries': total,
+            'fast': self.tiers['fast'],
+            'full': self.tiers['full'],
+            'fast_ratio': self.tiers['fast'] / total if total else 0.0,
+            'escalation_reasons': dict(self.reasons.most_common()),
+            'verified': self.verified,
+            'mismatches': len(self.mismatches),
+        }
+
+
+def extract_lineage_tiered(sql, catalog):
+    """ Returns (records, tier) for one query, tier being 'fast' or 'full' """
+    try:
+        return fast_lineage(sql, catalog), 'fast'
+    except _Escalate:
+        return extract_column_lineage(sql, catalog, scoped=True), 'full'
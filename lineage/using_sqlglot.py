@@ -0,0 +1,86 @@
+import sqlglot
+from sqlglot import expressions as exp
+import pandas as pd
+from .catalog import Catalog
+from .lineage_table import LineageTable
+from .parse_cache import parse_one
+from .profiling import count, phase
+
+
+def extract_lineage(sql, catalog):
+    """ Returns the set of (db, table, column) rows the query reads """
+    parsed = parse_one(sql)
+
+    # Build alias map: alias -> (database, table)
+    alias_map = {}
+    with phase("alias_map"):
+        for table_expr in parsed.find_all(exp.Table):
+            alias = table_expr.alias_or_name
+            db_expr = table_expr.args.get("db")
+            db = db_expr.name.lower() if db_expr else None
+            table = table_expr.name.lower()
+
+            # Try to infer DB from the catalog if missing
+            if db is None:
+                db = catalog.table_location(table)[0]
+
+            alias_map[alias] = (db, table)
+
+    # Extract column references
+    records = set()
+
+    # find_all rather than walk(): walk() yields (node, parent, key) tuples in older sqlglot releases
+    with phase("resolve"):
+        for node in parsed.find_all(exp.Column):
+            count("nodes.columns")
+            col = node.name.strip().lower()
+            alias = node.table
+
+            if alias:  # Qualified column
+                if alias in alias_map:
+                    db, table = alias_map[alias]
+                    records.add((db, table, col))
+            else:  # Unqualified column — use catalog lookup
+                for db, _, table, column in catalog.columns_for(col):
+                    records.add((db, table, column))
+
+    return records
+
+
+if __name__ == "__main__":
+    # Sample SQL query
+    sql = """
+    SELECT
+        a.loan_number as ln,
+        b.letter_date,
+        c.dpd,
+        case when a.fpb > 0 then 'Y' else N end as zerofpb,
+        case when letter_date > npdd then 'Y' else 'N' end as letter_sent,
+        max(npdd) as last_npdd
+    from mg.loan a
+    left join mg.letter b on a.loan_number = b.loan_number
+    left join (select loan_number, dpd from delq) c on a.loan_number = c.loan_number
+    where letter_id = '12345'
+    group by a.loan_number,
+        b.letter_date,
+        c.dpd,
+        a.fpb
+    """
+
+    # Reference column metadata
+    df_columns = pd.DataFrame({
+        "Database Name": ["mg", "mg", "mg", "mg", "mg", "mg", "mg","mg"],
+        "Table Name":    ["loan", "loan", "loan", "letter", "letter", "delq", "delq","letter"],
+        "Column Name":   ["loan_number", "fpb", "npdd", "loan_number", "letter_date", "loan_number", "dpd","letter_id"]
+    })
+
+    # Normalize for matching
+    df_columns = df_columns.astype(str).apply(lambda col: col.str.strip().str.lower())
+    catalog = Catalog.from_frame(df_columns)
+
+    records = extract_lineage(sql, catalog)
+
+    # Final deduplicated DataFrame
+    with phase("dataframe"):
+        df_result = LineageTable.from_records(records, columns=["Database", "Table", "Column"]).to_frame()
+    print(df_result)
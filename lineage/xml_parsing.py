@@ -1,4 +1,6 @@
 from lxml import etree
+from .alteryx_xml import iter_sql_from_alteryx_xml
+from .profiling import count, phase
 
 def is_disabled(node):
     gui_settings = node.find(".//GuiSettings")
@@ -6,6 +8,7 @@ def is_disabled(node):
 
 def traverse_and_collect_sql(node, is_parent_disabled=False):
     sql_results = []
+    count("xml.nodes")
 
     # Determine if this node or any ancestor is disabled
     this_disabled = is_disabled(node)
@@ -29,14 +32,20 @@ def traverse_and_collect_sql(node, is_parent_disabled=False):
 
     return sql_results
 
-def extract_sql_from_alteryx_xml(xml_path):
-    tree = etree.parse(xml_path)
+def extract_sql_from_alteryx_xml(xml_path, streaming=False):
+    # Streaming mode parses incrementally (see alteryx_xml.py) for very large workflows
+    if streaming:
+        with phase("xml.stream"):
+            return list(iter_sql_from_alteryx_xml(xml_path))
+    with phase("xml.parse"):
+        tree = etree.parse(xml_path)
     root = tree.getroot()
-    return traverse_and_collect_sql(root)
+    with phase("xml.traverse"):
+        return traverse_and_collect_sql(root)
 
 # Example usage
-file_path = "path/to/your/workflow.yxmd"
-sql_results = extract_sql_from_alteryx_xml(file_path)
+if __name__ == "__main__":
+    file_path = "path/to/your/workflow.yxmd"
 
-for tool_id, sql_tag, sql in sql_results:
-    print(f"Tool ID: {tool_id}, Tag: {sql_tag}\nSQL:\n{sql}\n{'-'*40}")
+    for tool_id, sql_tag, sql in iter_sql_from_alteryx_xml(file_path):
+        print(f"Tool ID: {tool_id}, Tag: {sql_tag}\nSQL:\n{sql}\n{'-'*40}")